@@ -0,0 +1,125 @@
+"""Аутентификация по токену: заголовок "Authorization: Token <ключ>".
+
+В отличие от BasicAuthentication, не проверяет пароль (PBKDF2) на каждом запросе.
+Ключ превращается в sha256 и ищется по уникальному индексу; поиск идет по хешу, а не
+по ключу, поэтому время поиска не раскрывает ключ. Токен действует LIFETIME_DAYS дней
+с выдачи (AUTH_TOKEN_LIFETIME_DAYS, команда clear_auth_tokens удаляет просроченные).
+
+Проверенный токен держится в ограниченном LRU-кэше процесса с TTL: хранится только
+digest -> id пользователя, сам пользователь загружается из БД по первичному ключу на каждом
+запросе. Поэтому изменения профиля и is_active=False видны сразу во всех процессах.
+Отзыв (revoke_tokens) очищает кэш текущего процесса и ставит в кэше Django отметку
+отзыва на TTL секунд: записи, закэшированные до нее, в любом процессе проверяются по БД
+заново. Для нескольких процессов это требует общего бэкенда CACHES (см. settings.py);
+без него другие процессы перестанут принимать токен не позже чем через TTL.
+
+Настройки -- словарь AUTH_TOKEN_CACHE (MAX_SIZE, TTL в секундах) и AUTH_TOKEN_LIFETIME_DAYS
+в settings.py.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.models import AuthToken, User
+
+CachedToken = namedtuple('CachedToken', ['user_id', 'cached_at'])
+
+
+class TokenCache:
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (CachedToken, момент истечения по time.monotonic)
+
+    def get(self, digest):
+        """CachedToken или None."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def set(self, digest, user_id, lifetime=None):
+        """Запоминает токен на TTL секунд, но не дольше оставшегося срока его жизни lifetime."""
+        ttl = self.ttl if lifetime is None else min(self.ttl, lifetime)
+        with self._lock:
+            self._entries[digest] = (CachedToken(user_id, time.time()), time.monotonic() + ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for digest in [digest for digest, (token, _) in self._entries.items() if token.user_id == user_id]:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_options = getattr(settings, 'AUTH_TOKEN_CACHE', {})
+token_cache = TokenCache(max_size=_options.get('MAX_SIZE', 10000), ttl=_options.get('TTL', 60))
+
+
+def _revoked_key(user_id):
+    return f'core:auth-token-revoked:{user_id}'
+
+
+def revoke_tokens(user):
+    """Отзывает все токены пользователя (смена пароля, удаление профиля)."""
+    AuthToken.objects.filter(user=user).delete()
+    token_cache.discard_user(user.pk)
+    # Записи старше TTL истекают сами, поэтому отметка нужна только на TTL
+    cache.set(_revoked_key(user.pk), time.time(), token_cache.ttl)
+
+
+def _is_revoked(token):
+    revoked_at = cache.get(_revoked_key(token.user_id))
+    return revoked_at is not None and revoked_at >= token.cached_at
+
+
+class TokenAuthentication(BaseAuthentication):
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Неверный заголовок токена.")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Неверный заголовок токена.")
+
+        digest = AuthToken.make_digest(key)
+        cached = token_cache.get(digest)
+        if cached is not None and _is_revoked(cached):
+            token_cache.discard_user(cached.user_id)
+            cached = None
+        if cached is None:
+            token = AuthToken.valid().select_related('user').filter(digest=digest).first()
+            if token is None or not token.user.is_active:
+                raise AuthenticationFailed("Недействительный токен.")
+            token_cache.set(digest, token.user_id, token.seconds_left())
+            return token.user, key
+
+        user = User.objects.filter(pk=cached.user_id, is_active=True).first()
+        if user is None:
+            token_cache.discard_user(cached.user_id)
+            raise AuthenticationFailed("Недействительный токен.")
+        return user, key
+
+    def authenticate_header(self, request):
+        return self.keyword
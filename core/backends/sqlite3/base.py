@@ -0,0 +1,28 @@
+"""SQLite с настройкой соединений из DATABASES (core/database.py).
+
+PRAGMAS -- PRAGMA, выполняемые на каждом новом соединении. OPTIONS['transaction_mode']
+(DEFERRED, IMMEDIATE, EXCLUSIVE) -- режим BEGIN для transaction.atomic, как в Django 5.1:
+транзакция по умолчанию (DEFERRED) берет блокировку записи только на первой записи, и если
+ее уже держит другое соединение, SQLite сразу возвращает "database is locked", не дожидаясь
+busy_timeout. IMMEDIATE берет блокировку в начале транзакции, и писатели ждут друг друга.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in (self.settings_dict.get('PRAGMAS') or {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
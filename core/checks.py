@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from core.database import is_shared_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """При нескольких процессах сервера кэши процессов сбрасываются только через общий CACHES."""
+    if is_shared_cache(settings.CACHES['default']):
+        return []
+    return [Warning(
+        "CACHES['default'] хранит данные в памяти процесса.",
+        hint=("Сброс кэша уроков и отзыв токенов в других процессах, сброс кэша прогресса и закрепление "
+              "за основной базой после записи работают только в пределах процесса. Задайте CACHE_URL "
+              "(redis://... или memcached://...), если сервер запущен в нескольких процессах."),
+        id='core.W001',
+    )]
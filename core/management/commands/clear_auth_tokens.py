@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = "Удаляет токены доступа старше AUTH_TOKEN_LIFETIME_DAYS. Запускать по расписанию."
+
+    def handle(self, *args, **options):
+        deleted, _ = AuthToken.expired().delete()
+        self.stdout.write(self.style.SUCCESS(f"Удалено просроченных токенов: {deleted}."))
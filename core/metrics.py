@@ -0,0 +1,263 @@
+"""Метрики процесса в текстовом формате Prometheus (эндпоинт metrics/).
+
+Счетчики шардированы по потокам: каждый поток пишет только в свой шард, поэтому запись
+не берет блокировок и не теряет инкременты. Снимок суммирует шарды всех потоков. Шард
+завершившегося потока (пулы потоков sync_to_async под ASGI, перезапуск воркеров) при
+регистрации нового шарда или снимке прибавляется к общему шарду и удаляется из списка,
+поэтому число шардов не растет со временем, а счетчики не уменьшаются.
+
+Несколько процессов (gunicorn и т.п.): если задан METRICS['MULTIPROCESS_DIR'], каждый
+процесс не реже раза в FLUSH_INTERVAL секунд и при завершении сохраняет свой снимок
+в <каталог>/<pid>.json, а metrics/ суммирует файлы всех процессов со своим текущим
+снимком. Счетчики и гистограммы завершившихся процессов продолжают учитываться,
+поэтому они монотонны; gauge (запросы в работе) берутся только у живых процессов.
+
+Запись метрик запросов -- core.middleware.MetricsMiddleware. Эндпоинт отдает метрики
+только адресам из METRICS['ALLOWED_IPS'] (адреса и сети через запятую) и сотрудникам
+(is_staff), остальным -- 403.
+"""
+import atexit
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HELP = {
+    'http_requests_total': ('counter', "Запросы по маршруту, методу и статусу."),
+    'http_request_duration_seconds': ('histogram', "Время обработки запроса."),
+    'http_requests_in_flight': ('gauge', "Запросы в обработке."),
+    'db_queries_total': ('counter', "Запросы к БД по маршруту."),
+    'lesson_cache_requests_total': ('counter', "Обращения к кэшу метаданных уроков: попадания (hit) и промахи (miss)."),
+}
+
+
+class _Shard:
+    def __init__(self):
+        self.counters = defaultdict(float)  # (имя, метки) -> значение
+        self.gauges = defaultdict(float)
+        self.histograms = {}  # (имя, метки) -> [счетчики по корзинам..., сумма, количество]
+
+    def merge_into(self, target):
+        for key, value in self.counters.items():
+            target.counters[key] += value
+        for key, value in self.gauges.items():
+            target.gauges[key] += value
+        for key, values in self.histograms.items():
+            merge_histogram(target.histograms, key, list(values))
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []  # (поток, шард)
+        self._retired = _Shard()  # сумма шардов завершившихся потоков
+        self._lock = threading.Lock()  # для регистрации шардов и их переноса в _retired
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._prune()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _prune(self):
+        """Переносит шарды завершившихся потоков в _retired (под self._lock).
+
+        Завершившийся поток больше не пишет в свой шард, поэтому перенос без блокировки записи безопасен.
+        """
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                shard.merge_into(self._retired)
+        self._shards = alive
+
+    def inc(self, name, labels=(), value=1):
+        self._shard().counters[name, labels] += value
+
+    def add_gauge(self, name, labels=(), value=1):
+        self._shard().gauges[name, labels] += value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        histogram = histograms.get((name, labels))
+        if histogram is None:
+            histogram = histograms[name, labels] = [0] * (len(self.buckets) + 2)
+        # Корзины хранятся не накопительно; значение больше всех границ попадет только в +Inf (count)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                histogram[i] += 1
+                break
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def snapshot(self):
+        """Сумма шардов всех потоков: {'counters': {...}, 'gauges': {...}, 'histograms': {...}}."""
+        with self._lock:
+            self._prune()
+            shards = [shard for _, shard in self._shards]
+            retired = _Shard()
+            self._retired.merge_into(retired)
+        result = {'counters': defaultdict(float), 'gauges': defaultdict(float), 'histograms': {}}
+        for shard in [retired, *shards]:
+            # dict() копирует атомарно под GIL, поэтому параллельная запись не мешает обходу
+            for key, value in dict(shard.counters).items():
+                result['counters'][key] += value
+            for key, value in dict(shard.gauges).items():
+                result['gauges'][key] += value
+            for key, values in dict(shard.histograms).items():
+                merge_histogram(result['histograms'], key, list(values))
+        return result
+
+
+def merge_histogram(histograms, key, values):
+    current = histograms.get(key)
+    if current is None:
+        histograms[key] = values
+    else:
+        histograms[key] = [a + b for a, b in zip(current, values)]
+
+
+logger = logging.getLogger(__name__)
+registry = MetricsRegistry()
+_options = getattr(settings, 'METRICS', {})
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _encode(snapshot):
+    return {
+        'pid': os.getpid(),
+        'counters': [[name, list(labels), value] for (name, labels), value in snapshot['counters'].items()],
+        'gauges': [[name, list(labels), value] for (name, labels), value in snapshot['gauges'].items()],
+        'histograms': [[name, list(labels), values] for (name, labels), values in snapshot['histograms'].items()],
+    }
+
+
+def _labels(pairs):
+    return tuple(tuple(pair) for pair in pairs)
+
+
+def flush(force=False):
+    """Сохраняет снимок процесса для агрегации между процессами (не чаще FLUSH_INTERVAL).
+
+    Если снимок уже сохраняет другой поток, вызов ничего не делает и не ждет.
+    """
+    global _last_flush
+    directory = _options.get('MULTIPROCESS_DIR')
+    if not directory or (not force and time.monotonic() - _last_flush < _options.get('FLUSH_INTERVAL', 5)):
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as output:
+            json.dump(_encode(registry.snapshot()), output)
+        os.replace(f'{path}.tmp', path)  # читатель видит либо старый, либо новый файл целиком
+    except OSError:
+        logger.exception("Не удалось сохранить снимок метрик в %s", directory)
+    finally:
+        _flush_lock.release()
+
+
+if _options.get('MULTIPROCESS_DIR'):
+    os.makedirs(_options['MULTIPROCESS_DIR'], exist_ok=True)
+    atexit.register(flush, force=True)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Снимок текущего процесса плюс сохраненные снимки остальных процессов."""
+    result = registry.snapshot()
+    directory = _options.get('MULTIPROCESS_DIR')
+    if not directory:
+        return result
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == f'{os.getpid()}.json':
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['counters']:
+            result['counters'][name, _labels(labels)] += value
+        if _alive(data['pid']):
+            for name, labels, value in data['gauges']:
+                result['gauges'][name, _labels(labels)] += value
+        for name, labels, values in data['histograms']:
+            merge_histogram(result['histograms'], (name, _labels(labels)), values)
+    return result
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render(snapshot, buckets=BUCKETS):
+    """Текстовый формат Prometheus 0.0.4."""
+    by_name = defaultdict(list)
+    for kind in ('counters', 'gauges'):
+        for (name, labels), value in sorted(snapshot[kind].items()):
+            by_name[name].append(f'{name}{_format_labels(labels)} {float(value)!r}')
+    for (name, labels), values in sorted(snapshot['histograms'].items()):
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            by_name[name].append(f'{name}_bucket{_format_labels(labels, [("le", repr(bound))])} {cumulative}')
+        by_name[name] += [
+            f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {values[-1]}',
+            f'{name}_sum{_format_labels(labels)} {float(values[-2])!r}',
+            f'{name}_count{_format_labels(labels)} {values[-1]}',
+        ]
+
+    lines = []
+    for name in sorted(by_name):
+        kind, description = HELP.get(name, ('untyped', ''))
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}', *by_name[name]]
+    return '\n'.join(lines) + '\n'
+
+
+def is_allowed(request):
+    """Адрес клиента входит в METRICS['ALLOWED_IPS'] или пользователь -- сотрудник."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in _options.get('ALLOWED_IPS', ()))
+
+
+def metrics_view(request):
+    if not is_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
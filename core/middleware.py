@@ -0,0 +1,253 @@
+"""Замер времени запроса: SQL, код представления, рендеринг ответа.
+
+RequestTimingMiddleware через connection.execute_wrapper считает запросы к БД, их
+суммарное время и самый медленный запрос, отдельно замеряет рендеринг ответа DRF
+(JSON) и отдает все это в заголовке Server-Timing (виден во вкладке Network браузера):
+
+    Server-Timing: db;dur=12.5;desc="7 queries", db-slowest;dur=4.1, app;dur=12.2, serialize;dur=18.0,
+                   render;dur=3.0, total;dur=45.7
+
+serialize -- serializer.data в представлениях с SerializationTimingMixin (без запросов к БД,
+сделанных при сериализации: они входят в db). app -- остальной код представления:
+аутентификация, права, фильтры, построение queryset.
+Запросы дольше SLOW_REQUEST_MS пишутся в лог core.middleware одной JSON-строкой.
+
+Настройки -- словарь REQUEST_TIMING в settings.py. Выключенный middleware исключается
+из цепочки при старте (MiddlewareNotUsed) и ничего не стоит. Middleware синхронный:
+соединения с БД привязаны к потоку, и обертка видит только запросы своего потока.
+
+MetricsMiddleware пишет метрики запроса в core.metrics (эндпоинт metrics/) с меткой
+маршрута -- шаблоном URL, а не путем, чтобы число серий не зависело от id в адресах.
+Настройки -- словарь METRICS. Middleware работает и синхронно, и асинхронно: под ASGI
+асинхронные списки (courses/async_views.py) не переводятся в поток ради него. Запросы к
+БД при этом выполняются в потоках sync_to_async, поэтому счетчик запросов стоит на каждом
+соединении постоянно (сигнал connection_created) и находит счетчик текущего запроса через
+contextvar, который переходит и в эти потоки.
+
+ReadReplicaMiddleware открывает область запроса для чтения с реплик (core/routers.py)
+и после записывающих запросов закрепляет клиента за основной базой.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """Обертка для connection.execute_wrapper: копит число, время и самый медленный запрос."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if duration > self.slowest:
+                self.slowest, self.slowest_sql = duration, sql
+
+
+_request_serialization = ContextVar('request_timing_serialization', default=None)
+
+
+class SerializationTimer:
+    """Время сериализации запроса за вычетом запросов к БД, сделанных во время нее."""
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.duration = 0.0
+
+    def measure(self, to_representation):
+        def timed(instance):
+            started, db_before = time.perf_counter(), self.queries.duration
+            try:
+                return to_representation(instance)
+            finally:
+                self.duration += time.perf_counter() - started - (self.queries.duration - db_before)
+
+        return timed
+
+
+class SerializationTimingMixin:
+    """Для представлений DRF: время serializer.data RequestTimingMiddleware показывает отдельно (serialize)."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        timer = _request_serialization.get()
+        if timer is not None:
+            # .data вызывает self.to_representation, в т.ч. ListSerializer для many=True
+            serializer.to_representation = timer.measure(serializer.to_representation)
+        return serializer
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        options = getattr(settings, 'REQUEST_TIMING', {})
+        if not options.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request = options.get('SLOW_REQUEST_MS', 500) / 1000
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        serialization = SerializationTimer(queries)
+        request.render_duration = 0.0
+        started = time.perf_counter()
+        token = _request_serialization.set(serialization)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.get_response(request)
+        finally:
+            _request_serialization.reset(token)
+        total = time.perf_counter() - started
+
+        app = max(0.0, total - queries.duration - serialization.duration - request.render_duration)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"',
+            f'db-slowest;dur={queries.slowest * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'serialize;dur={serialization.duration * 1000:.1f}',
+            f'render;dur={request.render_duration * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        if total >= self.slow_request:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(queries.duration * 1000, 1),
+                'queries': queries.count,
+                'slowest_query_ms': round(queries.slowest * 1000, 1),
+                'slowest_query': queries.slowest_sql,
+                'app_ms': round(app * 1000, 1),
+                'serialize_ms': round(serialization.duration * 1000, 1),
+                'render_ms': round(request.render_duration * 1000, 1),
+            }, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся обработчиком после всех process_template_response
+        started = time.perf_counter()
+
+        def finished(rendered):
+            request.render_duration = time.perf_counter() - started
+
+        response.add_post_render_callback(finished)
+        return response
+
+
+_request_queries = ContextVar('metrics_request_queries', default=None)
+
+
+def _count_request_queries(execute, sql, params, many, context):
+    queries = _request_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    """Ставит на соединение постоянную обертку MetricsMiddleware (обработчик connection_created)."""
+    if _count_request_queries not in connection.execute_wrappers:
+        # В начало списка: execute_wrapper() снимает свою обертку с конца
+        connection.execute_wrappers.insert(0, _count_request_queries)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS', {}).get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_counter, dispatch_uid='core.middleware.install_query_counter')
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)  # соединение могло открыться до подключения сигнала
+        queries, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(token)
+        return self.record(request, response, queries, started)
+
+    async def __acall__(self, request):
+        queries, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(token)
+        return self.record(request, response, queries, started)
+
+    @staticmethod
+    def start():
+        queries = QueryTimer()
+        metrics.registry.add_gauge('http_requests_in_flight')
+        return queries, _request_queries.set(queries), time.perf_counter()
+
+    @staticmethod
+    def finish(token):
+        _request_queries.reset(token)
+        metrics.registry.add_gauge('http_requests_in_flight', value=-1)
+
+    @staticmethod
+    def record(request, response, queries, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        route = ('route', '/' + match.route if match else '<unmatched>')
+        method = ('method', request.method)
+        metrics.registry.inc('http_requests_total', (route, method, ('status', str(response.status_code))))
+        metrics.registry.observe('http_request_duration_seconds', (route, method), duration)
+        metrics.registry.inc('db_queries_total', (route, method), queries.count)
+        metrics.flush()
+        return response
+
+
+class ReadReplicaMiddleware:
+    def __init__(self, get_response):
+        if not routers.replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.enter_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.exit_request(token)
+        if request.method not in SAFE_METHODS:
+            routers.pin(request, response)
+        return response
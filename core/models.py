@@ -1,9 +1,55 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 
 class User(AbstractUser):
     """Абстрактный базовый класс, Требуется имя пользователя и пароль.
     Другие поля являются необязательными."""
     username = models.CharField(max_length=255, unique=True)
-    pass
\ No newline at end of file
+    pass
+
+
+class AuthToken(models.Model):
+    """Токен доступа к API, выдается при входе (core/login).
+    В базе хранится только sha256 от ключа, сам ключ знает лишь клиент.
+    Действует AUTH_TOKEN_LIFETIME_DAYS дней с выдачи."""
+    digest = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auth_tokens')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Токен доступа"
+        verbose_name_plural = "Токены доступа"
+
+    @staticmethod
+    def make_digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def lifetime():
+        return timedelta(days=getattr(settings, 'AUTH_TOKEN_LIFETIME_DAYS', 30))
+
+    @classmethod
+    def valid(cls):
+        return cls.objects.filter(created__gte=timezone.now() - cls.lifetime())
+
+    @classmethod
+    def expired(cls):
+        return cls.objects.filter(created__lt=timezone.now() - cls.lifetime())
+
+    def seconds_left(self):
+        return (self.created + self.lifetime() - timezone.now()).total_seconds()
+
+    @classmethod
+    def issue(cls, user):
+        """Создает токен и возвращает ключ для клиента; просроченные токены пользователя удаляются."""
+        key = secrets.token_urlsafe(32)
+        cls.expired().filter(user=user).delete()
+        cls.objects.create(digest=cls.make_digest(key), user=user)
+        return key
@@ -0,0 +1,105 @@
+"""Чтение с реплик БД для безопасных запросов.
+
+Реплики -- алиасы DATABASES из REPLICA_DATABASES['ALIASES'] (DATABASE_REPLICA_URLS в
+окружении). Запись и все чтения вне представлений идут в default. Представление с
+ReplicaReadMixin после аутентификации отправляет чтения GET/HEAD/OPTIONS на одну реплику,
+выбранную на весь запрос, если пользователь не закреплен за основной базой.
+
+Чтение своих записей: после запроса с записывающим методом ReadReplicaMiddleware на
+PIN_SECONDS секунд закрепляет клиента за default -- cookie для браузера и ключом в кэше
+Django для пользователя (клиенты с токеном могут не хранить cookie). PIN_SECONDS должен
+быть больше отставания реплик. Для нескольких процессов ключ пользователя требует общего
+бэкенда CACHES, cookie работает и без него.
+
+Состояние запроса лежит в contextvar: он виден и в потоке синхронного представления,
+и в асинхронных списках (courses/async_views.py) под ASGI.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'db_pin'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class _RequestState:
+    read_alias = None
+
+
+def _options():
+    return getattr(settings, 'REPLICA_DATABASES', {})
+
+
+def replica_aliases():
+    return _options().get('ALIASES', [])
+
+
+def _user_pin_key(user):
+    return f'core:replica-pin:{user.pk}'
+
+
+def enter_request():
+    """Начинает область запроса; вернуть токен в exit_request по его окончании."""
+    return _request_state.set(_RequestState())
+
+
+def exit_request(token):
+    _request_state.reset(token)
+
+
+def is_pinned(request):
+    """Клиент недавно писал и должен читать из default."""
+    now = time.time()
+    try:
+        if float(request.COOKIES.get(PIN_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and cache.get(_user_pin_key(user), 0) > now)
+
+
+def pin(request, response):
+    """Закрепляет клиента за default на PIN_SECONDS секунд после записи."""
+    seconds = _options().get('PIN_SECONDS', 5)
+    expires = time.time() + seconds
+    response.set_cookie(PIN_COOKIE, f'{expires:.3f}', max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        cache.set(_user_pin_key(user), expires, seconds)
+
+
+def route_reads(request):
+    """Отправляет чтения текущего запроса на реплику, если это допустимо."""
+    state = _request_state.get()
+    aliases = replica_aliases()
+    if state is None or not aliases or request.method not in SAFE_METHODS or is_pinned(request):
+        return
+    state.read_alias = random.choice(aliases)
+
+
+class ReplicaReadMixin:
+    """Для DRF-представлений, чьи GET можно обслужить с реплики."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # после аутентификации: закрепление за default зависит от пользователя
+        route_reads(request)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        return state.read_alias if state is not None else None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и default
+        return True
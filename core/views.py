@@ -2,16 +2,19 @@ from django.contrib.auth import login, logout
 from rest_framework import generics, status, permissions
 from rest_framework.generics import RetrieveUpdateDestroyAPIView, UpdateAPIView
 from rest_framework.response import Response
+from .authentication import revoke_tokens
+from .middleware import SerializationTimingMixin
+from .models import AuthToken
 from .serializers import RegistrationSerializer, LoginSerializer, ProfileSerializer, USER_MODEL, \
     UpdatePasswordSerializer
 
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(SerializationTimingMixin, generics.CreateAPIView):
     """RegisterView используется для обработки регистрации пользователей."""
     serializer_class = RegistrationSerializer
 
 
-class UserLoginView(generics.GenericAPIView):
+class UserLoginView(SerializationTimingMixin, generics.GenericAPIView):
     """ UserLoginView используется для обработки входа пользователей."""
     serializer_class = LoginSerializer
 
@@ -20,10 +23,11 @@ class UserLoginView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         login(request=request, user=user)
-        return Response(serializer.data)
+        # Токен для заголовка "Authorization: Token <ключ>" (см. core/authentication.py)
+        return Response({**serializer.data, 'token': AuthToken.issue(user)})
 
 
-class ProfileView(RetrieveUpdateDestroyAPIView):
+class ProfileView(SerializationTimingMixin, RetrieveUpdateDestroyAPIView):
     """ProfileView используется для получения, обновления или удаления профиля пользователя.
    """
     serializer_class = ProfileSerializer
@@ -34,15 +38,21 @@ class ProfileView(RetrieveUpdateDestroyAPIView):
         return self.request.user
 
     def delete(self, request, *args, **kwargs):
+        revoke_tokens(request.user)
         logout(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UpdatePasswordView(UpdateAPIView):
+class UpdatePasswordView(SerializationTimingMixin, UpdateAPIView):
     """UpdatePasswordView используется для обновления пароля пользователя."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UpdatePasswordSerializer
 
     def get_object(self):
         """Переопределяем стандартный метод get_object, чтобы всегда возвращать текущего пользователя."""
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # Все выданные токены перестают действовать, клиенту нужно войти заново
+        revoke_tokens(serializer.instance)
@@ -0,0 +1,132 @@
+"""Поддержка таблицы LessonAccess (замыкание "пользователь → доступный урок").
+
+Таблица обновляется из сигналов (courses/signals.py) при изменении ProductAccess,
+ProductLesson и мягком удалении Product. Полная перестройка и проверка расхождений
+выполняются командой rebuild_lesson_access. Каждое изменение сбрасывает кэш прогресса
+(courses/progress.py), который считается по этой таблице.
+"""
+from django.db import connections, router
+from django.db.models.constants import OnConflict
+
+from courses import progress
+from courses.models import LessonAccess, Product, ProductAccess, ProductLesson
+
+BATCH_SIZE = 1000
+
+
+def _insert(rows):
+    LessonAccess.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _insert_select(queryset):
+    """INSERT ... SELECT строк (user_id, product_id, lesson_id) из queryset, пропуская существующие.
+
+    Строки не проходят через Python, поэтому выдача доступа тысячам пользователей к продукту
+    с сотнями уроков (миллионы строк) на порядок быстрее bulk_create.
+    """
+    # Запись и ее источник -- на основной базе: отстающая реплика (core/routers.py) не видит свежих доступов
+    db = router.db_for_write(LessonAccess)
+    connection = connections[db]
+    ops = connection.ops
+    fields = [LessonAccess._meta.get_field(name) for name in ('user', 'product', 'lesson')]
+    select, params = queryset.query.get_compiler(using=db).as_sql()
+    sql = '{} {} ({}) {} {}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(LessonAccess._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        select,
+        ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def lessons_for_user(user):
+    """id уроков, доступных пользователю (подзапрос для фильтра id__in)."""
+    return LessonAccess.objects.filter(user=user).values('lesson_id')
+
+
+def products_for_user(user):
+    """id неудаленных продуктов с уроками, доступных пользователю (подзапрос для фильтра)."""
+    return LessonAccess.objects.filter(user=user).values('product_id')
+
+
+def grant(product_id, user_ids):
+    """Добавляет строки для новых доступов пользователей к продукту (строки ProductAccess уже сохранены).
+
+    user_ids -- список, множество или queryset id.
+    """
+    if Product.all_objects.filter(pk=product_id, is_deleted=True).exists():
+        return
+    if isinstance(user_ids, (list, set, frozenset, tuple)):
+        progress.invalidate_users(user_ids)
+    else:
+        progress.invalidate_all()
+    _insert_select(ProductLesson.objects.filter(
+        product_id=product_id, product__productaccess__user_id__in=user_ids,
+    ).values_list('product__productaccess__user_id', 'product_id', 'lesson_id').distinct().order_by())
+
+
+def revoke(product_id, user_ids):
+    user_ids = list(user_ids)
+    progress.invalidate_users(user_ids)
+    LessonAccess.objects.filter(product_id=product_id, user_id__in=user_ids).delete()
+
+
+def add_lesson(product_id, lesson_id):
+    """Открывает урок всем пользователям с доступом к продукту."""
+    if Product.all_objects.filter(pk=product_id, is_deleted=True).exists():
+        return
+    progress.invalidate_all()
+    user_ids = ProductAccess.objects.filter(product_id=product_id).values_list('user_id', flat=True)
+    _insert(
+        LessonAccess(user_id=user_id, product_id=product_id, lesson_id=lesson_id)
+        for user_id in user_ids.iterator()
+    )
+
+
+def remove_lesson(product_id, lesson_id):
+    # Урок мог быть привязан к продукту несколько раз
+    if not ProductLesson.objects.filter(product_id=product_id, lesson_id=lesson_id).exists():
+        progress.invalidate_all()
+        LessonAccess.objects.filter(product_id=product_id, lesson_id=lesson_id).delete()
+
+
+def remove_products(product_ids):
+    """Убирает строки продуктов (список или подзапрос id), например при массовом мягком удалении."""
+    progress.invalidate_all()
+    LessonAccess.objects.filter(product_id__in=product_ids).delete()
+
+
+def rebuild_product(product_id):
+    """Перестраивает строки одного продукта (например, после восстановления из мягкого удаления)."""
+    progress.invalidate_all()
+    LessonAccess.objects.filter(product_id=product_id).delete()
+    grant(product_id, ProductAccess.objects.filter(product_id=product_id).values_list('user_id', flat=True))
+
+
+def expected_lesson_access():
+    """Эталонное содержимое таблицы, посчитанное через JOIN: (user_id, product_id, lesson_id)."""
+    return ProductLesson.objects.filter(
+        product__is_deleted=False, product__productaccess__isnull=False,
+    ).values_list('product__productaccess__user_id', 'product_id', 'lesson_id').distinct()
+
+
+def rebuild_lesson_access():
+    progress.invalidate_all()
+    LessonAccess.objects.all().delete()
+    batch = []
+    for user_id, product_id, lesson_id in expected_lesson_access().order_by().iterator(chunk_size=BATCH_SIZE):
+        batch.append(LessonAccess(user_id=user_id, product_id=product_id, lesson_id=lesson_id))
+        if len(batch) >= BATCH_SIZE:
+            _insert(batch)
+            batch = []
+    _insert(batch)
+    return LessonAccess.objects.count()
+
+
+def find_lesson_access_drift():
+    """Возвращает (отсутствующие, лишние) строки в виде queryset'ов троек."""
+    expected = expected_lesson_access().order_by()
+    stored = LessonAccess.objects.values_list('user_id', 'product_id', 'lesson_id').order_by()
+    return expected.difference(stored), stored.difference(expected)
@@ -5,8 +5,13 @@ from courses.models import Product
 
 
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("name", "owner", "created", "updated")
+    list_display = ("name", "owner", "is_deleted", "created", "updated")
+    list_filter = ("is_deleted",)
     search_fields = ("name", "owner")
 
+    def get_queryset(self, request):
+        # Удаленные продукты тоже видны, чтобы их можно было восстановить
+        return Product.all_objects.all()
+
 
 admin.site.register(Product, ProductAdmin)
\ No newline at end of file
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoursesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "courses"
+
+    def ready(self):
+        from courses import signals  # noqa: F401
+        from courses.search import ensure_search_indexes
+
+        post_migrate.connect(ensure_search_indexes, sender=self)
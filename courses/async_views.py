@@ -0,0 +1,73 @@
+"""Асинхронные версии самых нагруженных списков для работы под ASGI.
+
+Под ASGI синхронное DRF-представление целиком выполняется в потоке через sync_to_async.
+Здесь в потоке выполняется только подготовка запроса -- аутентификация, права и сборка
+queryset'а (фильтры могут обращаться к БД при валидации), а выборка страницы идет через
+асинхронные методы ORM (acount, async for) и KeysetPagination.apaginate_queryset.
+
+Настройки (сериализатор, фильтры, сортировка, get_queryset) берутся из синхронного
+представления view_class, поэтому ответы не отличаются. Маршруты переключаются на эти
+представления настройкой COURSES_ASYNC_VIEWS (см. tutorials/asgi.py и courses/urls.py).
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from rest_framework.response import Response
+
+from courses.conditional import ConditionalListMixin
+from courses.views import LessonListView, LessonViewListView, ProductListView, ProductStatisticsView
+
+
+class AsyncListView(View):
+    view_class = None
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view_class()
+        view.setup(request, *args, **kwargs)
+        view.args, view.kwargs = args, kwargs
+        view.headers = view.default_response_headers
+        drf_request = view.request = view.initialize_request(request, *args, **kwargs)
+        try:
+            queryset = await sync_to_async(self.prepare)(view, drf_request)
+            response = await self.list(view, queryset)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return view.finalize_response(drf_request, response, *args, **kwargs)
+
+    @staticmethod
+    def prepare(view, request):
+        # Аутентификация, права, троттлинг и фильтры -- синхронные и обращаются к БД
+        view.initial(request)
+        return view.filter_queryset(view.get_queryset())
+
+    @staticmethod
+    async def list(view, queryset):
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view=view)
+        rows = page if page is not None else [obj async for obj in queryset]
+        if isinstance(view, ConditionalListMixin):
+            # Валидатор считается по странице, без запросов к БД
+            not_modified = view.get_not_modified_response(rows)
+            if not_modified is not None:
+                return not_modified
+        if page is not None:
+            response = view.get_paginated_response(view.get_serializer(page, many=True).data)
+        else:
+            response = Response(view.get_serializer(rows, many=True).data)
+        if getattr(view, 'etag', None) is not None:
+            response['ETag'] = view.etag
+        return response
+
+
+class AsyncProductListView(AsyncListView):
+    view_class = ProductListView
+
+
+class AsyncLessonListView(AsyncListView):
+    view_class = LessonListView
+
+
+class AsyncLessonViewListView(AsyncListView):
+    view_class = LessonViewListView
+
+
+class AsyncProductStatisticsView(AsyncListView):
+    view_class = ProductStatisticsView
@@ -0,0 +1,141 @@
+"""Буфер отложенной записи прогресса просмотра (write-behind).
+
+Плееры присылают прогресс каждые несколько секунд. Вместо UPDATE на каждый отчет
+буфер сворачивает отчеты по (пользователь, урок), оставляя максимальную длительность,
+и сбрасывает их в БД пачкой (courses.ingestion.upsert_progress) по таймеру
+или при заполнении. При остановке процесса буфер сбрасывается синхронно, поэтому
+теряются только отчеты за последний FLUSH_INTERVAL при аварийном завершении. Ошибка
+сброса не возвращается клиенту, чей отчет уже принят: отчеты остаются в буфере, и сброс
+повторяется по таймеру.
+
+Буфер живет в памяти процесса, и несброшенный прогресс виден только запросам того же
+процесса (BufferedProgressMixin в courses/views.py). Запрос, попавший в другой процесс
+сервера, до сброса видит значение из БД, то есть отстающее не больше чем на FLUSH_INTERVAL.
+
+Настройки -- словарь LESSON_VIEW_BUFFER в settings.py.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+
+from courses.ingestion import upsert_progress
+from courses.lesson_cache import lesson_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    def __init__(self, enabled=False, flush_interval=2.0, max_size=1000):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # user_id -> {lesson_id: (view_duration, lesson_duration)}
+        self._size = 0
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'LESSON_VIEW_BUFFER', {})
+        return cls(
+            enabled=options.get('ENABLED', False),
+            flush_interval=options.get('FLUSH_INTERVAL', 2.0),
+            max_size=options.get('MAX_SIZE', 1000),
+        )
+
+    def add(self, user_id, lesson_id, view_duration, lesson_duration):
+        """Добавляет отчет о прогрессе; значение уже провалидировано по длительности урока."""
+        self._ensure_started()
+        with self._lock:
+            lessons = self._pending.setdefault(user_id, {})
+            current = lessons.get(lesson_id)
+            if current is None:
+                self._size += 1
+            if current is None or view_duration > current[0]:
+                lessons[lesson_id] = (view_duration, lesson_duration)
+            full = self._size >= self.max_size
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                pass  # уже залогировано; отчеты в буфере, сброс повторит фоновый поток
+
+    def discard(self, user_id, lesson_id):
+        """Забывает несброшенный прогресс (например, при удалении записи о просмотре)."""
+        with self._lock:
+            if self._pending.get(user_id, {}).pop(lesson_id, None) is not None:
+                self._size -= 1
+
+    def pending_for_user(self, user_id):
+        """Несброшенный прогресс пользователя: {lesson_id: view_duration}."""
+        with self._lock:
+            return {lesson_id: value[0] for lesson_id, value in self._pending.get(user_id, {}).items()}
+
+    def __len__(self):
+        return self._size
+
+    def flush(self):
+        """Сбрасывает накопленные отчеты в БД. Возвращает количество записанных пар."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._size = self._pending, {}, 0
+            if not pending:
+                return 0
+            progress = {}
+            durations = {}
+            for user_id, lessons in pending.items():
+                for lesson_id, (view_duration, lesson_duration) in lessons.items():
+                    progress[(user_id, lesson_id)] = view_duration
+                    durations[lesson_id] = lesson_duration
+            # урок могли удалить, пока отчет лежал в буфере
+            existing = set(lesson_cache.get_many(list(durations)))
+            progress = {key: value for key, value in progress.items() if key[1] in existing}
+            try:
+                upsert_progress(progress, durations)
+            except Exception:
+                logger.exception("Не удалось сбросить буфер прогресса, отчеты возвращены в буфер")
+                self._restore(pending)
+                raise
+            return len(progress)
+
+    def _restore(self, pending):
+        with self._lock:
+            for user_id, lessons in pending.items():
+                for lesson_id, (view_duration, lesson_duration) in lessons.items():
+                    current = self._pending.setdefault(user_id, {}).get(lesson_id)
+                    if current is None:
+                        self._size += 1
+                    if current is None or view_duration > current[0]:
+                        self._pending[user_id][lesson_id] = (view_duration, lesson_duration)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='lesson-view-buffer', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # уже залогировано, повторим на следующем тике
+            finally:
+                from django.db import connection
+                connection.close()  # поток живет долго, не держим соединение между сбросами
+
+    def shutdown(self):
+        """Останавливает фоновый поток и синхронно сбрасывает остаток."""
+        self._stopped.set()
+        self.flush()
+
+
+progress_buffer = ProgressBuffer.from_settings()
@@ -0,0 +1,79 @@
+"""Условные GET-запросы (ETag / Last-Modified) для списков и отдельных объектов.
+
+Валидатор списка считается по отдаваемой странице без отдельных запросов: (id, updated)
+ее строк и общее количество, которое пагинация limit/offset и так считает для ответа.
+Изменение строки меняет ее updated, добавление и удаление (в т.ч. мягкое удаление продукта,
+выдача и отзыв доступа для списков по LessonAccess) -- состав страницы или количество.
+Строка запроса и пользователь тоже входят в ETag, поэтому разные страницы, сортировки
+и поиски не путаются. 304 экономит сериализацию и передачу ответа, а не выборку страницы.
+
+В keyset-режиме пагинации (?pagination=cursor, ?cursor=) ETag не отдается: COUNT там не
+выполняется, а без него валидатор страницы не заметил бы строк, добавленных за ней.
+
+У списков отдается только ETag: max(updated) не меняется при удалении, поэтому
+Last-Modified был бы неверным валидатором. У объектов отдаются оба заголовка.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts):
+    raw = '|'.join(str(part) for part in (request.get_full_path(), request.user.pk, *parts))
+    return 'W/' + quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+class ConditionalListMixin:
+    """Отвечает 304 на GET списка, если If-None-Match совпадает с ETag страницы, не выполняя
+    сериализацию."""
+    etag = None
+
+    def get_list_etag(self, rows):
+        """ETag страницы rows или None, если валидатор посчитать нельзя (keyset-режим)."""
+        paginator = self.paginator
+        if paginator is not None and getattr(paginator, 'keyset', False):
+            return None
+        count = getattr(paginator, 'count', None) if paginator is not None else None
+        return make_etag(self.request, count, *((row.pk, row.updated.isoformat()) for row in rows))
+
+    def get_not_modified_response(self, rows):
+        """Ответ 304 или None; ETag запоминается для заголовка ответа."""
+        self.etag = self.get_list_etag(rows)
+        if self.etag is None:
+            return None
+        return get_conditional_response(self.request, etag=self.etag)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        not_modified = self.get_not_modified_response(rows)
+        if not_modified is not None:
+            return not_modified
+
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(rows, many=True).data)
+        if self.etag is not None:
+            response['ETag'] = self.etag
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """ETag и Last-Modified объекта по его updated; 304 без сериализации."""
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request, instance.pk, instance.updated.isoformat())
+        last_modified = int(instance.updated.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
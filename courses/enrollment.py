@@ -0,0 +1,98 @@
+"""Массовая выдача и отзыв доступов к продукту (product-access/bulk-grant/, product-access/bulk-revoke/).
+
+Пользователи обрабатываются пачками по CHUNK_SIZE в одной транзакции: на пачку -- запрос
+существующих пользователей и доступов, bulk_create(ignore_conflicts=True) и строки
+LessonAccess. Удаление -- DELETE на пачку без загрузки объектов. Сигналы ProductAccess
+(courses/signals.py) при этом не срабатывают, поэтому таблица LessonAccess обновляется здесь
+же, а число студентов продукта в конце операции пересчитывается одним COUNT.
+"""
+import itertools
+
+from django.db import connections, router, transaction
+
+from core.models import User
+from courses import access, statistics
+from courses.models import ProductAccess
+
+CHUNK_SIZE = 5000
+
+
+def _chunks(user_ids):
+    iterator = iter(user_ids)
+    return iter(lambda: list(itertools.islice(iterator, CHUNK_SIZE)), [])
+
+
+def users_by_email_domain(domain):
+    """id пользователей с адресом в домене domain (без учета регистра)."""
+    return User.objects.filter(email__iendswith=f"@{domain.lstrip('@')}").values_list('pk', flat=True)
+
+
+def grant_product_access(product_id, user_ids):
+    """Выдает доступ к продукту; user_ids -- итерируемое или queryset id.
+
+    Возвращает счетчики: requested -- сколько id передано, created -- выданные доступы,
+    existing -- доступ уже был, unknown -- нет такого пользователя.
+    """
+    result = {'requested': 0, 'created': 0, 'existing': 0, 'unknown': 0}
+    if hasattr(user_ids, 'iterator'):
+        user_ids = user_ids.iterator(chunk_size=CHUNK_SIZE)
+    with transaction.atomic():
+        for chunk in _chunks(user_ids):
+            chunk = set(chunk)
+            known = set(User.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+            existing = set(ProductAccess.objects.filter(
+                product_id=product_id, user_id__in=known,
+            ).values_list('user_id', flat=True))
+            new = known - existing
+            ProductAccess.objects.bulk_create(
+                [ProductAccess(product_id=product_id, user_id=user_id) for user_id in new], ignore_conflicts=True,
+            )
+            access.grant(product_id, new)
+            result['requested'] += len(chunk)
+            result['created'] += len(new)
+            result['existing'] += len(existing)
+            result['unknown'] += len(chunk - known)
+        # Параллельная выдача могла вставить часть строк раньше (ignore_conflicts их пропустил),
+        # поэтому число студентов пересчитывается по таблице, а не по размеру new
+        statistics.recount_students(product_id)
+    return result
+
+
+def _delete_accesses(product_id, user_ids):
+    """DELETE доступов без загрузки строк. QuerySet.delete() загрузил бы строки ради post_delete
+    (courses/signals.py), а их действие -- LessonAccess и статистика -- выполняется пачкой.
+    id пользователей делятся по лимиту параметров запроса (ops.bulk_batch_size)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    connection = connections[router.db_for_write(ProductAccess)]
+    quote = connection.ops.quote_name
+    product_column = ProductAccess._meta.get_field('product').column
+    user_field = ProductAccess._meta.get_field('user')
+    step = connection.ops.bulk_batch_size([user_field], user_ids) or len(user_ids)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for offset in range(0, len(user_ids), step):
+            batch = user_ids[offset:offset + step]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {quote(ProductAccess._meta.db_table)} '
+                f'WHERE {quote(product_column)} = %s AND {quote(user_field.column)} IN ({placeholders})',
+                [product_id, *batch],
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+def revoke_product_access(product_id, user_ids):
+    """Отзывает доступ к продукту. Возвращает счетчики requested и deleted."""
+    result = {'requested': 0, 'deleted': 0}
+    if hasattr(user_ids, 'iterator'):
+        user_ids = user_ids.iterator(chunk_size=CHUNK_SIZE)
+    with transaction.atomic():
+        for chunk in _chunks(user_ids):
+            access.revoke(product_id, chunk)
+            result['deleted'] += _delete_accesses(product_id, set(chunk))
+            result['requested'] += len(chunk)
+        statistics.recount_students(product_id)
+    return result
@@ -0,0 +1,12 @@
+from django_filters import rest_framework as django_filters
+
+from courses.models import LessonView
+
+
+class LessonViewFilter(django_filters.FilterSet):
+    """Фильтры списка просмотров. status вычисляется в БД (LessonView.objects.with_status())."""
+    status = django_filters.ChoiceFilter(choices=LessonView.STATUS_CHOICES)
+
+    class Meta:
+        model = LessonView
+        fields = ['lesson', 'status']
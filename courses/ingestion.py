@@ -0,0 +1,122 @@
+"""Пакетная запись прогресса просмотра уроков.
+
+Плееры присылают прогресс часто, поэтому пачка пар (урок, длительность) записывается
+несколькими запросами на всю пачку вместо отдельного INSERT на каждую пару. Сохраняется
+максимальная длительность: повторный отчет с меньшим значением не откатывает прогресс назад.
+
+Правило максимума и дельты статистики не зависят от чтения до записи, которое параллельная
+пачка могла бы опередить:
+1. INSERT ... ON CONFLICT DO NOTHING RETURNING -- новые строки, прежнее значение 0;
+2. SELECT ... FOR UPDATE остальных строк -- теперь все они существуют и блокируются
+   (PostgreSQL), в SQLite запись уже держит блокировку базы после шага 1;
+3. UPDATE с MAX(view_duration, новое значение) в SQL только для строк, где значение растет.
+Дельты статистики и события журнала считаются по строкам шагов 1 и 3.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from courses import statistics, view_events
+from courses.models import LessonView
+from courses.progress import invalidate_users
+
+
+def merge_progress(pairs):
+    """Сворачивает пары (lesson_id, view_duration), оставляя максимум по каждому уроку."""
+    merged = {}
+    for lesson_id, view_duration in pairs:
+        if view_duration > merged.get(lesson_id, -1):
+            merged[lesson_id] = view_duration
+    return merged
+
+
+def upsert_lesson_views(user_id, progress, lesson_durations):
+    """Записывает прогресс пользователя одной пачкой (см. upsert_progress).
+
+    progress -- {lesson_id: view_duration}, lesson_durations -- {lesson_id: duration}
+    (значения уже провалидированы). Возвращает счетчики created/updated/unchanged.
+    """
+    return upsert_progress(
+        {(user_id, lesson_id): view_duration for lesson_id, view_duration in progress.items()}, lesson_durations
+    )
+
+
+def _insert_missing(progress, db):
+    """INSERT новых пар (user_id, lesson_id) с пропуском существующих; возвращает множество вставленных пар."""
+    connection = connections[db]
+    ops = connection.ops
+    fields = [LessonView._meta.get_field(name) for name in ('user', 'lesson', 'view_duration', 'created', 'updated')]
+    now = timezone.now()
+    rows = [(user_id, lesson_id, view_duration, now, now) for (user_id, lesson_id), view_duration in progress.items()]
+    created = set()
+    batch_size = ops.bulk_batch_size(fields, rows) or len(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = '{} {} ({}) VALUES {} {} RETURNING {}, {}'.format(
+                ops.insert_statement(on_conflict=OnConflict.IGNORE),
+                ops.quote_name(LessonView._meta.db_table),
+                ', '.join(ops.quote_name(field.column) for field in fields),
+                ', '.join(['({})'.format(', '.join(['%s'] * len(fields)))] * len(batch)),
+                ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+                ops.quote_name(fields[0].column),
+                ops.quote_name(fields[1].column),
+            )
+            params = [field.get_db_prep_save(value, connection) for row in batch for field, value in zip(fields, row)]
+            cursor.execute(sql, params)
+            created.update((user_id, lesson_id) for user_id, lesson_id in cursor.fetchall())
+    return created
+
+
+def upsert_progress(progress, lesson_durations):
+    """То же для нескольких пользователей: progress -- {(user_id, lesson_id): view_duration}."""
+    result = {'created': 0, 'updated': 0, 'unchanged': 0}
+    if not progress:
+        return result
+
+    # Запись и ее транзакция -- на основной базе, даже если чтение уходит на реплику (core/routers.py)
+    db = router.db_for_write(LessonView)
+    with transaction.atomic(using=db):
+        created = _insert_missing(progress, db)
+        changes = [(user_id, lesson_id, None, progress[user_id, lesson_id]) for user_id, lesson_id in created]
+
+        existing = LessonView.objects.using(db).select_for_update().filter(
+            user_id__in=list({user_id for user_id, _ in progress}),
+            lesson_id__in=list({lesson_id for _, lesson_id in progress}),
+        ).values_list('pk', 'user_id', 'lesson_id', 'view_duration') if len(created) < len(progress) else []
+        grown = {}
+        for pk, user_id, lesson_id, previous in existing:
+            key = (user_id, lesson_id)
+            if key not in progress or key in created:
+                continue
+            if previous >= progress[key]:
+                result['unchanged'] += 1
+                continue
+            grown[pk] = progress[key]
+            changes.append((user_id, lesson_id, previous, progress[key]))
+        if grown:
+            LessonView.objects.using(db).filter(pk__in=list(grown)).update(view_duration=Greatest(
+                F('view_duration'),
+                Case(*[When(pk=pk, then=Value(value)) for pk, value in grown.items()],
+                     output_field=PositiveIntegerField()),
+            ))
+        result['created'] = len(created)
+        result['updated'] = len(grown)
+
+        if changes:
+            deltas = {}
+            for user_id, lesson_id, previous, view_duration in changes:
+                duration = lesson_durations[lesson_id]
+                old_count, old_time = (0, 0) if previous is None else statistics.view_contribution(previous, duration)
+                new_count, new_time = statistics.view_contribution(view_duration, duration)
+                count, time = deltas.get(lesson_id, (0, 0))
+                deltas[lesson_id] = (count + new_count - old_count, time + new_time - old_time)
+            statistics.apply_lesson_view_deltas(deltas)
+            view_events.record([
+                (user_id, lesson_id, previous or 0, view_duration, lesson_durations[lesson_id])
+                for user_id, lesson_id, previous, view_duration in changes
+            ])
+            invalidate_users({user_id for user_id, *_ in changes})
+    return result
@@ -0,0 +1,145 @@
+"""Кэш метаданных уроков (длительность, название, ссылка) в памяти процесса.
+
+Длительность урока нужна при каждой записи прогресса (проверка view_duration) и при
+расчете статуса просмотра; кэш избавляет от отдельного запроса к Lesson на каждую
+запись. Размер ограничен (LRU), промахи добираются одним запросом на пачку id.
+
+Инвалидация: сохранение и удаление урока (courses/signals.py) сразу убирают его из кэша
+текущего процесса и увеличивают номер версии в общем кэше Django. Остальные процессы
+сверяют версию не чаще раза в VERSION_CHECK_INTERVAL секунд и при расхождении очищают
+свой кэш целиком: уроки меняются редко. Для нескольких процессов нужен общий бэкенд
+CACHES (CACHE_URL, см. core/database.py); с LocMemCache версия видна только своему процессу,
+и устаревание ограничено временем жизни записи TTL. От длительности урока зависят проверка
+LessonView.save и дельты статистики в сигналах, поэтому TTL короткий.
+
+Попадания и промахи считаются в метрике lesson_cache_requests_total (core.metrics)
+и в stats(). Настройки -- словарь LESSON_CACHE в settings.py.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from core import metrics
+
+# Порядок полей совпадает с порядком полей Lesson (для Lesson.from_db в as_instance)
+LessonMeta = namedtuple('LessonMeta', ['id', 'title', 'video_url', 'duration'])
+VERSION_KEY = 'courses:lesson-metadata-version'
+
+
+class LessonMetadataCache:
+    def __init__(self, max_size=10000, version_check_interval=1.0, ttl=30.0):
+        self.max_size = max_size
+        self.version_check_interval = version_check_interval
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # lesson_id -> (LessonMeta, момент истечения по time.monotonic)
+        self._version = None
+        self._next_check = 0.0
+        self._epoch = 0  # растет при каждой инвалидации в процессе
+
+    def get(self, lesson_id):
+        """LessonMeta урока или None, если урока нет."""
+        return self.get_many([lesson_id]).get(lesson_id)
+
+    def get_many(self, lesson_ids):
+        """{lesson_id: LessonMeta} для существующих уроков; промахи -- одним запросом."""
+        self._check_version()
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for lesson_id in lesson_ids:
+                entry = self._entries.get(lesson_id)
+                if entry is None:
+                    continue
+                if entry[1] < now:
+                    del self._entries[lesson_id]
+                    continue
+                self._entries.move_to_end(lesson_id)
+                found[lesson_id] = entry[0]
+            epoch = self._epoch
+        missing = {lesson_id for lesson_id in lesson_ids if lesson_id not in found}
+        self._count(len(found), len(missing))
+        if not missing:
+            return found
+
+        Lesson = apps.get_model('courses', 'Lesson')
+        # С основной базы: отстающая реплика (core/routers.py) вернула бы урок до инвалидации
+        lessons = Lesson.objects.using(router.db_for_write(Lesson)).filter(id__in=missing).order_by()
+        loaded = {row[0]: LessonMeta(*row) for row in lessons.values_list(*LessonMeta._fields)}
+        with self._lock:
+            # Урок могли изменить, пока шел запрос: такие строки не кэшируются
+            if epoch == self._epoch:
+                expires = time.monotonic() + self.ttl
+                self._entries.update((lesson_id, (meta, expires)) for lesson_id, meta in loaded.items())
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def get_instance(self, lesson_id):
+        """Урок моделью без запроса к БД (created/updated загрузятся при обращении) или None."""
+        meta = self.get(lesson_id)
+        if meta is None:
+            return None
+        return apps.get_model('courses', 'Lesson').from_db(None, LessonMeta._fields, meta)
+
+    def invalidate(self, lesson_id):
+        """Убирает урок из кэша процесса и сообщает об изменении остальным процессам."""
+        self._discard(lesson_id)
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            if not cache.add(VERSION_KEY, 1):
+                cache.incr(VERSION_KEY)
+        # Другой поток мог прочитать старую строку до фиксации транзакции и закэшировать ее
+        transaction.on_commit(lambda: self._discard(lesson_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _discard(self, lesson_id):
+        with self._lock:
+            self._entries.pop(lesson_id, None)
+            self._epoch += 1
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            metrics.registry.inc('lesson_cache_requests_total', (('result', 'hit'),), hits)
+        if misses:
+            metrics.registry.inc('lesson_cache_requests_total', (('result', 'miss'),), misses)
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        version = cache.get(VERSION_KEY, 0)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._epoch += 1
+                self._version = version
+            self._next_check = now + self.version_check_interval
+
+
+_options = getattr(settings, 'LESSON_CACHE', {})
+lesson_cache = LessonMetadataCache(
+    max_size=_options.get('MAX_SIZE', 10000),
+    version_check_interval=_options.get('VERSION_CHECK_INTERVAL', 1.0),
+    ttl=_options.get('TTL', 30.0),
+)
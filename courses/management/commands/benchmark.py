@@ -0,0 +1,219 @@
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db.models import Count
+
+from core.models import AuthToken, User
+from core.urls import urlpatterns as core_urlpatterns
+from courses.models import Lesson, LessonAccess, LessonView, Product, ProductAccess, ProductLesson
+from courses.urls import urlpatterns as courses_urlpatterns
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест всех маршрутов courses.urls и core.urls по HTTP с конкурентными клиентами: "
+            "запросы в секунду и p50/p95/p99 по каждому маршруту. Без --url поднимает многопоточный "
+            "WSGI-сервер Django в процессе. Результат можно сохранить (--output) и сравнить с прошлым (--compare).")
+
+    # Маршруты, которые не нагружаются, и почему. Новый маршрут без сценария -- ошибка.
+    SKIPPED = {
+        'core/update_password': "отзывает токены, под которыми идет тест",
+        'product-access/create/': "уникальная пара (продукт, пользователь) не повторяется",
+        'product-access/bulk-grant/': "меняет доступы; замер массовой выдачи -- benchmark_bulk_access",
+        'product-access/bulk-revoke/': "меняет доступы; замер массового отзыва -- benchmark_bulk_access",
+        'lesson-views/create/': "уникальная пара (урок, пользователь); запись прогресса покрыта lesson-views/batch/",
+    }
+    WRITES = {
+        'products/create/', 'lessons/create/', 'product-lessons/create/', 'lesson-views/batch/',
+        'core/signup', 'core/login',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Адрес запущенного сервера (например, http://127.0.0.1:8000).")
+        parser.add_argument('--user', type=int, help="id пользователя; по умолчанию владелец большинства продуктов.")
+        parser.add_argument('--requests', type=int, default=200, help="Запросов на маршрут.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Одновременных клиентов.")
+        parser.add_argument('--writes', action='store_true',
+                            help="Нагружать и создающие маршруты (оставляют данные в БД).")
+        parser.add_argument('--password', default='seed-password',
+                            help="Пароль пользователя для core/login (по умолчанию пароль seed_data).")
+        parser.add_argument('--only', help="Подстрока: нагружать только подходящие маршруты.")
+        parser.add_argument('--output', help="Сохранить результаты в JSON.")
+        parser.add_argument('--compare', help="JSON прошлого запуска для сравнения.")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        scenarios = self.build_scenarios(user, options['password'])
+        routes = [str(pattern.pattern) for pattern in [*courses_urlpatterns, *core_urlpatterns]]
+        missing = [route for route in routes if route not in scenarios and route not in self.SKIPPED]
+        if missing:
+            raise CommandError(f"Нет сценария для маршрутов: {', '.join(missing)}")
+        for route, reason in self.SKIPPED.items():
+            self.stdout.write(f"пропущен {route}: {reason}")
+
+        server = None
+        if options['url']:
+            address = urlsplit(options['url'])
+            host, port = address.hostname, address.port or 80
+        else:
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+            server.set_app(get_internal_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            host, port = server.server_address[:2]
+
+        # Токены, выданные после этой отметки (свой и от сценария core/login), удаляются после прогона
+        last_token = AuthToken.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        token = AuthToken.issue(user)
+        results = {}
+        try:
+            for route in routes:
+                if route in self.SKIPPED or (route in self.WRITES and not options['writes']):
+                    continue
+                if options['only'] and options['only'] not in route:
+                    continue
+                results[route] = self.run_route(host, port, token, scenarios[route], options)
+                self.print_result(route, results[route])
+        finally:
+            AuthToken.objects.filter(user=user, pk__gt=last_token).delete()
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                self.compare(json.load(baseline), results)
+
+    def get_user(self, user_id):
+        if user_id:
+            user = User.objects.filter(pk=user_id).first()
+        else:
+            owner = Product.objects.values('owner').annotate(total=Count('id')).order_by('-total').first()
+            user = User.objects.filter(pk=owner['owner']).first() if owner else None
+        if user is None:
+            raise CommandError("Нет пользователя с продуктами; заполните БД командой seed_data.")
+        return user
+
+    def build_scenarios(self, user, password):
+        """Маршрут -> функция, возвращающая (метод, путь, тело) для очередного запроса."""
+        product = Product.objects.filter(owner=user).first()
+        lesson_access = LessonAccess.objects.filter(user=user).first()
+        ids = {
+            'products/<int:pk>/': product and product.pk,
+            'product-access/<int:pk>/': ProductAccess.objects.filter(user=user).values_list('pk', flat=True).first(),
+            'lessons/<int:pk>/': lesson_access and lesson_access.lesson_id,
+            'product-lessons/<int:pk>/': ProductLesson.objects.filter(
+                product_id__in=LessonAccess.objects.filter(user=user).values('product_id')
+            ).values_list('pk', flat=True).first(),
+            'lesson-views/<int:pk>/': LessonView.objects.filter(user=user).values_list('pk', flat=True).first(),
+        }
+        missing = [route for route, pk in ids.items() if pk is None]
+        if missing:
+            raise CommandError(f"У пользователя {user.pk} нет данных для {', '.join(missing)}.")
+        counter = iter(range(10 ** 9))
+        lesson = Lesson.objects.filter(pk=ids['lessons/<int:pk>/']).first()
+
+        def get(path):
+            return lambda: ('GET', path, None)
+
+        scenarios = {route: get('/' + route.replace('<int:pk>', str(pk))) for route, pk in ids.items()}
+        scenarios.update({
+            'products/': get('/products/?limit=20'),
+            'product-access/': get('/product-access/?limit=20'),
+            'lessons/': get('/lessons/?limit=20'),
+            'product-lessons/': get('/product-lessons/?limit=20'),
+            'lesson-views/': get('/lesson-views/?limit=20'),
+            'products/statistics/': get('/products/statistics/?owner=me&limit=20'),
+            'lesson-views/export/': get('/lesson-views/export/'),
+            'products/statistics/export/': get('/products/statistics/export/?owner=me&export_format=ndjson'),
+            'products/progress/': get('/products/progress/'),
+            'core/profile': get('/core/profile'),
+            'products/create/': lambda: ('POST', '/products/create/', {
+                'name': f'benchmark {next(counter)}', 'owner': user.pk,
+            }),
+            'lessons/create/': lambda: ('POST', '/lessons/create/', {
+                'title': f'benchmark {next(counter)}', 'video_url': 'https://example.com/video', 'duration': 600,
+            }),
+            'product-lessons/create/': lambda: ('POST', '/product-lessons/create/', {
+                'product': product.pk, 'lesson': lesson.pk,
+            }),
+            'lesson-views/batch/': lambda: ('POST', '/lesson-views/batch/', {
+                'views': [{'lesson': lesson.pk, 'view_duration': next(counter) % (lesson.duration + 1)}],
+            }),
+            'core/signup': lambda: ('POST', '/core/signup', {
+                'username': f'benchmark-{time.time_ns()}-{next(counter)}', 'email': 'benchmark@example.com',
+                'password': 'Benchmark-pass-1', 'password_repeat': 'Benchmark-pass-1',
+            }),
+            'core/login': lambda: ('POST', '/core/login', {'username': user.username, 'password': password}),
+        })
+        return scenarios
+
+    def run_route(self, host, port, token, scenario, options):
+        def call(_):
+            method, path, body = scenario()
+            headers = {'Authorization': f'Token {token}', 'Content-Type': 'application/json'}
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except OSError:
+                status = 0
+            finally:
+                connection.close()
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            calls = list(executor.map(call, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for _, latency in calls]
+        return {
+            'requests': len(calls),
+            'errors': sum(status == 0 or status >= 500 for status, _ in calls),
+            'client_errors': sum(400 <= status < 500 for status, _ in calls),
+            'rps': len(calls) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+
+    def print_result(self, route, result):
+        line = (f"{route:28} {result['rps']:8.1f} req/s  p50 {result['p50'] * 1000:7.1f}ms  "
+                f"p95 {result['p95'] * 1000:7.1f}ms  p99 {result['p99'] * 1000:7.1f}ms  "
+                f"4xx {result['client_errors']}  errors {result['errors']}")
+        self.stdout.write(self.style.ERROR(line) if result['errors'] else line)
+
+    def compare(self, baseline, results):
+        self.stdout.write("\nСравнение с прошлым запуском (изменение, %):")
+        for route, result in results.items():
+            before = baseline.get(route)
+            if before is None:
+                continue
+            changes = {
+                metric: (result[metric] - before[metric]) * 100 / before[metric] if before[metric] else 0.0
+                for metric in ('rps', 'p50', 'p95', 'p99')
+            }
+            self.stdout.write(
+                f"{route:28} rps {changes['rps']:+7.1f}  p50 {changes['p50']:+7.1f}  "
+                f"p95 {changes['p95']:+7.1f}  p99 {changes['p99']:+7.1f}"
+            )
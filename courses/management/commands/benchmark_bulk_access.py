@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from core.models import User
+from courses.enrollment import grant_product_access, revoke_product_access
+from courses.models import LessonAccess, Product, ProductAccess, ProductLesson
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает массовую выдачу и отзыв доступа к продукту (product-access/bulk-grant/, bulk-revoke/) "
+            "с созданием доступов по одному, как через product-access/create/. Изменения откатываются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Сколько пользователей зачислить.")
+        parser.add_argument('--single', type=int, default=500,
+                            help="Сколько доступов создать по одному (время экстраполируется на --users).")
+        parser.add_argument('--product', type=int, help="id продукта; по умолчанию продукт с наибольшим числом уроков.")
+
+    def handle(self, *args, **options):
+        product = self.get_product(options['product'])
+        lessons = ProductLesson.objects.filter(product=product).count()
+        user_ids = list(
+            User.objects.exclude(productaccess__product=product).values_list('pk', flat=True)[:options['users']]
+        )
+        if not user_ids:
+            raise CommandError("Нет пользователей без доступа к продукту; заполните БД командой seed_data.")
+        self.stdout.write(f"продукт {product.pk}: уроков {lessons}, пользователей {len(user_ids)}")
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                result = grant_product_access(product.pk, user_ids)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"bulk-grant: {elapsed:.2f}s, {result}, строк LessonAccess: "
+                    f"{LessonAccess.objects.filter(product=product).count()}"
+                )
+                started = time.perf_counter()
+                result = revoke_product_access(product.pk, user_ids)
+                self.stdout.write(f"bulk-revoke: {time.perf_counter() - started:.2f}s, {result}")
+
+                sample = user_ids[:options['single']]
+                started = time.perf_counter()
+                for user_id in sample:
+                    ProductAccess.objects.create(product=product, user_id=user_id)
+                single = (time.perf_counter() - started) / len(sample)
+                self.stdout.write(
+                    f"по одному: {single * 1000:.2f}ms на доступ, ~{single * len(user_ids):.1f}s "
+                    f"на {len(user_ids)} (x{single * len(user_ids) / elapsed:.1f} к bulk-grant)"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def get_product(self, product_id):
+        products = Product.objects.all()
+        if product_id:
+            products = products.filter(pk=product_id)
+        else:
+            products = products.alias(lessons=Count('productlesson')).order_by('-lessons')
+        product = products.first()
+        if product is None:
+            raise CommandError("Продукт не найден.")
+        return product
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections, transaction
+
+ALIAS = 'benchmark_db_writes'
+# Профиль до введения core/database.py: настройки Django и sqlite3 по умолчанию
+BASELINE = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}, 'PRAGMAS': {}}
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность конкурентной записи в SQLite с профилем по умолчанию "
+            "(журнал DELETE, BEGIN DEFERRED, новое соединение на запрос) и с профилем из настроек "
+            "(WAL, PRAGMA, BEGIN IMMEDIATE, постоянные соединения). Каждый поток имитирует запросы: чтение строки и обновление "
+            "счетчика в транзакции. Запись идет во временный файл базы, рабочая база не меняется.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=5.0, help="Длительность замера каждого профиля.")
+        parser.add_argument('--rows', type=int, default=1000, help="Строк в таблице, которые обновляют потоки.")
+
+    def handle(self, *args, **options):
+        default = connections['default'].settings_dict
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("Замер рассчитан на SQLite; серверные базы не блокируют файл на запись.")
+        profile = {key: default.get(key) for key in BASELINE}
+        results = {}
+        for title, overrides in (('по умолчанию', BASELINE), ('профиль', profile)):
+            with tempfile.TemporaryDirectory() as directory:
+                self.configure(os.path.join(directory, 'benchmark.sqlite3'), overrides)
+                try:
+                    results[title] = self.run(options)
+                finally:
+                    self.release()
+            writes, errors, elapsed = results[title]
+            self.stdout.write(
+                f"{title:13} {writes / elapsed:8.0f} записей/s  ({writes} за {elapsed:.1f}s, "
+                f"ошибок блокировки: {errors})"
+            )
+        baseline = results['по умолчанию']
+        tuned = results['профиль']
+        self.stdout.write(self.style.SUCCESS(
+            f"ускорение: x{(tuned[0] / tuned[2]) / max(baseline[0] / baseline[2], 1e-9):.1f}"
+        ))
+
+    def configure(self, name, overrides):
+        config = {**connections['default'].settings_dict, **overrides, 'NAME': name}
+        config['OPTIONS'] = dict(config['OPTIONS'] or {})
+        connections.settings[ALIAS] = config
+
+    def release(self):
+        connections[ALIAS].close()
+        del connections[ALIAS]
+        del connections.settings[ALIAS]
+
+    def run(self, options):
+        rows = options['rows']
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            cursor.executemany('INSERT INTO counter (id, value) VALUES (%s, 0)', [(i,) for i in range(rows)])
+        connections[ALIAS].close()
+
+        deadline = time.perf_counter() + options['seconds']
+        totals = {'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            writes = errors = 0
+            row = seed
+            while time.perf_counter() < deadline:
+                # Как обработка запроса: соединение закрывается по CONN_MAX_AGE в начале и в конце
+                close_old_connections()
+                row = (row * 7919 + 1) % rows
+                try:
+                    with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter WHERE id = %s', [row])
+                        cursor.execute('UPDATE counter SET value = value + 1 WHERE id = %s', [row])
+                    writes += 1
+                except DatabaseError:
+                    errors += 1
+                close_old_connections()
+            connections[ALIAS].close()
+            with lock:
+                totals['writes'] += writes
+                totals['errors'] += errors
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['writes'], totals['errors'], time.perf_counter() - started
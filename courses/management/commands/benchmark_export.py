@@ -0,0 +1,59 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.export import CHUNK_SIZE, stream_rows
+from courses.models import LessonView
+from courses.serializers import LessonViewSerializer
+from courses.views import LessonViewExportView
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пик памяти (tracemalloc) и время потоковой выгрузки просмотров (lesson-views/export/) "
+            "с построением полного списка через сериализатор, на первых N строках таблицы просмотров. "
+            "Время и память замеряются отдельными проходами: tracemalloc замедляет выполнение в разы.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+        parser.add_argument('--export-format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--list-max', type=int, default=100_000,
+                            help="Наибольшее N для полного списка (он держит все строки в памяти).")
+
+    def handle(self, *args, **options):
+        total = LessonView.objects.count()
+        if not total:
+            raise CommandError("Таблица просмотров пуста; заполните БД командой seed_data.")
+        view = LessonViewExportView()
+        view.pending = {}
+
+        for rows in sorted(options['rows']):
+            rows = min(rows, total)
+            queryset = LessonView.objects.with_status().order_by('id')[:rows]
+
+            def stream():
+                values = queryset.values_list(*view.export_fields).iterator(chunk_size=CHUNK_SIZE)
+                return sum(len(chunk.encode()) for chunk in stream_rows(
+                    map(view.export_row, values), view.export_headers, options['export_format']
+                ))
+
+            def full_list():
+                return len(json.dumps(LessonViewSerializer(list(queryset), many=True).data, default=str).encode())
+
+            self.report(rows, 'поток', stream)
+            if rows <= options['list_max']:
+                self.report(rows, 'список', full_list)
+
+    def report(self, rows, title, function):
+        started = time.perf_counter()
+        size = function()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{rows:>10} строк  {title:6}  пик памяти {peak / 2 ** 20:8.1f} MiB  "
+            f"{elapsed:7.1f}s  {size / 2 ** 20:8.1f} MiB ответа"
+        )
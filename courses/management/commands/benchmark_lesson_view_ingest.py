@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from core.models import User
+from courses.models import Lesson
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность записи прогресса: по одному POST на lesson-views/create/ "
+            "против одного POST на lesson-views/batch/. Все данные откатываются после замера.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=500, help="Количество пар (урок, длительность).")
+
+    def handle(self, *args, **options):
+        count = options['views']
+        try:
+            with transaction.atomic():
+                lessons = Lesson.objects.bulk_create(
+                    Lesson(title=f'benchmark {i}', video_url='https://example.com/video', duration=600)
+                    for i in range(count)
+                )
+                per_row_user = User.objects.create(username='benchmark-per-row')
+                batch_user = User.objects.create(username='benchmark-batch')
+
+                client = APIClient()
+                client.force_authenticate(per_row_user)
+                started = time.perf_counter()
+                for lesson in lessons:
+                    response = client.post('/lesson-views/create/', {
+                        'lesson': lesson.id, 'user': per_row_user.id, 'view_duration': 500,
+                    })
+                    assert response.status_code == 201, response.content
+                per_row = time.perf_counter() - started
+
+                client.force_authenticate(batch_user)
+                payload = {'views': [{'lesson': lesson.id, 'view_duration': 500} for lesson in lessons]}
+                started = time.perf_counter()
+                response = client.post('/lesson-views/batch/', payload, format='json')
+                assert response.status_code == 200, response.content
+                batch = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"per-row: {count} views in {per_row:.3f}s ({count / per_row:.0f} views/s)")
+        self.stdout.write(f"batch:   {count} views in {batch:.3f}s ({count / batch:.0f} views/s)")
+        self.stdout.write(self.style.SUCCESS(f"speedup: x{per_row / batch:.1f}"))
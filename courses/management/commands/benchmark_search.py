@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import User
+from courses.models import Product
+from courses.search import apply_fulltext_search
+
+WORDS = (
+    'python', 'java', 'react', 'django', 'data', 'science', 'machine', 'learning', 'web', 'mobile', 'design',
+    'devops', 'cloud', 'security', 'testing', 'backend', 'frontend', 'analytics', 'golang', 'kotlin', 'swift',
+    'basics', 'advanced', 'course', 'bootcamp', 'intensive', 'masterclass', 'practice', 'interview', 'algorithms',
+)
+TERMS = ('python', 'machine learning', 'kotlin bootcamp', 'interv')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает полнотекстовый поиск по продуктам с LIKE '%...%' на синтетических данных. "
+            "Данные создаются в транзакции и откатываются после замера.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Количество синтетических продуктов.")
+        parser.add_argument('--repeat', type=int, default=5, help="Повторов каждого запроса.")
+        parser.add_argument('--limit', type=int, default=100, help="Размер страницы результатов.")
+
+    def handle(self, *args, **options):
+        rows, repeat, limit = options['rows'], options['repeat'], options['limit']
+        if apply_fulltext_search(Product.objects.none(), 'product', ['probe']) is None:
+            raise CommandError("Полнотекстовый поиск не поддерживается текущей СУБД.")
+
+        rng = random.Random(0)
+        try:
+            with transaction.atomic():
+                owner = User.objects.create(username='benchmark-search')
+                started = time.perf_counter()
+                for offset in range(0, rows, 10_000):
+                    Product.objects.bulk_create(
+                        Product(name=' '.join(rng.choices(WORDS, k=4)), owner=owner)
+                        for _ in range(min(10_000, rows - offset))
+                    )
+                self.stdout.write(f"inserted {rows} products in {time.perf_counter() - started:.1f}s")
+
+                for term in TERMS:
+                    like = Product.objects.filter(owner=owner, name__icontains=term).order_by('name')
+                    fulltext = apply_fulltext_search(Product.objects.filter(owner=owner), 'product', [term])
+                    like_time = self.measure(like, limit, repeat)
+                    fulltext_time = self.measure(fulltext, limit, repeat)
+                    self.stdout.write(
+                        f"{term!r}: LIKE {like_time * 1000:.1f}ms, full-text {fulltext_time * 1000:.1f}ms "
+                        f"(x{like_time / fulltext_time:.1f})"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    @staticmethod
+    def measure(queryset, limit, repeat):
+        """Медианное время получения первой страницы и общего количества совпадений."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset[:limit])
+            queryset.count()
+            timings.append(time.perf_counter() - started)
+        return sorted(timings)[len(timings) // 2]
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.generics import ListAPIView
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import User
+from courses.urls import urlpatterns
+
+# Признаки плана, которые означают сортировку или полный проход по таблице
+WARNINGS = {
+    'sqlite': ('USE TEMP B-TREE', 'SCAN '),
+    'postgresql': ('Sort', 'Seq Scan'),
+    'mysql': ('Using filesort', 'type: ALL'),
+}
+FULL_SCANS = ('SCAN ', 'Seq Scan', 'type: ALL')
+
+# Маршруты, для которых полный проход ожидаем: статистика отдает все неудаленные продукты
+# страницами в порядке первичного ключа (product_id), и сузить проход индексом нечем --
+# в плане это чтение первичного ключа по порядку с LIMIT, без сортировки
+EXPECTED_FULL_SCANS = {'product-statistics', 'product-statistics-export'}
+
+
+def find_warnings(plan, vendor, full_scan_expected=False):
+    found = set()
+    for line in plan.splitlines():
+        for marker in WARNINGS.get(vendor, ()):
+            if full_scan_expected and marker in FULL_SCANS:
+                continue
+            # В SQLite "SCAN ... USING INDEX" -- упорядоченный проход по индексу с LIMIT, а не по таблице
+            if marker in line and not (vendor == 'sqlite' and marker == 'SCAN ' and 'INDEX' in line):
+                found.add(marker.strip())
+    return sorted(found)
+
+
+class Command(BaseCommand):
+    help = ("Печатает план выполнения запроса каждого списка из courses.urls для каждой доступной сортировки "
+            "и отмечает сортировки и полные проходы. Удобно запускать до и после миграции индексов.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="id пользователя, от имени которого строятся запросы.")
+        parser.add_argument('--limit', type=int, default=100, help="Размер страницы.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.first()
+        if user is None:
+            raise CommandError("Нет пользователя для построения запросов.")
+
+        factory = APIRequestFactory()
+        flagged = 0
+        for pattern in urlpatterns:
+            view_class = getattr(pattern.callback, 'view_class', None)
+            # асинхронные представления (courses/async_views.py) строят запрос синхронным view_class
+            view_class = getattr(view_class, 'view_class', view_class)
+            if view_class is None or not issubclass(view_class, ListAPIView):
+                continue
+            orderings = [None] + list(getattr(view_class, 'ordering_fields', None) or [])
+            for ordering in orderings:
+                query = {'ordering': ordering} if ordering else {}
+                request = factory.get(f'/{pattern.pattern}', query)
+                force_authenticate(request, user=user)
+                view = view_class()
+                view.setup(request)
+                view.request = view.initialize_request(request)
+                view.format_kwarg = None
+                queryset = view.filter_queryset(view.get_queryset())[:options['limit']]
+
+                plan = queryset.explain()
+                found = find_warnings(plan, connection.vendor, pattern.name in EXPECTED_FULL_SCANS)
+                flagged += bool(found)
+                title = f"{pattern.name} ordering={ordering or 'default'}"
+                self.stdout.write(self.style.WARNING(f"{title}: {', '.join(found)}") if found else title)
+                self.stdout.write(plan + "\n")
+
+        self.stdout.write(f"Запросов с сортировкой или полным проходом: {flagged}")
@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+
+from core.models import User
+
+PATHS = ('/products/', '/lessons/', '/lesson-views/', '/products/statistics/')
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест списков: синхронные представления под WSGI против асинхронных "
+            "(courses/async_views.py) под ASGI при одинаковой конкурентности. Запросы идут в обработчики "
+            "Django внутри процесса, без сети; каждый режим запускается в отдельном процессе.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="id пользователя, от имени которого идут запросы.")
+        parser.add_argument('--requests', type=int, default=2000, help="Запросов на каждый режим.")
+        parser.add_argument('--concurrency', type=int, default=64, help="Одновременных запросов.")
+        parser.add_argument('--query', default='limit=20', help="Строка запроса для всех маршрутов.")
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+        parser.add_argument('--session', help=argparse.SUPPRESS)  # cookie сессии для дочернего процесса
+
+    def handle(self, *args, **options):
+        if options['mode'] != 'both':
+            result = self.run_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.first()
+        if user is None:
+            raise CommandError("Нет пользователя для запросов.")
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        try:
+            results = {mode: self.spawn(mode, session, options) for mode in ('wsgi', 'asgi')}
+        finally:
+            client.logout()
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode}: {result['rps']:.0f} req/s, p50 {result['p50'] * 1000:.1f}ms, "
+                f"p99 {result['p99'] * 1000:.1f}ms, errors {result['errors']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"asgi/wsgi: throughput x{results['asgi']['rps'] / results['wsgi']['rps']:.2f}, "
+            f"p99 x{results['asgi']['p99'] / results['wsgi']['p99']:.2f}"
+        ))
+
+    def spawn(self, mode, session, options):
+        env = dict(os.environ, COURSES_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'loadtest', '--mode', mode, '--session', session,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--query', options['query'],
+        ]
+        output = subprocess.run(command, env=env, capture_output=True, text=True)
+        if output.returncode:
+            raise CommandError(output.stderr)
+        return json.loads(output.stdout.splitlines()[-1])
+
+    def run_mode(self, options):
+        if options['mode'] == 'asgi' and not settings.COURSES_ASYNC_VIEWS:
+            raise CommandError("Режим asgi требует COURSES_ASYNC_VIEWS=1.")
+        if not options['session']:
+            raise CommandError("Запустите с --mode both.")
+        cookie = f"{settings.SESSION_COOKIE_NAME}={options['session']}"
+        targets = [PATHS[i % len(PATHS)] for i in range(options['requests'])]
+        runner = self.run_wsgi if options['mode'] == 'wsgi' else self.run_asgi
+        connection.close()
+
+        runner(PATHS, options, cookie)  # прогрев: импорт, подключения, кэши
+        started = time.perf_counter()
+        results = runner(targets, options, cookie)
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for _, latency in results]
+        return {
+            'rps': len(results) / elapsed,
+            'p50': percentile(latencies, 0.5),
+            'p99': percentile(latencies, 0.99),
+            'errors': sum(status != 200 for status, _ in results),
+        }
+
+    @staticmethod
+    def run_wsgi(targets, options, cookie):
+        application = get_wsgi_application()
+
+        def call(path):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': options['query'],
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+                'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+            }
+            statuses = []
+            started = time.perf_counter()
+            b''.join(application(environ, lambda status, headers: statuses.append(status)))
+            return int(statuses[0].split()[0]), time.perf_counter() - started
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            return list(executor.map(call, targets))
+
+    @staticmethod
+    def run_asgi(targets, options, cookie):
+        application = get_asgi_application()
+
+        async def call(path, semaphore):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+                'query_string': options['query'].encode(), 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                started = time.perf_counter()
+                await application(scope, receive, send)
+                return messages[0]['status'], time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(call(path, semaphore) for path in targets))
+
+        return asyncio.run(main())
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from courses.access import find_lesson_access_drift, rebuild_lesson_access
+
+
+class Command(BaseCommand):
+    help = "Перестраивает таблицу доступов к урокам или сверяет ее с JOIN через доступы к продуктам (--check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Только сравнить таблицу с эталонным JOIN, ничего не изменяя.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            missing, extra = find_lesson_access_drift()
+            missing_count, extra_count = missing.count(), extra.count()
+            for user_id, product_id, lesson_id in missing[:20]:
+                self.stdout.write(f"missing: user={user_id} product={product_id} lesson={lesson_id}")
+            for user_id, product_id, lesson_id in extra[:20]:
+                self.stdout.write(f"extra: user={user_id} product={product_id} lesson={lesson_id}")
+            if missing_count or extra_count:
+                raise CommandError(f"Отсутствует строк: {missing_count}, лишних строк: {extra_count}")
+            self.stdout.write(self.style.SUCCESS("Таблица доступов к урокам актуальна."))
+            return
+
+        with transaction.atomic():
+            count = rebuild_lesson_access()
+        self.stdout.write(self.style.SUCCESS(f"Таблица доступов к урокам перестроена: {count} строк."))
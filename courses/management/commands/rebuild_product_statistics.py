@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from courses.statistics import find_statistics_drift, rebuild_product_statistics
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает таблицу статистики продуктов с нуля или проверяет ее на расхождения (--check)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Только сравнить таблицу с точным расчетом, ничего не изменяя.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_statistics_drift()
+            for product_id, field, expected, actual in drift:
+                self.stdout.write(f"product={product_id} {field}: expected={expected} actual={actual}")
+            if drift:
+                raise CommandError(f"Найдено расхождений: {len(drift)}")
+            self.stdout.write(self.style.SUCCESS("Статистика актуальна."))
+            return
+
+        with transaction.atomic():
+            count = rebuild_product_statistics()
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана для {count} продуктов."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from courses.view_events import BATCH_SIZE, prune, rollup
+
+
+class Command(BaseCommand):
+    help = ("Сворачивает новые события журнала просмотров в почасовые и суточные сводки по урокам и продуктам "
+            "(статистика за период ?from=&to=) и удаляет свернутые события старше срока хранения. "
+            "Запускать по расписанию, не более одного экземпляра одновременно.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Событий в одной транзакции.")
+        parser.add_argument('--retention-days', type=int,
+                            help="Срок хранения свернутых событий в днях; по умолчанию VIEW_EVENTS['RETENTION_DAYS'].")
+
+    def handle(self, *args, **options):
+        processed = rollup(batch_size=options['batch_size'])
+        pruned = prune(options['retention_days'])
+        self.stdout.write(self.style.SUCCESS(f"Свернуто событий: {processed}, удалено старых: {pruned}."))
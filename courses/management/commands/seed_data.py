@@ -0,0 +1,208 @@
+import itertools
+import random
+import time
+from bisect import bisect_left
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import User
+from courses.access import rebuild_lesson_access
+from courses.models import Lesson, LessonView, Product, ProductAccess, ProductLesson
+from courses.statistics import rebuild_product_statistics
+
+BATCH_SIZE = 5000
+WORDS = (
+    'python', 'java', 'react', 'django', 'data', 'science', 'machine', 'learning', 'web', 'mobile', 'design',
+    'devops', 'cloud', 'security', 'testing', 'backend', 'frontend', 'analytics', 'golang', 'kotlin', 'swift',
+    'basics', 'advanced', 'course', 'bootcamp', 'intensive', 'masterclass', 'practice', 'interview', 'algorithms',
+)
+
+
+class ZipfChooser:
+    """Выбор элемента с вероятностью ~ 1 / rank ** exponent: немногие популярные элементы и длинный хвост."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1)))
+
+    def choice(self):
+        return self.items[bisect_left(self.cum_weights, self.rng.random() * self.cum_weights[-1])]
+
+    def sample(self, count):
+        """До count различных элементов (популярные выпадают чаще)."""
+        count = min(count, len(self.items))
+        chosen = set()
+        for _ in range(count * 4):
+            chosen.add(self.choice())
+            if len(chosen) >= count:
+                break
+        return chosen
+
+
+class Command(BaseCommand):
+    help = ("Заполняет БД синтетическими данными пакетными вставками: пользователи, продукты, уроки, "
+            "доступы и просмотры с неравномерными (Zipf/Pareto) распределениями. Денормализованные таблицы "
+            "(статистика, доступы к урокам) пересчитываются в конце. Пароль всех пользователей -- --password.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--lessons', type=int, default=500)
+        parser.add_argument('--views', type=int, default=100_000, help="Целевое количество просмотров.")
+        parser.add_argument('--accesses-per-user', type=float, default=3.0, help="Среднее число продуктов у пользователя.")
+        parser.add_argument('--skew', type=float, default=1.1, help="Показатель Zipf для популярности продуктов.")
+        parser.add_argument('--prefix', default='seed', help="Префикс имен пользователей.")
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--seed', type=int, default=0, help="Зерно генератора, для воспроизводимости.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.started = time.perf_counter()
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Пользователи с префиксом {options['prefix']!r} уже есть, укажите другой --prefix.")
+
+        with transaction.atomic():
+            user_ids = self.create_users(options)
+            product_ids = self.create_products(options, user_ids)
+            lessons_by_product, durations = self.create_lessons(options, product_ids)
+            accesses = self.create_accesses(options, user_ids, product_ids)
+            self.create_views(options, accesses, lessons_by_product, durations)
+
+            rebuild_product_statistics()
+            self.report("статистика пересчитана")
+            rebuild_lesson_access()
+            self.report("доступы к урокам пересчитаны")
+
+    def report(self, message):
+        self.stdout.write(f"[{time.perf_counter() - self.started:7.1f}s] {message}")
+
+    def insert(self, model, objects):
+        """bulk_create пачками; возвращает id созданных строк."""
+        ids = []
+        for batch in iter(lambda: list(itertools.islice(objects, BATCH_SIZE)), []):
+            created = model.objects.bulk_create(batch)
+            if created and created[0].pk is None:
+                # СУБД не возвращает id из INSERT: берем последние строки, вставленные в этой транзакции
+                created = model.objects.order_by('-pk')[:len(batch)][::-1]
+            ids.extend(obj.pk for obj in created)
+        return ids
+
+    def create_users(self, options):
+        password = make_password(options['password'])  # один хеш на всех: PBKDF2 на каждого занял бы часы
+        prefix = options['prefix']
+        ids = self.insert(User, (
+            User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', password=password)
+            for i in range(options['users'])
+        ))
+        self.report(f"пользователей: {len(ids)}")
+        return ids
+
+    def create_products(self, options, user_ids):
+        # Авторов мало, и у немногих из них большинство продуктов
+        authors = ZipfChooser(user_ids[:max(1, len(user_ids) // 100)], 1.0, self.rng)
+        ids = self.insert(Product, (
+            Product(name=' '.join(self.rng.choices(WORDS, k=3)), owner_id=authors.choice())
+            for _ in range(options['products'])
+        ))
+        self.report(f"продуктов: {len(ids)}")
+        return ids
+
+    def create_lessons(self, options, product_ids):
+        durations = [self.rng.randint(60, 3600) for _ in range(options['lessons'])]
+        lesson_ids = self.insert(Lesson, (
+            Lesson(title=' '.join(self.rng.choices(WORDS, k=4)), video_url='https://example.com/video', duration=duration)
+            for duration in durations
+        ))
+        # Урок входит в один продукт; размер продуктов неравномерный, но не связан с их популярностью
+        # у покупателей (create_accesses), иначе LessonAccess разрастается до (покупатели x уроки) хитов
+        shuffled = list(product_ids)
+        self.rng.shuffle(shuffled)
+        products = ZipfChooser(shuffled, 0.5, self.rng)
+        lessons_by_product = {}
+        for lesson_id in lesson_ids:
+            lessons_by_product.setdefault(products.choice(), []).append(lesson_id)
+        self.insert(ProductLesson, (
+            ProductLesson(product_id=product_id, lesson_id=lesson_id)
+            for product_id, lessons in lessons_by_product.items() for lesson_id in lessons
+        ))
+        self.report(f"уроков: {len(lesson_ids)} в {len(lessons_by_product)} продуктах")
+        return lessons_by_product, dict(zip(lesson_ids, durations))
+
+    def create_accesses(self, options, user_ids, product_ids):
+        products = ZipfChooser(product_ids, options['skew'], self.rng)
+        accesses = {}
+        for user_id in user_ids:
+            # Pareto: большинство купили 1-2 продукта, единицы -- десятки
+            count = max(1, round(self.rng.paretovariate(1.5) * options['accesses_per_user'] / 3))
+            accesses[user_id] = products.sample(count)
+        total = self.insert(ProductAccess, (
+            ProductAccess(product_id=product_id, user_id=user_id)
+            for user_id, user_products in accesses.items() for product_id in user_products
+        ))
+        self.report(f"доступов: {len(total)}")
+        return accesses
+
+    def create_views(self, options, accesses, lessons_by_product, durations):
+        def available(user_id):
+            return sorted({lesson_id for product_id in accesses[user_id] for lesson_id in lessons_by_product.get(product_id, ())})
+
+        # Активность пользователей распределена по Pareto; просмотры -- только доступных уроков
+        activity = {user_id: self.rng.paretovariate(1.2) for user_id in accesses}
+        capacity = {user_id: len(available(user_id)) for user_id in accesses}
+        if sum(capacity.values()) < options['views']:
+            self.stdout.write(self.style.WARNING(
+                f"Пользователям доступно только {sum(capacity.values())} пар (пользователь, урок); "
+                f"увеличьте --accesses-per-user или --lessons."
+            ))
+        quotas = self.allocate(options['views'], activity, capacity)
+
+        def views():
+            for user_id, quota in quotas.items():
+                for lesson_id in self.rng.sample(available(user_id), quota):
+                    duration = durations[lesson_id]
+                    # Больше половины просмотров досмотрены, остальные брошены на случайном месте
+                    view_duration = duration if self.rng.random() < 0.6 else self.rng.randint(0, duration)
+                    yield user_id, lesson_id, view_duration
+
+        # Просмотров на порядки больше остального: строки вставляются executemany без создания моделей
+        # (bulk_create в SQLite ограничен 999 параметрами на INSERT), id не запрашиваются
+        opts = LessonView._meta
+        columns = ['user_id', 'lesson_id', 'view_duration', 'created', 'updated']
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(opts.db_table),
+            ', '.join(connection.ops.quote_name(opts.get_field(column).column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        count = 0
+        generator = views()
+        with connection.cursor() as cursor:
+            for batch in iter(lambda: list(itertools.islice(generator, BATCH_SIZE)), []):
+                cursor.executemany(sql, [(user_id, lesson_id, duration, now, now) for user_id, lesson_id, duration in batch])
+                count += len(batch)
+                if count % (BATCH_SIZE * 200) < BATCH_SIZE:
+                    self.report(f"просмотров: {count}")
+        self.report(f"просмотров: {count}")
+
+    @staticmethod
+    def allocate(target, activity, capacity):
+        """Делит target просмотров пропорционально активности; излишек упершихся в capacity
+        пользователей перераспределяется между остальными."""
+        quotas = {}
+        remaining = target
+        active = set(activity)
+        while active and remaining > 0:
+            scale = remaining / sum(activity[user_id] for user_id in active)
+            full = {user_id for user_id in active if activity[user_id] * scale >= capacity[user_id]}
+            if not full:
+                quotas.update((user_id, round(activity[user_id] * scale)) for user_id in active)
+                break
+            for user_id in full:
+                quotas[user_id] = capacity[user_id]
+                remaining -= capacity[user_id]
+            active -= full
+        return quotas
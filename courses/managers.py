@@ -0,0 +1,83 @@
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+
+class DatesQuerySet(models.QuerySet):
+    """Проставляет поля DatesModelMixin в массовых операциях, как save() для одного объекта:
+    update() и bulk_update() -- updated. bulk_create() пишет даты объектов (по умолчанию --
+    момент создания объекта), при update_conflicts updated добавляется в обновляемые поля."""
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated', timezone.now())
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if kwargs.get('update_fields') and 'updated' not in kwargs['update_fields']:
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'updated']
+        return super().bulk_create(objs, *args, **kwargs)
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated = now
+        if 'updated' not in fields:
+            fields = [*fields, 'updated']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    bulk_update.alters_data = True
+
+
+class ProductQuerySet(DatesQuerySet):
+    """Выборка продуктов с мягким удалением: delete() помечает строки удаленными одним UPDATE."""
+
+    def delete(self):
+        from courses import access  # courses.access импортирует модели
+
+        with transaction.atomic(using=self.db):
+            live = self.filter(is_deleted=False)
+            # UPDATE не вызывает сигналов Product.save, поэтому доступы к урокам убираются здесь
+            access.remove_products(live.values('pk'))
+            count = live.update(is_deleted=True)
+        return count, {self.model._meta.label: count}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        """Настоящее удаление строк вместе со связанными (CASCADE)."""
+        return super().delete()
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+
+class LiveProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """Менеджер по умолчанию: только неудаленные продукты (Product.all_objects -- все)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class LessonViewQuerySet(DatesQuerySet):
+    def viewed_condition(self):
+        """Правило 80% в виде условия для БД (см. LessonView.status)."""
+        return models.Q(view_duration__gte=F('lesson__duration') * self.model.VIEWED_THRESHOLD)
+
+    def viewed(self):
+        return self.filter(self.viewed_condition())
+
+    def with_status(self):
+        """Считает статус просмотра в БД и подгружает урок тем же запросом."""
+        return self.select_related('lesson').annotate(
+            status=Case(
+                When(self.viewed_condition(), then=Value(self.model.VIEWED)),
+                default=Value(self.model.NOT_VIEWED),
+                output_field=models.CharField(),
+            )
+        )
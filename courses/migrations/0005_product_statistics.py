@@ -0,0 +1,95 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, F, Sum
+
+
+def populate_statistics(apps, schema_editor):
+    """Заполняет таблицу статистики по уже существующим данным."""
+    db = schema_editor.connection.alias
+    Product = apps.get_model("courses", "Product")
+    ProductAccess = apps.get_model("courses", "ProductAccess")
+    ProductLesson = apps.get_model("courses", "ProductLesson")
+    LessonView = apps.get_model("courses", "LessonView")
+    ProductStatistics = apps.get_model("courses", "ProductStatistics")
+    StatisticsCounter = apps.get_model("courses", "StatisticsCounter")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    views_by_lesson = {
+        row["lesson_id"]: row
+        for row in LessonView.objects.using(db).filter(
+            view_duration__gte=F("lesson__duration") * 0.8
+        )
+        .values("lesson_id")
+        .annotate(viewed=Count("id"), view_time=Sum("view_duration"))
+    }
+    students = dict(
+        ProductAccess.objects.using(db).values("product_id")
+        .annotate(students=Count("user_id", distinct=True))
+        .values_list("product_id", "students")
+    )
+    rows = {
+        product_id: ProductStatistics(
+            product_id=product_id, students_count=students.get(product_id, 0)
+        )
+        for product_id in Product.objects.using(db).values_list("id", flat=True)
+    }
+    for product_id, lesson_id in ProductLesson.objects.using(db).values_list(
+        "product_id", "lesson_id"
+    ).distinct():
+        row = views_by_lesson.get(lesson_id)
+        if row:
+            rows[product_id].viewed_lessons_count += row["viewed"]
+            rows[product_id].total_view_time += row["view_time"]
+    ProductStatistics.objects.using(db).bulk_create(rows.values(), batch_size=1000)
+    StatisticsCounter.objects.using(db).create(name="users", value=User.objects.using(db).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("courses", "0004_alter_product_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductStatistics",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="statistics",
+                        serialize=False,
+                        to="courses.product",
+                    ),
+                ),
+                ("viewed_lessons_count", models.PositiveIntegerField(default=0)),
+                ("total_view_time", models.PositiveBigIntegerField(default=0)),
+                ("students_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Статистика продукта",
+                "verbose_name_plural": "Статистика продуктов",
+            },
+        ),
+        migrations.CreateModel(
+            name="StatisticsCounter",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Счетчик статистики",
+                "verbose_name_plural": "Счетчики статистики",
+            },
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
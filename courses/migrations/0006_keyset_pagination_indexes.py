@@ -0,0 +1,57 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0005_product_statistics"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["title", "id"], name="lesson_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["created", "id"], name="lesson_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lessonview",
+            index=models.Index(fields=["user", "id"], name="lessonview_user_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lessonview",
+            index=models.Index(
+                fields=["user", "created", "id"], name="lessonview_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["owner", "is_deleted", "name", "id"],
+                name="product_owner_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["owner", "is_deleted", "created", "id"],
+                name="product_owner_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productaccess",
+            index=models.Index(
+                fields=["user", "product", "id"], name="access_user_product_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productaccess",
+            index=models.Index(
+                fields=["user", "created", "id"], name="access_user_created_idx"
+            ),
+        ),
+    ]
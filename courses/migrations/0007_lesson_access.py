@@ -0,0 +1,82 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_lesson_access(apps, schema_editor):
+    """Заполняет таблицу доступов к урокам по уже существующим доступам к продуктам."""
+    db = schema_editor.connection.alias
+    ProductLesson = apps.get_model("courses", "ProductLesson")
+    LessonAccess = apps.get_model("courses", "LessonAccess")
+
+    rows = (
+        ProductLesson.objects.using(db).filter(
+            product__is_deleted=False, product__productaccess__isnull=False
+        )
+        .values_list("product__productaccess__user_id", "product_id", "lesson_id")
+        .distinct()
+    )
+    LessonAccess.objects.using(db).bulk_create(
+        (
+            LessonAccess(user_id=user_id, product_id=product_id, lesson_id=lesson_id)
+            for user_id, product_id, lesson_id in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("courses", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LessonAccess",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="courses.lesson",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="courses.product",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доступ к уроку",
+                "verbose_name_plural": "Доступы к урокам",
+                "unique_together": {("user", "product", "lesson")},
+            },
+        ),
+        migrations.RunPython(populate_lesson_access, migrations.RunPython.noop),
+    ]
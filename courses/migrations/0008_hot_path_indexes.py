@@ -0,0 +1,56 @@
+# Generated by Django 4.2.5 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0007_lesson_access"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_owner_name_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="product",
+            name="product_owner_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="lessonview",
+            index=models.Index(
+                fields=["user", "view_duration", "id"],
+                name="lessonview_user_duration_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["owner", "name", "id"],
+                name="product_live_owner_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["owner", "created", "id"],
+                name="product_live_owner_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productlesson",
+            index=models.Index(
+                fields=["product", "lesson"], name="productlesson_product_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productlesson",
+            index=models.Index(
+                fields=["lesson", "product"], name="productlesson_lesson_idx"
+            ),
+        ),
+    ]
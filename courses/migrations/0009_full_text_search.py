@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from courses.search import install_search_indexes, rebuild_search_indexes, uninstall_search_indexes
+
+
+def install(apps, schema_editor):
+    install_search_indexes(schema_editor.connection)
+    rebuild_search_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0008_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 4.2.5 on 2026-10-18 20:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("courses", "0010_soft_delete_manager"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViewEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("watched_seconds", models.PositiveIntegerField()),
+                ("view_duration", models.PositiveIntegerField()),
+                ("became_viewed", models.BooleanField(default=False)),
+                (
+                    "occurred_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("rolled_up", models.BooleanField(default=False)),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="courses.lesson",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие просмотра",
+                "verbose_name_plural": "События просмотра",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("rolled_up", False)),
+                        fields=["id"],
+                        name="view_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductViewRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Час"), ("day", "Сутки")], max_length=4
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("watch_seconds", models.PositiveBigIntegerField(default=0)),
+                ("viewed_lessons", models.PositiveIntegerField(default=0)),
+                ("events", models.PositiveIntegerField(default=0)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="courses.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка просмотров продукта",
+                "verbose_name_plural": "Сводки просмотров продуктов",
+                "unique_together": {("product", "period", "bucket")},
+            },
+        ),
+        migrations.CreateModel(
+            name="LessonViewRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Час"), ("day", "Сутки")], max_length=4
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("watch_seconds", models.PositiveBigIntegerField(default=0)),
+                ("viewed_lessons", models.PositiveIntegerField(default=0)),
+                ("events", models.PositiveIntegerField(default=0)),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="courses.lesson",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка просмотров урока",
+                "verbose_name_plural": "Сводки просмотров уроков",
+                "unique_together": {("lesson", "period", "bucket")},
+            },
+        ),
+    ]
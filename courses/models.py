@@ -3,19 +3,71 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from core.models import User
+from courses.lesson_cache import lesson_cache
+from courses.managers import DatesQuerySet, LessonViewQuerySet, LiveProductManager, ProductQuerySet
 
 class DatesModelMixin(models.Model):
+    """created/updated проставляются и в save(), и в массовых операциях (DatesQuerySet).
+
+    save() уже сохраненного объекта пишет только измененные с момента загрузки поля и
+    updated, а не всю строку: параллельные изменения других полей не затираются. Если
+    ничего не изменилось, save() не делает запроса.
+    """
     class Meta:
         abstract = True  # Помечаем класс как абстрактный – для него не будет таблички в БД
 
     created = models.DateTimeField(verbose_name='Дата создания', default=timezone.now)
     updated = models.DateTimeField(verbose_name='Дата последнего обновления', default=timezone.now)
 
+    objects = DatesQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self, fields=None):
+        loaded = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and (fields is None or field.attname in fields or field.name in fields)
+        }
+        if fields is None:
+            self._loaded_values = loaded
+        else:
+            self._loaded_values = {**getattr(self, '_loaded_values', {}), **loaded}
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_loaded_values(fields)
+
+    def changed_fields(self):
+        """Имена полей, измененных с загрузки из БД (или с прошлого save())."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in loaded or getattr(self, field.attname) != loaded[field.attname])
+        ]
+
     def save(self, *args, **kwargs):
         if not self.id:  # Когда объект только создается, у него еще нет id
             self.created = timezone.now()  # проставляем дату создания
+        elif not args and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            changed = self.changed_fields()
+            if changed is not None:
+                kwargs['update_fields'] = changed
+        if kwargs.get('update_fields') is not None:
+            if not kwargs['update_fields']:
+                return None  # ничего не изменилось -- в БД не пишем (как и Django при update_fields=[])
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated'}
         self.updated = timezone.now()  # проставляем дату обновления
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self._remember_loaded_values()
+        return result
 
 
 class Product(DatesModelMixin):
@@ -23,12 +75,31 @@ class Product(DatesModelMixin):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     is_deleted = models.BooleanField(default=False)  # Добавляем поле для мягкого удаления
 
+    # objects не видит удаленных продуктов; all_objects -- для кода, которому они нужны
+    # (статистика, восстановление, админка). Связи (access.product и т.п.) загружают любые.
+    objects = LiveProductManager()
+    all_objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
+        indexes = [
+            # Проходы по живым продуктам в порядке id (в т.ч. JOIN из статистики) без удаленных строк
+            models.Index(fields=['id'], condition=models.Q(is_deleted=False), name='product_live_idx'),
+            # ProductListView: живые продукты владельца в порядке name/created (в т.ч. keyset по id).
+            # Частичные индексы не содержат удаленных строк; на СУБД без их поддержки не создаются.
+            models.Index(
+                fields=['owner', 'name', 'id'], condition=models.Q(is_deleted=False), name='product_live_owner_name_idx',
+            ),
+            models.Index(
+                fields=['owner', 'created', 'id'], condition=models.Q(is_deleted=False),
+                name='product_live_owner_created_idx',
+            ),
+        ]
 
 
     def delete(self, *args, **kwargs):
+        # Мягкое удаление; массовое -- Product.objects.filter(...).delete(), настоящее -- hard_delete()
         self.is_deleted = True
         self.save()
 
@@ -41,6 +112,11 @@ class ProductAccess(DatesModelMixin):
         verbose_name = "Доступ к продукту"
         verbose_name_plural = "Доступы к продуктам"
         unique_together = [['product', 'user']]  # Уникальность комбинации продукта и пользователя
+        indexes = [
+            # keyset-пагинация ProductAccessListView по (product, id) и (created, id)
+            models.Index(fields=['user', 'product', 'id'], name='access_user_product_idx'),
+            models.Index(fields=['user', 'created', 'id'], name='access_user_created_idx'),
+        ]
 
 
 
@@ -53,6 +129,11 @@ class Lesson(DatesModelMixin):
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
         ordering = ['title']
+        indexes = [
+            # keyset-пагинация LessonListView по (title, id) и (created, id)
+            models.Index(fields=['title', 'id'], name='lesson_title_idx'),
+            models.Index(fields=['created', 'id'], name='lesson_created_idx'),
+        ]
 
 
 class ProductLesson(DatesModelMixin):
@@ -62,9 +143,15 @@ class ProductLesson(DatesModelMixin):
     class Meta:
         verbose_name = "Урок продукта"
         verbose_name_plural = "Уроки продукта"
+        indexes = [
+            # уроки продукта (доступы, статистика) и продукты урока (дельты статистики) без обращения к таблице
+            models.Index(fields=['product', 'lesson'], name='productlesson_product_idx'),
+            models.Index(fields=['lesson', 'product'], name='productlesson_lesson_idx'),
+        ]
 
 
 class LessonView(DatesModelMixin):
+    VIEWED_THRESHOLD = 0.8  # доля длительности урока, после которой урок считается просмотренным
     VIEWED = 'viewed'
     NOT_VIEWED = 'not_viewed'
     STATUS_CHOICES = [
@@ -76,23 +163,146 @@ class LessonView(DatesModelMixin):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     view_duration = models.PositiveIntegerField()  # длительность просмотра в секундах
 
+    objects = LessonViewQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Просмотр урока"
         verbose_name_plural = "Просмотры уроков"
         unique_together = [['lesson', 'user']]
+        indexes = [
+            # keyset-пагинация LessonViewListView по id и (created, id)
+            models.Index(fields=['user', 'id'], name='lessonview_user_idx'),
+            models.Index(fields=['user', 'created', 'id'], name='lessonview_user_created_idx'),
+            models.Index(fields=['user', 'view_duration', 'id'], name='lessonview_user_duration_idx'),
+        ]
 
     @property
     def status(self):
-        if self.view_duration >= self.lesson.duration * 0.8:
+        # Значение из аннотации LessonView.objects.with_status(), если объект загружен через нее
+        annotated = self.__dict__.get('_status')
+        if annotated is not None:
+            return annotated
+        if self.view_duration >= self.lesson_duration() * self.VIEWED_THRESHOLD:
             return self.VIEWED
         return self.NOT_VIEWED
 
+    def lesson_duration(self):
+        """Длительность урока: из уже загруженного урока или из кэша метаданных, без запроса к БД."""
+        if not LessonView.lesson.is_cached(self):
+            meta = lesson_cache.get(self.lesson_id)
+            if meta is not None:
+                return meta.duration
+        return self.lesson.duration
+
+    @status.setter
+    def status(self, value):
+        self._status = value
+
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES)[self.status]
+
     def save(self, *args, **kwargs):
-        if self.view_duration > self.lesson.duration:
+        if self.view_duration > self.lesson_duration():
             raise ValidationError("Продолжительность просмотра не может быть больше продолжительности урока.")
+        self.__dict__.pop('_status', None)  # статус из аннотации мог устареть
         super().save(*args, **kwargs)
 
 
+class ProductStatistics(models.Model):
+    """Предрасчитанная статистика продукта, поддерживается сигналами (см. courses/signals.py)."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    viewed_lessons_count = models.PositiveIntegerField(default=0)
+    total_view_time = models.PositiveBigIntegerField(default=0)
+    students_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Статистика продукта"
+        verbose_name_plural = "Статистика продуктов"
+
+
+class StatisticsCounter(models.Model):
+    """Глобальные счетчики, которые иначе пришлось бы считать через COUNT(*) на каждый запрос."""
+    USERS = 'users'
+
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Счетчик статистики"
+        verbose_name_plural = "Счетчики статистики"
+
+
+class LessonAccess(models.Model):
+    """Денормализованное замыкание "пользователь → доступный урок" через продукт.
+
+    Строка есть для каждой тройки (пользователь, продукт, урок), где у пользователя есть
+    ProductAccess к неудаленному продукту, а урок входит в продукт. Поддерживается
+    сигналами (см. courses/access.py) и заменяет JOIN через productlesson и productaccess.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = "Доступ к уроку"
+        verbose_name_plural = "Доступы к урокам"
+        unique_together = [['user', 'product', 'lesson']]
+
+
+class ViewEvent(models.Model):
+    """Журнал отчетов о прогрессе: строка на каждое увеличение view_duration, только добавление.
+
+    LessonView хранит лишь последнее значение, а журнал позволяет считать время просмотра
+    за период. Строки сворачиваются в LessonViewRollup/ProductViewRollup командой
+    rollup_view_events (см. courses/view_events.py) и удаляются по истечении срока хранения.
+    Внешние ключи без ограничений в БД: удаление урока или пользователя не переписывает журнал.
+    """
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    lesson = models.ForeignKey(Lesson, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    watched_seconds = models.PositiveIntegerField()  # прирост view_duration
+    view_duration = models.PositiveIntegerField()  # значение после отчета
+    became_viewed = models.BooleanField(default=False)  # отчет перевел урок в "Просмотрено"
+    occurred_at = models.DateTimeField(default=timezone.now, db_index=True)
+    rolled_up = models.BooleanField(default=False)  # учтено в сводках
+
+    class Meta:
+        verbose_name = "Событие просмотра"
+        verbose_name_plural = "События просмотра"
+        indexes = [
+            # Свертка выбирает несвернутые события в порядке id; индекс не содержит свернутых строк
+            models.Index(fields=['id'], condition=models.Q(rolled_up=False), name='view_event_pending_idx'),
+        ]
+
 
+class ViewRollup(models.Model):
+    """Сумма событий просмотра за час или сутки (UTC), начинающиеся в bucket."""
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [(HOUR, 'Час'), (DAY, 'Сутки')]
 
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+    watch_seconds = models.PositiveBigIntegerField(default=0)
+    viewed_lessons = models.PositiveIntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        abstract = True
+
+
+class LessonViewRollup(ViewRollup):
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = "Сводка просмотров урока"
+        verbose_name_plural = "Сводки просмотров уроков"
+        unique_together = [['lesson', 'period', 'bucket']]
+
+
+class ProductViewRollup(ViewRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        verbose_name = "Сводка просмотров продукта"
+        verbose_name_plural = "Сводки просмотров продуктов"
+        unique_together = [['product', 'period', 'bucket']]
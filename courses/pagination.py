@@ -0,0 +1,163 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """Пагинация limit/offset с дополнительным keyset-режимом.
+
+    По умолчанию работает как LimitOffsetPagination. Запрос с ?pagination=cursor
+    (первая страница) или ?cursor=<значение из next> включает keyset-режим: страница
+    выбирается условием по (поля сортировки..., id) вместо OFFSET и без COUNT(*),
+    поэтому глубокие страницы не медленнее первых. Сортировка берется из queryset
+    (в т.ч. заданная OrderingFilter), id добавляется для однозначности при неуникальных
+    полях вроде name или title. Сортировка по внешнему ключу выполняется по его id.
+    Ссылка previous в keyset-режиме не формируется.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    default_cursor_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.is_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        queryset = self.get_keyset_queryset(queryset, request)
+        return self.get_keyset_page(list(queryset[:self.limit + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """То же, что paginate_queryset, через асинхронные методы ORM (для courses/async_views.py)."""
+        self.keyset = self.is_keyset(request)
+        if self.keyset:
+            queryset = self.get_keyset_queryset(queryset, request)
+            return self.get_keyset_page([obj async for obj in queryset[:self.limit + 1]])
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [obj async for obj in queryset[self.offset:self.offset + self.limit]]
+
+    def is_keyset(self, request):
+        return self.cursor_query_param in request.query_params or \
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+
+    def get_keyset_queryset(self, queryset, request):
+        """Queryset, упорядоченный по ключу и отфильтрованный по курсору; выборка limit + 1 -- за вызывающим."""
+        self.request = request
+        self.limit = self.get_limit(request) or self.default_limit or self.default_cursor_limit
+        self.ordering = self.get_keyset_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position = self.decode_cursor(encoded, len(self.ordering))
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+            except (ValidationError, ValueError, TypeError):
+                # Значение курсора не приводится к типу поля сортировки
+                raise NotFound('Invalid cursor')
+        return queryset
+
+    def get_keyset_page(self, results):
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.next_position = [self.get_value(results[-1], term) for term in self.ordering] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_keyset_ordering(self, queryset):
+        """Поля сортировки queryset с добавленным первичным ключом в конце."""
+        opts = queryset.model._meta
+        ordering = []
+        for term in queryset.query.order_by or opts.ordering:
+            descending = term.startswith('-')
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = opts.pk.attname
+            try:
+                field = opts.get_field(name)
+                if field.is_relation and field.concrete:
+                    name = field.attname
+            except FieldDoesNotExist:
+                pass  # аннотация или путь через связь
+            ordering.append(f"-{name}" if descending else name)
+        if not ordering or ordering[-1].lstrip('-') != opts.pk.attname:
+            # id идет в том же направлении, что и последнее поле, чтобы индекс читался одним проходом
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f"-{opts.pk.attname}" if descending else opts.pk.attname)
+        return ordering
+
+    def get_keyset_filter(self, position):
+        """Условие "строго после position" для составного ключа сортировки."""
+        condition = Q()
+        equal = Q()
+        for term, value in zip(self.ordering, position):
+            name = term.lstrip('-')
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def get_value(obj, term):
+        value = obj
+        for part in term.lstrip('-').split('__'):
+            value = getattr(value, part)
+        return value
+
+    def encode_cursor(self, position):
+        position = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, encoded, length):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound('Invalid cursor')
+        return position
+
+    def get_paginated_response_schema(self, schema):
+        if not getattr(self, 'keyset', False):
+            return super().get_paginated_response_schema(schema)
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
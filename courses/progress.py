@@ -0,0 +1,121 @@
+"""Прогресс пользователя по доступным продуктам (products/progress/).
+
+Для каждого неудаленного продукта с доступом: число уроков, просмотренные уроки (правило
+80%, см. LessonView.status), суммарное время просмотра и процент прохождения. Считается
+двумя запросами независимо от числа продуктов и уроков: доступные продукты и один
+GROUP BY по LessonAccess с LEFT JOIN просмотров пользователя.
+
+Результат кэшируется в кэше Django на пользователя (PRODUCT_PROGRESS_CACHE в settings.py).
+Записи и номер поколения живут в CACHES, поэтому сброс виден другим процессам сервера только
+при общем бэкенде (CACHE_URL, см. core/database.py). С кэшем в памяти процесса (locmem,
+предупреждение core.W001) запись живет не дольше LOCAL_TTL секунд: сброс из другого процесса
+до нее не дойдет.
+Сброс:
+- invalidate_users -- при записи просмотров (сигналы LessonView, courses/ingestion.py)
+  и выдаче или отзыве доступа конкретным пользователям (courses/access.py);
+- invalidate_all -- при изменениях, задевающих всех пользователей продукта (уроки продукта,
+  длительность урока, мягкое удаление и переименование продукта): растет номер поколения,
+  входящий в ключи, и старые записи больше не читаются.
+Сброс повторяется после фиксации транзакции, чтобы параллельный запрос не закэшировал
+данные, прочитанные до нее.
+
+Считается всегда по основной базе: закэшированный ответ отстающей реплики
+(core/routers.py) жил бы весь TTL.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import Count, F, FilteredRelation, Q, Sum
+
+from core.database import is_shared_cache
+from courses.models import LessonAccess, LessonView, ProductAccess
+
+GENERATION_KEY = 'courses:progress-generation'
+LOCAL_TTL = 30
+
+_options = getattr(settings, 'PRODUCT_PROGRESS_CACHE', {})
+
+
+def _key(user_id, generation):
+    return f'courses:progress:{generation}:{user_id}'
+
+
+def _ttl():
+    ttl = _options.get('TTL', 300)
+    if is_shared_cache(settings.CACHES['default']):
+        return ttl
+    return min(ttl, LOCAL_TTL)
+
+
+def _generation():
+    # Начальное значение от времени: после вытеснения ключа поколение не вернется к старому
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def compute_product_progress(user_id):
+    """Прогресс по продуктам, без кэша: список словарей в порядке id продукта."""
+    db = router.db_for_write(LessonAccess)
+    products = ProductAccess.objects.using(db).filter(
+        user_id=user_id, product__is_deleted=False,
+    ).order_by('product_id').values_list('product_id', 'product__name')
+    own_view = FilteredRelation('lesson__lessonview', condition=Q(lesson__lessonview__user_id=user_id))
+    lessons = {
+        row['product_id']: row
+        for row in LessonAccess.objects.using(db).filter(user_id=user_id).annotate(view=own_view).values(
+            'product_id',
+        ).annotate(
+            total_lessons=Count('lesson_id'),
+            viewed_lessons=Count('view', filter=Q(
+                view__view_duration__gte=F('lesson__duration') * LessonView.VIEWED_THRESHOLD,
+            )),
+            watch_seconds=Sum('view__view_duration'),
+        ).order_by()
+    }
+    result = []
+    for product_id, name in products:
+        row = lessons.get(product_id, {})
+        total = row.get('total_lessons', 0)
+        viewed = row.get('viewed_lessons', 0)
+        result.append({
+            'product_id': product_id,
+            'product_name': name,
+            'total_lessons': total,
+            'viewed_lessons': viewed,
+            'watch_seconds': row.get('watch_seconds') or 0,
+            'percent_complete': viewed * 100.0 / total if total else 0.0,
+        })
+    return result
+
+
+def get_product_progress(user_id):
+    """Прогресс из кэша; при промахе считается и кладется в кэш на TTL секунд (см. _ttl)."""
+    key = _key(user_id, _generation())
+    progress = cache.get(key)
+    if progress is None:
+        progress = compute_product_progress(user_id)
+        cache.set(key, progress, _ttl())
+    return progress
+
+
+def invalidate_users(user_ids):
+    def drop():
+        generation = _generation()
+        cache.delete_many([_key(user_id, generation) for user_id in user_ids])
+
+    user_ids = list(user_ids)
+    if user_ids:
+        drop()
+        transaction.on_commit(drop)
+
+
+def invalidate_all():
+    def bump():
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, time.time_ns(), None)
+
+    bump()
+    transaction.on_commit(bump)
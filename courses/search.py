@@ -0,0 +1,151 @@
+"""Полнотекстовый поиск по Product.name и Lesson.title.
+
+SQLite: виртуальные таблицы FTS5 с внешним содержимым (content=<таблица модели>),
+синхронизируются триггерами на INSERT/UPDATE/DELETE, поэтому bulk-операции тоже
+попадают в индекс. Результаты ранжируются по bm25.
+PostgreSQL: GIN-индекс по to_tsvector('simple', поле), ранжирование через ts_rank.
+На остальных СУБД FullTextSearchFilter работает как обычный SearchFilter (LIKE).
+"""
+import re
+
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# индекс -> (таблица модели, поле)
+SEARCH_INDEXES = {
+    'product': ('courses_product', 'name'),
+    'lesson': ('courses_lesson', 'title'),
+}
+SEARCH_MIGRATION = '0009_full_text_search'
+
+_SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({field}, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_fts(rowid, {field}) VALUES (new.id, new.{field}); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, {field}) VALUES ('delete', old.id, old.{field}); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {field} ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, {field}) VALUES ('delete', old.id, old.{field}); "
+    "INSERT INTO {table}_fts(rowid, {field}) VALUES (new.id, new.{field}); END",
+]
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS {table}_fts_ai",
+    "DROP TRIGGER IF EXISTS {table}_fts_ad",
+    "DROP TRIGGER IF EXISTS {table}_fts_au",
+    "DROP TABLE IF EXISTS {table}_fts",
+]
+# Выражение совпадает с тем, что генерирует SearchVector(field, config='simple'), чтобы индекс использовался
+_POSTGRES_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS {table}_fts_idx ON {table} "
+    "USING GIN (to_tsvector('simple'::regconfig, COALESCE({field}, '')))",
+]
+_POSTGRES_DROP = ["DROP INDEX IF EXISTS {table}_fts_idx"]
+
+
+def _execute(using_connection, statements):
+    with using_connection.cursor() as cursor:
+        for table, field in SEARCH_INDEXES.values():
+            for statement in statements:
+                cursor.execute(statement.format(table=table, field=field))
+
+
+def install_search_indexes(using_connection):
+    """Создает индексы (идемпотентно). Вызывается из миграции и после каждого migrate,
+    так как пересоздание таблицы в SQLite при ALTER удаляет ее триггеры."""
+    if using_connection.vendor == 'sqlite':
+        _execute(using_connection, _SQLITE_SCHEMA)
+    elif using_connection.vendor == 'postgresql':
+        _execute(using_connection, _POSTGRES_SCHEMA)
+
+
+def rebuild_search_indexes(using_connection):
+    if using_connection.vendor == 'sqlite':
+        _execute(using_connection, ["INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"])
+
+
+def uninstall_search_indexes(using_connection):
+    if using_connection.vendor == 'sqlite':
+        _execute(using_connection, _SQLITE_DROP)
+    elif using_connection.vendor == 'postgresql':
+        _execute(using_connection, _POSTGRES_DROP)
+
+
+def ensure_search_indexes(using, **kwargs):
+    """Обработчик post_migrate: восстанавливает триггеры, если миграция поиска применена."""
+    using_connection = connections[using]
+    applied = MigrationRecorder(using_connection).applied_migrations()
+    if ('courses', SEARCH_MIGRATION) in applied:
+        install_search_indexes(using_connection)
+
+
+def build_sqlite_query(terms):
+    """Превращает пользовательский ввод в безопасный запрос FTS5: все слова, с поиском по префиксу."""
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def apply_fulltext_search(queryset, index, terms, field='id', rank=True):
+    """Фильтрует queryset по полнотекстовому индексу index; с rank=True сортирует по релевантности.
+
+    Возвращает None, если СУБД не поддерживается (тогда нужен обычный LIKE-поиск).
+    """
+    # База самого queryset: при чтении с реплики (core/routers.py) она может отличаться от default
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return _apply_postgresql(queryset, index, terms, field, rank)
+    if connection.vendor != 'sqlite':
+        return None
+
+    query = build_sqlite_query(terms)
+    if not query:
+        return queryset.none()
+    table = f"{SEARCH_INDEXES[index][0]}_fts"
+    if not rank:
+        return queryset.filter(**{f'{field}__in': RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [query])})
+    # Ранжирование требует JOIN с FTS-таблицей: коррелированный подзапрос выполнял бы MATCH на каждую строку.
+    # Унарный + не дает FTS5 использовать rowid как ограничение, поэтому планировщик ставит FTS-таблицу
+    # во внешний цикл (один MATCH), а строки модели достает по ключу.
+    # bm25 в FTS5 отрицательный: чем меньше rank, тем релевантнее.
+    opts = queryset.model._meta
+    outer_column = f"{connection.ops.quote_name(opts.db_table)}.{connection.ops.quote_name(opts.get_field(field).column)}"
+    return queryset.extra(
+        tables=[table],
+        where=[f'{table} MATCH %s', f'+{table}.rowid = {outer_column}'],
+        params=[query],
+    ).annotate(search_rank=RawSQL(f'{table}.rank', [], output_field=FloatField())).order_by('search_rank', 'pk')
+
+
+def _apply_postgresql(queryset, index, terms, field, rank):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    _, column = SEARCH_INDEXES[index]
+    prefix = '' if field == 'id' else f"{field.removesuffix('_id')}__"
+    vector = SearchVector(f'{prefix}{column}', config='simple')
+    search_query = SearchQuery(' '.join(terms), config='simple', search_type='plain')
+    queryset = queryset.annotate(search_vector=vector).filter(search_vector=search_query)
+    if not rank:
+        return queryset
+    return queryset.annotate(search_rank=SearchRank(vector, search_query)).order_by('-search_rank', 'pk')
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter, использующий полнотекстовый индекс вместо LIKE '%...%'.
+
+    Представление задает fulltext_index ('product' или 'lesson') и, если ищет по связанной
+    модели, fulltext_field (например, 'product_id'). Если сортировка не задана явно через
+    ?ordering=, результаты упорядочиваются по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        index = getattr(view, 'fulltext_index', None)
+        if terms and index is not None:
+            explicit_ordering = bool(request.query_params.get(filters.OrderingFilter.ordering_param))
+            field = getattr(view, 'fulltext_field', 'id')
+            result = apply_fulltext_search(queryset, index, terms, field, rank=not explicit_ordering)
+            if result is not None:
+                return result
+        return super().filter_queryset(request, queryset, view)
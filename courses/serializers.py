@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Product, ProductAccess, Lesson, ProductLesson, LessonView
+from .enrollment import grant_product_access, revoke_product_access, users_by_email_domain
+from .ingestion import merge_progress, upsert_lesson_views
+from .lesson_cache import lesson_cache
+from .models import Product, ProductAccess, Lesson, ProductLesson, LessonView, ProductStatistics
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -14,6 +17,40 @@ class ProductAccessSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'user', 'created', 'updated']
 
 
+class ProductAccessBulkSerializer(serializers.Serializer):
+    """Массовая выдача доступа к продукту владельца: списком id или всем пользователям домена почты."""
+    MAX_USER_IDS = 100_000
+
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.none())
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False, max_length=MAX_USER_IDS,
+    )
+    email_domain = serializers.RegexField(r'^@?[\w.-]+\.\w+$', required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            self.fields['product'].queryset = Product.objects.filter(owner=request.user)
+
+    def validate(self, attrs):
+        if ('user_ids' in attrs) == ('email_domain' in attrs):
+            raise serializers.ValidationError("Укажите либо user_ids, либо email_domain.")
+        if 'email_domain' in attrs:
+            attrs['users'] = users_by_email_domain(attrs['email_domain'])
+        else:
+            attrs['users'] = attrs['user_ids']
+        return attrs
+
+    def create(self, validated_data):
+        return grant_product_access(validated_data['product'].pk, validated_data['users'])
+
+
+class ProductAccessBulkRevokeSerializer(ProductAccessBulkSerializer):
+    def create(self, validated_data):
+        return revoke_product_access(validated_data['product'].pk, validated_data['users'])
+
+
 class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
@@ -26,9 +63,93 @@ class ProductLessonSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'lesson', 'created', 'updated']
 
 
+class CachedLessonField(serializers.PrimaryKeyRelatedField):
+    """Урок по id из кэша метаданных (courses/lesson_cache.py), без запроса к БД."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            lesson = lesson_cache.get_instance(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if lesson is None:
+            self.fail('does_not_exist', pk_value=data)
+        return lesson
+
+
 class LessonViewSerializer(serializers.ModelSerializer):
-    status = serializers.CharField(source='get_status_display', read_only=True)  # Получаем отображаемое значение статуса
+    lesson = CachedLessonField(queryset=Lesson.objects.all())
+    # Статус берется из аннотации LessonView.objects.with_status(), без дополнительных запросов
+    status = serializers.CharField(read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)  # Получаем отображаемое значение статуса
 
     class Meta:
         model = LessonView
-        fields = ['id', 'lesson', 'user', 'view_duration', 'status', 'created', 'updated']
+        fields = ['id', 'lesson', 'user', 'view_duration', 'status', 'status_display', 'created', 'updated']
+
+
+class LessonViewBatchItemSerializer(serializers.Serializer):
+    lesson = serializers.IntegerField(min_value=1)
+    view_duration = serializers.IntegerField(min_value=0)
+
+
+class LessonViewBatchSerializer(serializers.Serializer):
+    """Пачка отчетов о прогрессе просмотра текущего пользователя."""
+    MAX_ITEMS = 1000
+
+    views = LessonViewBatchItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate(self, attrs):
+        # Все длительности уроков проверяются одним запросом
+        progress = merge_progress((item['lesson'], item['view_duration']) for item in attrs['views'])
+        durations = {lesson_id: meta.duration for lesson_id, meta in lesson_cache.get_many(list(progress)).items()}
+        errors = {}
+        for lesson_id, view_duration in progress.items():
+            if lesson_id not in durations:
+                errors[lesson_id] = "Урок не найден."
+            elif view_duration > durations[lesson_id]:
+                errors[lesson_id] = "Продолжительность просмотра не может быть больше продолжительности урока."
+        if errors:
+            raise serializers.ValidationError({'views': errors})
+        attrs['progress'] = progress
+        attrs['lesson_durations'] = durations
+        return attrs
+
+    def create(self, validated_data):
+        return upsert_lesson_views(
+            self.context['request'].user.id, validated_data['progress'], validated_data['lesson_durations']
+        )
+
+
+class ProductStatisticsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductStatistics
+        fields = ['product', 'viewed_lessons_count', 'total_view_time', 'students_count']
+
+    def to_representation(self, instance):
+        # Ожидается queryset с аннотацией total_users (см. ProductStatisticsView)
+        # и, для периода ?from=&to=, range_viewed_lessons и range_view_time
+        total_users = getattr(instance, 'total_users', None)
+        return {
+            "id_продукта": instance.product_id,
+            "название продукта": instance.product.name,
+            "количество просмотренных уроков": getattr(instance, 'range_viewed_lessons', instance.viewed_lessons_count),
+            "общее время просмотра": getattr(instance, 'range_view_time', instance.total_view_time),
+            "количество студентов": instance.students_count,
+            "процент приобретения": instance.students_count * 100.0 / total_users if total_users else 0.0,
+        }
+
+
+class ProductProgressSerializer(serializers.Serializer):
+    """Строка прогресса из courses.progress.get_product_progress."""
+
+    def to_representation(self, instance):
+        return {
+            "id_продукта": instance['product_id'],
+            "название продукта": instance['product_name'],
+            "количество уроков": instance['total_lessons'],
+            "количество просмотренных уроков": instance['viewed_lessons'],
+            "время просмотра": instance['watch_seconds'],
+            "процент прохождения": instance['percent_complete'],
+        }
@@ -0,0 +1,205 @@
+"""Сигналы, поддерживающие денормализованные таблицы приложения courses в актуальном состоянии."""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import User
+from courses import access, progress, statistics, view_events
+from courses.lesson_cache import lesson_cache
+from courses.models import Lesson, LessonAccess, LessonView, Product, ProductAccess, ProductLesson, ProductStatistics, StatisticsCounter
+
+
+def _remember_previous(instance, *fields):
+    """Запоминает сохраненные в БД значения полей, чтобы после сохранения посчитать дельту.
+
+    Значения берутся из снимка, который DatesModelMixin делает при загрузке объекта и после
+    save(); запрос к БД нужен только объекту, собранному без загрузки (Model(pk=...).save())
+    или загруженному без этих полей (only/defer).
+    """
+    instance._previous_values = None
+    if not instance.pk:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and all(field in loaded for field in fields):
+        instance._previous_values = {field: loaded[field] for field in fields}
+    else:
+        instance._previous_values = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_previous(instance, 'is_deleted')
+
+
+@receiver(post_save, sender=Product)
+def create_product_statistics(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProductStatistics.objects.get_or_create(product=instance)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_progress_on_product_save(sender, instance, created, raw=False, **kwargs):
+    # Название и мягкое удаление продукта видны в прогрессе всех его пользователей
+    if not created and not raw:
+        progress.invalidate_all()
+
+
+@receiver(post_save, sender=Product)
+def update_lesson_access_on_soft_delete(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or not previous or previous['is_deleted'] == instance.is_deleted:
+        return
+    if instance.is_deleted:
+        LessonAccess.objects.filter(product=instance).delete()
+    else:
+        access.rebuild_product(instance.pk)
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_previous(instance, 'duration')
+
+
+@receiver(post_save, sender=Lesson)
+def update_statistics_on_lesson_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or not previous or previous['duration'] == instance.duration:
+        return
+    # Изменилась длительность урока: статус просмотров пересчитывается целиком
+    progress.invalidate_all()
+    product_ids = ProductLesson.objects.filter(lesson=instance).values_list('product_id', flat=True).distinct()
+    statistics.refresh_product_statistics(list(product_ids))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_cache(sender, instance, **kwargs):
+    lesson_cache.invalidate(instance.pk)
+
+
+@receiver(pre_save, sender=LessonView)
+def remember_lesson_view(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_previous(instance, 'lesson_id', 'user_id', 'view_duration')
+
+
+@receiver(post_save, sender=LessonView)
+def update_statistics_on_lesson_view_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_values', None)
+    progress.invalidate_users({instance.user_id, previous['user_id']} if previous else [instance.user_id])
+    lesson = previous and lesson_cache.get(previous['lesson_id'])
+    if lesson:
+        count, time = statistics.view_contribution(previous['view_duration'], lesson.duration)
+        statistics.apply_lesson_view_delta(previous['lesson_id'], -count, -time)
+    duration = instance.lesson_duration()
+    count, time = statistics.view_contribution(instance.view_duration, duration)
+    statistics.apply_lesson_view_delta(instance.lesson_id, count, time)
+    same_view = previous and (previous['user_id'], previous['lesson_id']) == (instance.user_id, instance.lesson_id)
+    view_events.record([(
+        instance.user_id, instance.lesson_id, previous['view_duration'] if same_view else 0,
+        instance.view_duration, duration,
+    )])
+
+
+@receiver(post_delete, sender=LessonView)
+def update_statistics_on_lesson_view_delete(sender, instance, **kwargs):
+    progress.invalidate_users([instance.user_id])
+    lesson = lesson_cache.get(instance.lesson_id)
+    if lesson:
+        count, time = statistics.view_contribution(instance.view_duration, lesson.duration)
+        statistics.apply_lesson_view_delta(instance.lesson_id, -count, -time)
+
+
+@receiver(pre_save, sender=ProductAccess)
+def remember_product_access(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_previous(instance, 'product_id', 'user_id')
+
+
+@receiver(post_save, sender=ProductAccess)
+def update_statistics_on_access_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if created:
+        statistics.apply_students_delta(instance.product_id, 1)
+    elif previous and previous['product_id'] != instance.product_id:
+        statistics.apply_students_delta(previous['product_id'], -1)
+        statistics.apply_students_delta(instance.product_id, 1)
+
+
+@receiver(post_delete, sender=ProductAccess)
+def update_statistics_on_access_delete(sender, instance, **kwargs):
+    statistics.apply_students_delta(instance.product_id, -1)
+
+
+@receiver(post_save, sender=ProductAccess)
+def update_lesson_access_on_access_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if previous and (previous['product_id'], previous['user_id']) != (instance.product_id, instance.user_id):
+        access.revoke(previous['product_id'], [previous['user_id']])
+    elif not created:
+        return
+    access.grant(instance.product_id, [instance.user_id])
+
+
+@receiver(post_delete, sender=ProductAccess)
+def update_lesson_access_on_access_delete(sender, instance, **kwargs):
+    access.revoke(instance.product_id, [instance.user_id])
+
+
+@receiver(pre_save, sender=ProductLesson)
+def remember_product_lesson(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _remember_previous(instance, 'product_id', 'lesson_id')
+
+
+@receiver(post_save, sender=ProductLesson)
+def update_statistics_on_product_lesson_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    product_ids = {instance.product_id}
+    previous = getattr(instance, '_previous_values', None)
+    if previous:
+        if (previous['product_id'], previous['lesson_id']) == (instance.product_id, instance.lesson_id):
+            return
+        product_ids.add(previous['product_id'])
+    statistics.refresh_product_statistics(product_ids)
+
+
+@receiver(post_delete, sender=ProductLesson)
+def update_statistics_on_product_lesson_delete(sender, instance, **kwargs):
+    statistics.refresh_product_statistics([instance.product_id])
+
+
+@receiver(post_save, sender=ProductLesson)
+def update_lesson_access_on_product_lesson_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_values', None)
+    if previous and (previous['product_id'], previous['lesson_id']) != (instance.product_id, instance.lesson_id):
+        access.remove_lesson(previous['product_id'], previous['lesson_id'])
+    elif not created:
+        return
+    access.add_lesson(instance.product_id, instance.lesson_id)
+
+
+@receiver(post_delete, sender=ProductLesson)
+def update_lesson_access_on_product_lesson_delete(sender, instance, **kwargs):
+    access.remove_lesson(instance.product_id, instance.lesson_id)
+
+
+@receiver(post_save, sender=User)
+def update_counter_on_user_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        statistics.adjust_counter(StatisticsCounter.USERS, 1)
+
+
+@receiver(post_delete, sender=User)
+def update_counter_on_user_delete(sender, instance, **kwargs):
+    statistics.adjust_counter(StatisticsCounter.USERS, -1)
@@ -0,0 +1,174 @@
+"""Поддержка таблицы ProductStatistics.
+
+Статистика хранится в отдельной таблице и обновляется инкрементально из сигналов
+(courses/signals.py), поэтому ProductStatisticsView читает готовые значения одним запросом.
+Полный пересчет и проверка расхождений выполняются командой rebuild_product_statistics.
+"""
+from django.db.models import Case, F, Func, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from core.models import User
+from courses.models import LessonView, Product, ProductAccess, ProductLesson, ProductStatistics, StatisticsCounter
+
+STATISTICS_FIELDS = ('viewed_lessons_count', 'total_view_time', 'students_count')
+
+
+def is_viewed(view_duration, lesson_duration):
+    """Правило 80% из LessonView.status для уже известных значений."""
+    return view_duration >= lesson_duration * LessonView.VIEWED_THRESHOLD
+
+
+def view_contribution(view_duration, lesson_duration):
+    """Вклад одного просмотра в статистику: (количество просмотренных, время просмотра)."""
+    if is_viewed(view_duration, lesson_duration):
+        return 1, view_duration
+    return 0, 0
+
+
+def apply_lesson_view_delta(lesson_id, count_delta, time_delta):
+    """Применяет изменение вклада просмотра ко всем продуктам, в которые входит урок."""
+    if not count_delta and not time_delta:
+        return
+    product_ids = ProductLesson.objects.filter(lesson_id=lesson_id).values('product_id')
+    ProductStatistics.objects.filter(product_id__in=product_ids).update(
+        viewed_lessons_count=F('viewed_lessons_count') + count_delta,
+        total_view_time=F('total_view_time') + time_delta,
+    )
+
+
+def apply_lesson_view_deltas(deltas):
+    """Пакетный вариант apply_lesson_view_delta: {lesson_id: (count_delta, time_delta)} одним UPDATE."""
+    deltas = {lesson_id: delta for lesson_id, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    by_product = {}
+    product_lessons = ProductLesson.objects.filter(lesson_id__in=list(deltas)).values_list('product_id', 'lesson_id').distinct()
+    for product_id, lesson_id in product_lessons:
+        count, time = by_product.get(product_id, (0, 0))
+        by_product[product_id] = (count + deltas[lesson_id][0], time + deltas[lesson_id][1])
+    if not by_product:
+        return
+    ProductStatistics.objects.filter(product_id__in=list(by_product)).update(
+        viewed_lessons_count=F('viewed_lessons_count') + Case(
+            *[When(product_id=product_id, then=Value(count)) for product_id, (count, _) in by_product.items()],
+            default=Value(0),
+        ),
+        total_view_time=F('total_view_time') + Case(
+            *[When(product_id=product_id, then=Value(time)) for product_id, (_, time) in by_product.items()],
+            default=Value(0),
+        ),
+    )
+
+
+def apply_students_delta(product_id, delta):
+    ProductStatistics.objects.filter(product_id=product_id).update(students_count=F('students_count') + delta)
+
+
+def recount_students(product_id):
+    """Записывает точное число студентов продукта (COUNT по ProductAccess) одним UPDATE."""
+    ProductStatistics.objects.filter(product_id=product_id).update(
+        students_count=_count(ProductAccess.objects.filter(product_id=OuterRef('product_id'))),
+    )
+
+
+def adjust_counter(name, delta):
+    updated = StatisticsCounter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        # Счетчик еще не создан: инициализируем его точным значением
+        StatisticsCounter.objects.get_or_create(name=name, defaults={'value': count_counter(name)})
+
+
+def count_counter(name):
+    if name == StatisticsCounter.USERS:
+        return User.objects.count()
+    raise ValueError(f'Unknown counter: {name}')
+
+
+def _count(queryset, field='id'):
+    """Скалярный подзапрос COUNT(field) без GROUP BY."""
+    return Coalesce(Subquery(queryset.order_by().annotate(value=Func(field, function='COUNT')).values('value')[:1]), 0)
+
+
+def _sum(queryset, field):
+    """Скалярный подзапрос SUM(field) без GROUP BY."""
+    return Coalesce(Subquery(queryset.order_by().annotate(value=Func(field, function='SUM')).values('value')[:1]), 0)
+
+
+def annotate_product_statistics(products):
+    """Добавляет к queryset продуктов метрики статистики.
+
+    Каждая метрика считается своим коррелированным подзапросом, поэтому ветки
+    доступов и просмотров не перемножаются в одном JOIN и SUM не завышается.
+    """
+    viewed = LessonView.objects.viewed().filter(
+        lesson_id__in=ProductLesson.objects.filter(product_id=OuterRef(OuterRef('pk'))).values('lesson_id'),
+    )
+    students = ProductAccess.objects.filter(product_id=OuterRef('pk'))
+    return products.annotate(
+        viewed_lessons_count=_count(viewed),
+        total_view_time=_sum(viewed, 'view_duration'),
+        students_count=_count(students),
+    )
+
+
+def compute_product_statistics(product_ids=None):
+    """Точный расчет статистики. Возвращает словарь {product_id: {поле: значение}}."""
+    products = Product.all_objects.all()  # статистика удаленных продуктов хранится на случай восстановления
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    return {
+        row.pop('id'): row
+        for row in annotate_product_statistics(products.order_by()).values('id', *STATISTICS_FIELDS)
+    }
+
+
+def refresh_product_statistics(product_ids):
+    """Пересчитывает статистику указанных продуктов (используется там, где дельту посчитать нельзя)."""
+    for product_id, values in compute_product_statistics(product_ids).items():
+        ProductStatistics.objects.filter(product_id=product_id).update(**values)
+
+
+def rebuild_product_statistics():
+    """Полностью пересоздает таблицу статистики и глобальные счетчики."""
+    computed = compute_product_statistics()
+    ProductStatistics.objects.exclude(product_id__in=Product.all_objects.values('id')).delete()
+    existing = set(ProductStatistics.objects.values_list('product_id', flat=True))
+    ProductStatistics.objects.bulk_create(
+        [ProductStatistics(product_id=product_id, **values) for product_id, values in computed.items() if product_id not in existing],
+        batch_size=1000,
+    )
+    ProductStatistics.objects.bulk_update(
+        [ProductStatistics(product_id=product_id, **values) for product_id, values in computed.items() if product_id in existing],
+        STATISTICS_FIELDS,
+        batch_size=1000,
+    )
+    StatisticsCounter.objects.update_or_create(
+        name=StatisticsCounter.USERS, defaults={'value': count_counter(StatisticsCounter.USERS)}
+    )
+    return len(computed)
+
+
+def find_statistics_drift():
+    """Сравнивает таблицу с точным расчетом и возвращает список расхождений."""
+    computed = compute_product_statistics()
+    stored = {
+        row['product_id']: row
+        for row in ProductStatistics.objects.values('product_id', *STATISTICS_FIELDS)
+    }
+    drift = []
+    for product_id, expected in computed.items():
+        actual = stored.get(product_id)
+        if actual is None:
+            drift.append((product_id, 'missing', expected, None))
+            continue
+        for field in STATISTICS_FIELDS:
+            if actual[field] != expected[field]:
+                drift.append((product_id, field, expected[field], actual[field]))
+    for product_id in stored.keys() - computed.keys():
+        drift.append((product_id, 'orphaned', None, stored[product_id]))
+
+    users = StatisticsCounter.objects.filter(name=StatisticsCounter.USERS).values_list('value', flat=True).first()
+    expected_users = count_counter(StatisticsCounter.USERS)
+    if users != expected_users:
+        drift.append((None, StatisticsCounter.USERS, expected_users, users))
+    return drift
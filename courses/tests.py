@@ -1,3 +1,1455 @@
-from django.test import TestCase
+import base64
+import csv
+import importlib.util
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import DatabaseError, connection
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from core.models import User
+from courses import enrollment, ingestion, progress, view_events
+from courses.async_views import AsyncListView, AsyncProductListView
+from courses.export import stream_rows
+from courses.access import expected_lesson_access, find_lesson_access_drift, rebuild_lesson_access
+from courses.buffer import ProgressBuffer
+from courses.lesson_cache import LessonMetadataCache
+from courses.search import apply_fulltext_search
+from courses.models import Lesson, LessonAccess, LessonView, LessonViewRollup, Product, ProductAccess, ProductLesson, \
+    ProductStatistics, ProductViewRollup, StatisticsCounter, ViewEvent, ViewRollup
+from courses.statistics import compute_product_statistics, find_statistics_drift
+from courses.urls import urlpatterns
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class QueryBudgetTests(APITestCase):
+    """Бюджет SQL-запросов и времени ответа для каждого именованного маршрута courses.urls.
+
+    Списки проверяются на нескольких размерах страницы, в режимах offset и cursor: число
+    запросов не должно зависеть от количества строк (N+1). При превышении печатается SQL.
+    Аутентификация принудительная, поэтому ее запросы в бюджет не входят. Запросы считаются
+    на default, поэтому чтение с реплик (core/routers.py) отключено.
+    """
+    ROWS = 60
+    PAGE_SIZES = (5, 20, 50)
+    SECONDS = 1.0
+
+    # Маршрут -> максимальное число запросов (в режиме offset; cursor не делает COUNT)
+    BUDGETS = {
+        'product-create': 6,  # владелец, INSERT, строка статистики в savepoint
+        'product-list': 2,  # COUNT, страница; ETag считается по странице
+        'product-detail': 1,
+        'product-access-create': 7,  # + счетчик студентов и LessonAccess
+        'product-access-bulk-grant': 10,  # на пачку: пользователи, доступы, INSERT, уроки, LessonAccess
+        'product-access-bulk-revoke': 6,  # на пачку: два DELETE
+        'product-access-list': 2,
+        'product-access-detail': 1,
+        'lesson-create': 1,
+        'lesson-list': 2,  # доступы -- подзапросом по LessonAccess
+        'lesson-detail': 1,
+        'product-lesson-create': 8,  # + пересчет статистики продукта и LessonAccess
+        'product-lesson-list': 2,
+        'product-lesson-detail': 1,
+        'lesson-view-create': 5,  # + событие в журнале просмотров
+        'lesson-view-batch': 9,  # INSERT новых, SELECT FOR UPDATE и UPDATE с MAX остальных, статистика, журнал
+        'lesson-view-list': 2,  # COUNT, страница со статусом из аннотации
+        'lesson-view-detail': 1,
+        'product-statistics': 2,
+        'lesson-view-export': 1,  # один потоковый SELECT на всю выгрузку
+        'product-statistics-export': 1,
+        'product-progress': 2,  # доступные продукты, GROUP BY по урокам; повторный запрос -- из кэша
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='budget')
+        cls.other = User.objects.create(username='budget-other')
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.user) for i in range(cls.ROWS)]
+        cls.lessons = [
+            Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com/video', duration=600)
+            for i in range(cls.ROWS + 1)
+        ]
+        for product, lesson in zip(cls.products, cls.lessons):
+            ProductLesson.objects.create(product=product, lesson=lesson)
+            ProductAccess.objects.create(product=product, user=cls.user)
+            LessonView.objects.create(lesson=lesson, user=cls.user, view_duration=lesson.pk * 7 % 600)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def requests(self):
+        """Маршрут -> список (метод, url, тело); для списков -- по запросу на размер страницы и режим."""
+        product, lesson = self.products[0], self.lessons[0]
+        spare_lesson = self.lessons[-1]
+        details = {
+            'product-detail': product.pk,
+            'product-access-detail': ProductAccess.objects.filter(user=self.user).first().pk,
+            'lesson-detail': lesson.pk,
+            'product-lesson-detail': ProductLesson.objects.filter(product=product).first().pk,
+            'lesson-view-detail': LessonView.objects.filter(user=self.user).first().pk,
+        }
+        creates = {
+            'product-create': {'name': 'new product', 'owner': self.user.pk},
+            'product-access-create': {'product': Product.objects.create(name='foreign', owner=self.other).pk,
+                                      'user': self.user.pk},
+            'product-access-bulk-grant': {'product': product.pk, 'user_ids': [self.other.pk, 10 ** 6]},
+            'product-access-bulk-revoke': {'product': product.pk, 'user_ids': [self.other.pk]},
+            'lesson-create': {'title': 'new lesson', 'video_url': 'https://example.com/video', 'duration': 60},
+            'product-lesson-create': {'product': product.pk, 'lesson': spare_lesson.pk},
+            'lesson-view-create': {'lesson': spare_lesson.pk, 'user': self.user.pk, 'view_duration': 10},
+            'lesson-view-batch': {'views': [{'lesson': lesson.pk, 'view_duration': 599}]},
+        }
+        requests = {name: [('get', reverse(name, kwargs={'pk': pk}), None)] for name, pk in details.items()}
+        requests.update({name: [('post', reverse(name), data)] for name, data in creates.items()})
+        for name in ('product-list', 'product-access-list', 'lesson-list', 'product-lesson-list',
+                     'lesson-view-list', 'product-statistics'):
+            requests[name] = [
+                ('get', reverse(name), {'limit': size, **mode})
+                for size in self.PAGE_SIZES for mode in ({}, {'pagination': 'cursor'})
+            ]
+        # Статистика за период -- из сводок журнала просмотров, тем же числом запросов
+        requests['product-statistics'].append(
+            ('get', reverse('product-statistics'), {'limit': 20, 'from': '2026-01-01', 'to': '2026-01-08T12:00'})
+        )
+        requests['product-progress'] = [('get', reverse('product-progress'), None)]
+        for name in ('lesson-view-export', 'product-statistics-export'):
+            requests[name] = [('get', reverse(name), {'export_format': fmt}) for fmt in ('csv', 'ndjson')]
+        return requests
+
+    def measure(self, method, url, data):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if method == 'get':
+                response = self.client.get(url, data)
+            else:
+                response = self.client.post(url, data, format='json')
+            # Выгрузка читает БД по мере отдачи ответа
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        self.assertLess(response.status_code, 300, content)
+        return queries, elapsed, response
+
+    @staticmethod
+    def format_queries(queries):
+        return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries.captured_queries, 1))
+
+    def test_every_route_has_budget(self):
+        names = {pattern.name for pattern in urlpatterns if pattern.name}
+        self.assertEqual(names - set(self.BUDGETS), set(), "Объявите бюджет для новых маршрутов")
+        self.assertEqual(names - set(self.requests()), set(), "Добавьте запрос для новых маршрутов")
+
+    def test_query_and_time_budgets(self):
+        for name, requests in self.requests().items():
+            for method, url, data in requests:
+                with self.subTest(route=name, params=data if method == 'get' else None):
+                    queries, elapsed, response = self.measure(method, url, data)
+                    self.assertLessEqual(
+                        len(queries), self.BUDGETS[name],
+                        f"{name}: {len(queries)} запросов при бюджете {self.BUDGETS[name]}:\n"
+                        f"{self.format_queries(queries)}",
+                    )
+                    self.assertLess(elapsed, self.SECONDS, f"{name}: {elapsed:.3f}s")
+                    if data and 'limit' in data:
+                        results = response.data['results'] if 'results' in response.data else response.data
+                        self.assertEqual(len(results), min(data['limit'], self.ROWS))
+
+    @skipUnless(connection.vendor == 'sqlite', "Планы запросов сверены для SQLite")
+    def test_explain_list_views_flags(self):
+        out = StringIO()
+        call_command('explain_list_views', user=self.user.pk, stdout=out)
+        flagged = {line.split(': ')[0] for line in out.getvalue().splitlines() if ' ordering=' in line and ': ' in line}
+        # Доступные уроки сортируются после подзапроса по LessonAccess, статус -- вычисляемое поле;
+        # полный проход статистики по первичному ключу ожидаем (EXPECTED_FULL_SCANS)
+        self.assertEqual(flagged, {
+            'lesson-list ordering=default', 'lesson-list ordering=title', 'lesson-list ordering=created',
+            'lesson-view-list ordering=status', 'lesson-view-export ordering=status',
+        })
+        self.assertTrue(out.getvalue().endswith("Запросов с сортировкой или полным проходом: 5\n"))
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        for name, requests in self.requests().items():
+            by_mode = {}
+            for method, url, data in requests:
+                if not data or 'limit' not in data:
+                    continue
+                queries, _, _ = self.measure(method, url, data)
+                by_mode.setdefault(data.get('pagination', 'offset'), []).append((data['limit'], queries))
+            for mode, measured in by_mode.items():
+                smallest = measured[0][1]
+                for limit, queries in measured[1:]:
+                    with self.subTest(route=name, mode=mode, limit=limit):
+                        self.assertEqual(
+                            len(queries), len(smallest),
+                            f"{name} ({mode}): {len(smallest)} запросов при limit={measured[0][0]}, "
+                            f"{len(queries)} при limit={limit}:\n{self.format_queries(queries)}",
+                        )
+
+
+class StatisticsAssertionsMixin:
+    def assertStatisticsExact(self):
+        """Инкрементальная таблица статистики совпадает с точным расчетом (rebuild_product_statistics)."""
+        self.assertEqual(find_statistics_drift(), [])
+
+    def stored_statistics(self, product):
+        return ProductStatistics.objects.values_list('viewed_lessons_count', 'total_view_time', 'students_count').get(
+            product=product,
+        )
+
+
+class ReadsElsewhereRouter:
+    """Отправляет чтения указанных моделей в несуществующий алиас: запрос, выполненный
+    по db_for_read вместо db_for_write, падает с ConnectionDoesNotExist."""
+
+    def __init__(self, *models):
+        self.models = models
+
+    def db_for_read(self, model, **hints):
+        return 'missing-replica' if model in self.models else None
+
+
+class ProgressIngestionTests(StatisticsAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='viewer')
+        cls.other = User.objects.create(username='viewer-2')
+        cls.product = Product.objects.create(name='product', owner=cls.user)
+        cls.lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                       for i in range(2)]
+        for lesson in cls.lessons:
+            ProductLesson.objects.create(product=cls.product, lesson=lesson)
+        cls.durations = {lesson.pk: lesson.duration for lesson in cls.lessons}
+
+    def upsert(self, progress):
+        return ingestion.upsert_progress(progress, self.durations)
+
+    def stored(self, user, lesson):
+        return LessonView.objects.get(user=user, lesson=lesson).view_duration
+
+    def test_creates_updates_and_keeps_maximum(self):
+        lesson = self.lessons[0]
+        self.assertEqual(self.upsert({(self.user.pk, lesson.pk): 50}), {'created': 1, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(self.upsert({(self.user.pk, lesson.pk): 90}), {'created': 0, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(self.upsert({(self.user.pk, lesson.pk): 60}), {'created': 0, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(self.stored(self.user, lesson), 90)
+        self.assertEqual(
+            list(ViewEvent.objects.order_by('id').values_list('watched_seconds', 'view_duration', 'became_viewed')),
+            [(50, 50, False), (40, 90, True)],
+        )
+
+    def test_statistics_deltas_match_exact_statistics(self):
+        first, second = self.lessons
+        self.upsert({(self.user.pk, first.pk): 10, (self.other.pk, first.pk): 85, (self.user.pk, second.pk): 79})
+        self.assertEqual(self.stored_statistics(self.product), (1, 85, 0))
+        self.assertStatisticsExact()
+
+        # Пересечение порога 80%, рост уже просмотренного и отчет меньше сохраненного
+        self.upsert({(self.user.pk, first.pk): 80, (self.other.pk, first.pk): 95, (self.user.pk, second.pk): 5})
+        self.assertEqual(self.stored_statistics(self.product), (2, 175, 0))
+        self.assertStatisticsExact()
+
+    def test_row_raised_by_concurrent_batch_is_not_lowered(self):
+        lesson = self.lessons[0]
+        self.upsert({(self.user.pk, lesson.pk): 10})
+        insert_missing = ingestion._insert_missing
+
+        def concurrent_batch_commits_first(progress, db):
+            created = insert_missing(progress, db)
+            LessonView.objects.filter(user=self.user, lesson=lesson).update(view_duration=95)
+            ingestion.statistics.apply_lesson_view_deltas({lesson.pk: (1, 95)})
+            return created
+
+        with mock.patch('courses.ingestion._insert_missing', side_effect=concurrent_batch_commits_first):
+            result = self.upsert({(self.user.pk, lesson.pk): 90})
+        self.assertEqual(result, {'created': 0, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(self.stored(self.user, lesson), 95)
+        self.assertStatisticsExact()
+
+    def test_writes_go_to_write_alias(self):
+        lesson = self.lessons[0]
+        with override_settings(DATABASE_ROUTERS=[ReadsElsewhereRouter(LessonView), *settings.DATABASE_ROUTERS]):
+            self.assertEqual(self.upsert({(self.user.pk, lesson.pk): 50}), {'created': 1, 'updated': 0, 'unchanged': 0})
+            self.assertEqual(self.upsert({(self.user.pk, lesson.pk): 70}), {'created': 0, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(self.stored(self.user, lesson), 70)
+
+    def test_batch_endpoint(self):
+        self.client.force_login(self.user)
+        lesson = self.lessons[0]
+        url = reverse('lesson-view-batch')
+        response = self.client.post(url, {'views': [{'lesson': lesson.pk, 'view_duration': 40},
+                                                    {'lesson': lesson.pk, 'view_duration': 30}]},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'created': 1, 'updated': 0, 'unchanged': 0})
+        response = self.client.post(url, {'views': [{'lesson': lesson.pk, 'view_duration': 20}]},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'created': 0, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(self.stored(self.user, lesson), 40)
+        response = self.client.post(url, {'views': [{'lesson': lesson.pk, 'view_duration': 101}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner')
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.user) for i in range(3)]
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=60)
+        ProductLesson.objects.create(product=cls.products[0], lesson=cls.lesson)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get(self, name, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(name), params, **headers)
+
+    def test_not_modified_list_skips_serialization(self):
+        etag = self.get('product-list', limit=2)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('product-list', etag, limit=2)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 2)  # COUNT и страница, без отдельного запроса валидатора
+
+    def test_other_etag_or_page_gets_full_response(self):
+        etag = self.get('product-list', limit=2)['ETag']
+        self.assertEqual(self.get('product-list', 'W/"other"', limit=2).status_code, 200)
+        response = self.get('product-list', etag, limit=2, offset=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_write(self):
+        etag = self.get('product-list', limit=2)['ETag']
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.name = 'renamed'
+        product.save()
+        response = self.get('product-list', etag, limit=2)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Строка за пределами страницы меняет количество
+        Product.objects.create(name='z-new', owner=self.user)
+        response = self.get('product-list', etag, limit=2)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.products[2].delete()
+        self.assertEqual(self.get('product-list', etag, limit=2).status_code, 200)
+
+    def test_access_change_invalidates_lesson_list(self):
+        etag = self.get('lesson-list', limit=10)['ETag']
+        self.assertEqual(self.get('lesson-list', etag, limit=10).status_code, 304)
+        ProductAccess.objects.create(product=self.products[0], user=self.user)
+        response = self.get('lesson-list', etag, limit=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([lesson['id'] for lesson in response.data['results']], [self.lesson.pk])
+
+    def test_keyset_mode_has_no_etag(self):
+        response = self.get('product-list', limit=2, pagination='cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_async_list_not_modified(self):
+        factory = APIRequestFactory()
+        view = AsyncProductListView.as_view()
+
+        def get(**headers):
+            request = factory.get('/products/', {'limit': 2}, **headers)
+            force_authenticate(request, self.user)
+            return async_to_sync(view)(request)
+
+        etag = get()['ETag']
+        self.assertEqual(get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_detail_etag_and_last_modified(self):
+        url = reverse('product-detail', kwargs={'pk': self.products[0].pk})
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.client.patch(url, {'name': 'renamed'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class AsyncViewsParityTests(APITestCase):
+    """Маршруты с COURSES_ASYNC_VIEWS (courses/async_views.py) отвечают так же, как синхронные:
+    те же данные, ссылки пагинации и курсоры, фильтры и сортировка, то же число запросов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Отдельная копия courses.urls, собранная с включенной настройкой
+        spec = importlib.util.find_spec('courses.urls')
+        cls.async_urls = importlib.util.module_from_spec(spec)
+        with override_settings(COURSES_ASYNC_VIEWS=True):
+            spec.loader.exec_module(cls.async_urls)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner')
+        cls.other = User.objects.create(username='other')
+        cls.products = [Product.objects.create(name=f'product {i % 3}', owner=cls.user) for i in range(5)]
+        Product.objects.create(name='foreign', owner=cls.other)
+        cls.lessons = [Lesson.objects.create(title=f'lesson {i % 2}', video_url='https://example.com', duration=100)
+                       for i in range(5)]
+        for product, lesson in zip(cls.products, cls.lessons):
+            ProductLesson.objects.create(product=product, lesson=lesson)
+            ProductAccess.objects.create(product=product, user=cls.user)
+            ProductAccess.objects.create(product=product, user=cls.other)
+            LessonView.objects.create(user=cls.user, lesson=lesson, view_duration=lesson.pk * 37 % 101)
+            LessonView.objects.create(user=cls.other, lesson=lesson, view_duration=90)
+
+    def get(self, url, params=None, asynchronous=False):
+        urlconf = self.async_urls if asynchronous else settings.ROOT_URLCONF
+        with override_settings(ROOT_URLCONF=urlconf), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, queries
+
+    def assertSameResponse(self, url, params=None):
+        """Сравнивает ответы и число запросов; возвращает ответ для перехода по ссылкам."""
+        sync_response, sync_queries = self.get(url, params)
+        async_response, async_queries = self.get(url, params, asynchronous=True)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        self.assertEqual(async_response.get('ETag'), sync_response.get('ETag'))
+        self.assertEqual(len(async_queries), len(sync_queries))
+        return sync_response
+
+    def test_async_routes_are_used(self):
+        names = {pattern.name: pattern.callback.view_class for pattern in self.async_urls.urlpatterns}
+        for name in ('product-list', 'lesson-list', 'lesson-view-list', 'product-statistics'):
+            self.assertTrue(issubclass(names[name], AsyncListView), name)
+
+    def test_same_pages_filters_and_ordering(self):
+        self.client.force_authenticate(self.user)
+        cases = {
+            'product-list': [{'name': 'product 1'}, {'ordering': '-created'}, {'ordering': 'name', 'offset': 2}],
+            'lesson-list': [{'title': 'lesson 0'}, {'ordering': '-title'}, {'ordering': 'created', 'offset': 2}],
+            'lesson-view-list': [{'status': LessonView.VIEWED}, {'lesson': self.lessons[1].pk},
+                                 {'ordering': '-view_duration'}, {'ordering': 'status', 'offset': 2}],
+            'product-statistics': [{'owner': 'me'}, {'product_ids': f'{self.products[1].pk},{self.products[3].pk}'},
+                                   {'from': '2026-01-01', 'to': '2026-01-08'}, {'offset': 2}],
+        }
+        for name, variants in cases.items():
+            for params in [{}, *variants]:
+                for mode in ({}, {'pagination': 'cursor'}):
+                    if 'offset' in params and mode:
+                        continue
+                    with self.subTest(route=name, params=params, mode=mode):
+                        response = self.assertSameResponse(reverse(name), {**params, **mode, 'limit': 2})
+                        self.assertEqual(response.status_code, 200)
+                        # Следующие страницы -- по ссылкам из ответа (offset или курсор)
+                        pages = 1
+                        while response.data.get('next'):
+                            response = self.assertSameResponse(response.data['next'])
+                            pages += 1
+                        if not params:
+                            self.assertGreater(pages, 1)
+
+    def test_invalid_parameters(self):
+        self.client.force_authenticate(self.user)
+        self.assertSameResponse(reverse('product-statistics'), {'product_ids': 'a,b'})
+        self.assertSameResponse(reverse('lesson-view-list'), {'status': 'unknown'})
+        self.assertSameResponse(reverse('product-list'), {'pagination': 'cursor', 'cursor': 'broken'})
+
+    def test_unauthenticated(self):
+        for name in ('product-list', 'lesson-list', 'lesson-view-list', 'product-statistics'):
+            with self.subTest(route=name):
+                response, _ = self.get(reverse(name), asynchronous=True)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Token')
+                self.assertSameResponse(reverse(name))
+
+                # Неверный токен отклоняется так же
+                self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+                self.assertSameResponse(reverse(name))
+                self.client.credentials()
+
+
+class LessonMetadataCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=60)
+
+    def setUp(self):
+        cache.clear()
+        # Два экземпляра -- кэши двух процессов с общим кэшем Django
+        self.cache = LessonMetadataCache(version_check_interval=0)
+        self.other_process = LessonMetadataCache(version_check_interval=0)
+
+    def test_hit_does_not_query(self):
+        self.assertEqual(self.cache.get(self.lesson.pk).duration, 60)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get(self.lesson.pk).duration, 60)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+        self.assertIsNone(self.cache.get(10 ** 6))
+
+    def test_invalidate_drops_entry(self):
+        self.cache.get(self.lesson.pk)
+        Lesson.objects.filter(pk=self.lesson.pk).update(duration=90)
+        self.cache.invalidate(self.lesson.pk)
+        self.assertEqual(self.cache.get(self.lesson.pk).duration, 90)
+
+    def test_version_bump_clears_other_process(self):
+        self.cache.get(self.lesson.pk)
+        Lesson.objects.filter(pk=self.lesson.pk).update(duration=90)
+        self.other_process.invalidate(self.lesson.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get(self.lesson.pk).duration, 90)
+
+    def test_lesson_save_bumps_version(self):
+        self.cache.get(self.lesson.pk)
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.duration = 120
+        lesson.save()
+        self.assertEqual(self.cache.get(self.lesson.pk).duration, 120)
+
+    def test_entries_expire_without_version_bump(self):
+        self.cache.ttl = 30
+        with mock.patch('courses.lesson_cache.time.monotonic', return_value=1000.0):
+            self.cache.get(self.lesson.pk)
+        Lesson.objects.filter(pk=self.lesson.pk).update(duration=90)
+        with mock.patch('courses.lesson_cache.time.monotonic', return_value=1020.0):
+            self.assertEqual(self.cache.get(self.lesson.pk).duration, 60)
+        with mock.patch('courses.lesson_cache.time.monotonic', return_value=1031.0):
+            self.assertEqual(self.cache.get(self.lesson.pk).duration, 90)
+
+
+class ProgressBufferTests(StatisticsAssertionsMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='viewer')
+        cls.product = Product.objects.create(name='product', owner=cls.user)
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=100)
+        ProductLesson.objects.create(product=cls.product, lesson=cls.lesson)
+
+    def setUp(self):
+        self.buffer = ProgressBuffer(enabled=True, max_size=1000)
+        for patcher in (mock.patch.object(self.buffer, '_ensure_started'),
+                        mock.patch('courses.views.progress_buffer', self.buffer)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stored(self):
+        return LessonView.objects.get(user=self.user, lesson=self.lesson).view_duration
+
+    def test_flush_writes_maximum(self):
+        for value in (30, 20, 50, 40):
+            self.buffer.add(self.user.pk, self.lesson.pk, value, self.lesson.duration)
+        self.assertEqual(self.buffer.pending_for_user(self.user.pk), {self.lesson.pk: 50})
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.stored(), 50)
+        self.assertStatisticsExact()
+
+    def test_failed_flush_on_add_keeps_reports(self):
+        self.buffer.max_size = 1
+        with mock.patch('courses.buffer.upsert_progress', side_effect=DatabaseError), \
+                self.assertLogs('courses.buffer', 'ERROR'):
+            self.buffer.add(self.user.pk, self.lesson.pk, 90, self.lesson.duration)
+        self.assertEqual(self.buffer.pending_for_user(self.user.pk), {self.lesson.pk: 90})
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.stored(), 90)
+
+    def test_patch_and_put_are_buffered_and_read_back(self):
+        view = LessonView.objects.create(user=self.user, lesson=self.lesson, view_duration=10)
+        url = reverse('lesson-view-detail', kwargs={'pk': view.pk})
+        self.client.force_authenticate(self.user)
+
+        response = self.client.patch(url, {'view_duration': 40})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['view_duration'], 40)
+        response = self.client.put(url, {'lesson': self.lesson.pk, 'user': self.user.pk, 'view_duration': 85})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], LessonView.VIEWED)
+        self.assertEqual(self.stored(), 10)
+        self.assertEqual(self.client.get(url).data['view_duration'], 85)
+
+        self.buffer.flush()
+        self.assertEqual(self.stored(), 85)
+        self.assertStatisticsExact()
+
+    def test_update_of_other_fields_is_written_directly(self):
+        other = User.objects.create(username='other')
+        view = LessonView.objects.create(user=self.user, lesson=self.lesson, view_duration=10)
+        self.client.force_authenticate(self.user)
+        response = self.client.put(reverse('lesson-view-detail', kwargs={'pk': view.pk}),
+                                   {'lesson': self.lesson.pk, 'user': other.pk, 'view_duration': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(LessonView.objects.get(pk=view.pk).user_id, other.pk)
+        self.assertStatisticsExact()
+
+
+class IncrementalStatisticsTests(StatisticsAssertionsMixin, TestCase):
+    """Таблица статистики, поддерживаемая сигналами, после каждого изменения совпадает с пересчетом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.student = User.objects.create(username='student')
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.owner) for i in range(2)]
+        cls.lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                       for i in range(2)]
+        # Первый урок входит в оба продукта
+        ProductLesson.objects.create(product=cls.products[0], lesson=cls.lessons[0])
+        ProductLesson.objects.create(product=cls.products[1], lesson=cls.lessons[0])
+        ProductLesson.objects.create(product=cls.products[1], lesson=cls.lessons[1])
+
+    def test_lesson_view_create_update_delete(self):
+        view = LessonView.objects.create(user=self.student, lesson=self.lessons[0], view_duration=50)
+        self.assertStatisticsExact()
+        for field, value in (('view_duration', 90), ('view_duration', 70), ('view_duration', 100),
+                             ('lesson_id', self.lessons[1].pk), ('user_id', self.owner.pk)):
+            view = LessonView.objects.get(pk=view.pk)
+            setattr(view, field, value)
+            view.save()
+            with self.subTest(field=field, value=value):
+                self.assertStatisticsExact()
+        self.assertEqual(self.stored_statistics(self.products[1]), (1, 100, 0))
+        LessonView.objects.get(pk=view.pk).delete()
+        self.assertStatisticsExact()
+        self.assertEqual(self.stored_statistics(self.products[1]), (0, 0, 0))
+
+    def test_saving_loaded_view_does_not_reread_row(self):
+        view = LessonView.objects.create(user=self.student, lesson=self.lessons[0], view_duration=50)
+        view = LessonView.objects.get(pk=view.pk)
+        view.view_duration = 95
+        with CaptureQueriesContext(connection) as queries:
+            view.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "courses_lessonview"')])
+        self.assertStatisticsExact()
+
+    def test_view_constructed_without_loading_falls_back_to_query(self):
+        view = LessonView.objects.create(user=self.student, lesson=self.lessons[0], view_duration=90)
+        LessonView(pk=view.pk, user=self.student, lesson=self.lessons[0], view_duration=10,
+                   created=view.created).save()
+        self.assertStatisticsExact()
+
+    def test_lesson_and_product_lesson_changes(self):
+        LessonView.objects.create(user=self.student, lesson=self.lessons[0], view_duration=85)
+        LessonView.objects.create(user=self.owner, lesson=self.lessons[1], view_duration=60)
+        lesson = Lesson.objects.get(pk=self.lessons[1].pk)
+        lesson.duration = 70  # 60 из 70 -- уже просмотрено
+        lesson.save()
+        self.assertStatisticsExact()
+        self.assertEqual(self.stored_statistics(self.products[1]), (2, 145, 0))
+
+        link = ProductLesson.objects.create(product=self.products[0], lesson=self.lessons[1])
+        self.assertStatisticsExact()
+        link = ProductLesson.objects.get(pk=link.pk)
+        link.lesson = self.lessons[0]
+        link.save()
+        self.assertStatisticsExact()
+        link.delete()
+        self.assertStatisticsExact()
+
+        Lesson.objects.get(pk=self.lessons[0].pk).delete()
+        self.assertStatisticsExact()
+        self.assertEqual(self.stored_statistics(self.products[0]), (0, 0, 0))
+
+    def test_access_and_users(self):
+        access = ProductAccess.objects.create(product=self.products[0], user=self.student)
+        self.assertStatisticsExact()
+        access = ProductAccess.objects.get(pk=access.pk)
+        access.product = self.products[1]
+        access.save()
+        self.assertStatisticsExact()
+        access.delete()
+        User.objects.create(username='newcomer')
+        self.assertStatisticsExact()
+        User.objects.get(username='newcomer').delete()
+        self.assertStatisticsExact()
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class ProductStatisticsTests(StatisticsAssertionsMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.other = User.objects.create(username='other')
+        cls.students = [User.objects.create(username=f'student {i}') for i in range(3)]
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.owner) for i in range(3)]
+        cls.products.append(Product.objects.create(name='foreign', owner=cls.other))
+        lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                   for i in range(4)]
+        for product, product_lessons in zip(cls.products, ([0, 1], [1, 2], [], [3])):
+            for index in product_lessons:
+                ProductLesson.objects.create(product=product, lesson=lessons[index])
+        for student, durations in zip(cls.students, ([90, 79, 100, 0], [80, 100, 10, 95], [0, 85, 0, 0])):
+            for lesson, duration in zip(lessons, durations):
+                LessonView.objects.create(user=student, lesson=lesson, view_duration=duration)
+        # Несколько студентов на продукт: в общем JOIN прежнего запроса SUM умножался бы на их число
+        for product in cls.products[:2]:
+            for student in cls.students:
+                ProductAccess.objects.create(product=product, user=student)
+
+    def legacy_statistics(self):
+        """Выражения прежнего запроса ProductStatisticsView, по одной метрике на запрос."""
+        viewed = Q(productlesson__lesson__lessonview__view_duration__gte=F('productlesson__lesson__duration') * 0.8)
+        views = Product.all_objects.annotate(
+            viewed_lessons_count=Count('productlesson__lesson__lessonview', filter=viewed, distinct=True),
+            total_view_time=Sum('productlesson__lesson__lessonview__view_duration', filter=viewed),
+        ).values_list('id', 'viewed_lessons_count', 'total_view_time')
+        students = dict(Product.all_objects.annotate(
+            students_count=Count('productaccess__user', distinct=True),
+        ).values_list('id', 'students_count'))
+        return {
+            pk: {'viewed_lessons_count': count, 'total_view_time': time or 0, 'students_count': students[pk]}
+            for pk, count, time in views
+        }
+
+    def test_subqueries_match_legacy_aggregates(self):
+        computed = compute_product_statistics()
+        self.assertEqual(computed, self.legacy_statistics())
+        self.assertEqual(computed[self.products[0].pk], {
+            'viewed_lessons_count': 4, 'total_view_time': 355, 'students_count': 3,
+        })
+        self.assertEqual(compute_product_statistics([self.products[2].pk]), {
+            self.products[2].pk: {'viewed_lessons_count': 0, 'total_view_time': 0, 'students_count': 0},
+        })
+        self.assertStatisticsExact()
+
+    def test_response_shape_and_pagination(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(reverse('product-statistics'), {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertIsNotNone(response.data['next'])
+        total_users = User.objects.count()
+        self.assertEqual(response.data['results'][0], {
+            "id_продукта": self.products[0].pk,
+            "название продукта": 'product 0',
+            "количество просмотренных уроков": 4,
+            "общее время просмотра": 355,
+            "количество студентов": 3,
+            "процент приобретения": 3 * 100.0 / total_users,
+        })
+
+        response = self.client.get(reverse('product-statistics'), {'limit': 2, 'pagination': 'cursor'})
+        first = [row["id_продукта"] for row in response.data['results']]
+        rest = [row["id_продукта"] for row in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(first + rest, [product.pk for product in self.products])
+
+    def test_filters(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse('product-statistics')
+
+        def ids(**params):
+            return [row["id_продукта"] for row in self.client.get(url, {**params, 'limit': 10}).data['results']]
+
+        self.assertEqual(ids(owner='me'), [product.pk for product in self.products[:3]])
+        self.assertEqual(ids(owner=self.other.pk), [self.products[3].pk])
+        self.assertEqual(ids(product_ids=f'{self.products[1].pk},{self.products[3].pk}'),
+                         [self.products[1].pk, self.products[3].pk])
+        self.products[1].delete()
+        self.assertEqual(ids(owner='me'), [self.products[0].pk, self.products[2].pk])
+        self.assertEqual(self.client.get(url, {'product_ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'owner': 'x'}).status_code, 400)
+
+    def test_drift_is_found_and_rebuilt(self):
+        ProductStatistics.objects.filter(product=self.products[0]).update(total_view_time=1)
+        ProductStatistics.objects.filter(product=self.products[1]).delete()
+        StatisticsCounter.objects.filter(name=StatisticsCounter.USERS).update(value=0)
+        drift = find_statistics_drift()
+        self.assertCountEqual([(product_id, field) for product_id, field, *_ in drift], [
+            (self.products[0].pk, 'total_view_time'), (self.products[1].pk, 'missing'),
+            (None, StatisticsCounter.USERS),
+        ])
+        self.assertIn((self.products[0].pk, 'total_view_time', 355, 1), drift)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_product_statistics', check=True, stdout=mock.Mock())
+        call_command('rebuild_product_statistics', stdout=mock.Mock())
+        self.assertStatisticsExact()
+        call_command('rebuild_product_statistics', check=True, stdout=mock.Mock())
+
+
+class DatesModelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.other = User.objects.create(username='other')
+
+    def test_bulk_create_keeps_explicit_dates(self):
+        past = timezone.now() - timezone.timedelta(days=30)
+        imported, fresh = Product.objects.bulk_create([
+            Product(name='imported', owner=self.owner, created=past, updated=past),
+            Product(name='fresh', owner=self.owner),
+        ])
+        imported.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((imported.created, imported.updated), (past, past))
+        self.assertGreater(fresh.created, past)
+        self.assertGreater(fresh.updated, past)
+
+    def test_save_writes_only_changed_fields(self):
+        product = Product.objects.create(name='before', owner=self.owner)
+        stale = Product.objects.get(pk=product.pk)
+        product.owner = self.other
+        product.save()
+
+        stale.name = 'after'
+        with CaptureQueriesContext(connection) as queries:
+            stale.save()
+        [update] = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertIn('"name"', update)
+        self.assertIn('"updated"', update)
+        self.assertNotIn('"owner_id"', update)
+        self.assertNotIn('"created"', update)
+
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.owner), ('after', self.other))
+
+    def test_noop_save_writes_nothing(self):
+        product = Product.objects.get(pk=Product.objects.create(name='product', owner=self.owner).pk)
+        updated = product.updated
+        with self.assertNumQueries(0):
+            product.save()
+        self.assertEqual(product.updated, updated)
+
+        product.name = 'renamed'
+        product.save()
+        self.assertGreater(product.updated, updated)
+        with self.assertNumQueries(0):
+            product.save()
+
+
+class BulkEnrollmentTests(StatisticsAssertionsMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.users = [User.objects.create(username=f'user {i}') for i in range(4)]
+        cls.product = Product.objects.create(name='product', owner=cls.owner)
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=100)
+        ProductLesson.objects.create(product=cls.product, lesson=cls.lesson)
+
+    def assertAccessConsistent(self):
+        self.assertStatisticsExact()
+        missing, extra = find_lesson_access_drift()
+        self.assertEqual((list(missing), list(extra)), ([], []))
+
+    def test_grant_and_revoke(self):
+        ids = [user.pk for user in self.users]
+        result = enrollment.grant_product_access(self.product.pk, [*ids[:3], 10 ** 6])
+        self.assertEqual(result, {'requested': 4, 'created': 3, 'existing': 0, 'unknown': 1})
+        result = enrollment.grant_product_access(self.product.pk, ids)
+        self.assertEqual(result, {'requested': 4, 'created': 1, 'existing': 3, 'unknown': 0})
+        self.assertEqual(self.stored_statistics(self.product)[2], 4)
+        self.assertAccessConsistent()
+
+        result = enrollment.revoke_product_access(self.product.pk, [ids[0], ids[1], 10 ** 6])
+        self.assertEqual(result, {'requested': 3, 'deleted': 2})
+        self.assertEqual(
+            set(ProductAccess.objects.values_list('user_id', flat=True)), {ids[2], ids[3]},
+        )
+        self.assertEqual(self.stored_statistics(self.product)[2], 2)
+        self.assertAccessConsistent()
+
+    def test_grant_counts_rows_inserted_concurrently(self):
+        racer = self.users[0]
+        bulk_create = ProductAccess.objects.bulk_create
+
+        def race(objs, **kwargs):
+            # Другой запрос успевает выдать доступ между проверкой existing и вставкой
+            ProductAccess.objects.create(product=self.product, user=racer)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(ProductAccess.objects, 'bulk_create', side_effect=race):
+            result = enrollment.grant_product_access(self.product.pk, [user.pk for user in self.users])
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(ProductAccess.objects.count(), 4)
+        self.assertEqual(self.stored_statistics(self.product)[2], 4)
+        self.assertAccessConsistent()
+
+    def test_revoke_does_not_fire_delete_signals(self):
+        enrollment.grant_product_access(self.product.pk, [user.pk for user in self.users])
+        with mock.patch('courses.signals.statistics.apply_students_delta') as delta:
+            enrollment.revoke_product_access(self.product.pk, [user.pk for user in self.users])
+        delta.assert_not_called()
+        self.assertFalse(ProductAccess.objects.exists())
+        self.assertAccessConsistent()
+
+
+    def test_revoke_splits_delete_by_parameter_limit(self):
+        enrollment.grant_product_access(self.product.pk, [user.pk for user in self.users])
+        with mock.patch.object(connection.ops, 'bulk_batch_size', return_value=3), \
+                CaptureQueriesContext(connection) as queries:
+            result = enrollment.revoke_product_access(self.product.pk, [user.pk for user in self.users])
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "courses_productaccess"')]
+        self.assertEqual(len(deletes), 2)
+        self.assertEqual(result['deleted'], 4)
+        self.assertFalse(ProductAccess.objects.exists())
+        self.assertAccessConsistent()
+
+
+class ViewEventRollupTests(TestCase):
+    day = datetime(2026, 3, 10, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        owner = User.objects.create(username='owner')
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=100)
+        cls.products = [Product.objects.create(name=f'product {i}', owner=owner) for i in range(2)]
+        for product in cls.products:
+            ProductLesson.objects.create(product=product, lesson=cls.lesson)
+
+    def event(self, occurred_at, watched_seconds=10, became_viewed=False, **kwargs):
+        return ViewEvent.objects.create(
+            user=self.user, lesson=self.lesson, watched_seconds=watched_seconds, view_duration=watched_seconds,
+            became_viewed=became_viewed, occurred_at=occurred_at, **kwargs,
+        )
+
+    def rollups(self, model=LessonViewRollup, **filters):
+        return {
+            (period, bucket): values
+            for period, bucket, *values in model.objects.filter(**filters).values_list(
+                'period', 'bucket', *view_events.ROLLUP_FIELDS,
+            )
+        }
+
+    def test_hour_and_day_buckets(self):
+        self.event(self.day.replace(hour=10, minute=15), 10, became_viewed=True)
+        self.event(self.day.replace(hour=10, minute=45), 20)
+        self.event(self.day.replace(hour=11, minute=5), 30)
+        self.event(self.day.replace(hour=23, minute=59, second=59), 40)
+        self.event(self.day + timedelta(days=1), 50)
+        self.assertEqual(view_events.rollup(), 5)
+
+        expected = {
+            (ViewRollup.HOUR, self.day.replace(hour=10)): [30, 1, 2],
+            (ViewRollup.HOUR, self.day.replace(hour=11)): [30, 0, 1],
+            (ViewRollup.HOUR, self.day.replace(hour=23)): [40, 0, 1],
+            (ViewRollup.HOUR, self.day + timedelta(days=1)): [50, 0, 1],
+            (ViewRollup.DAY, self.day): [100, 1, 4],
+            (ViewRollup.DAY, self.day + timedelta(days=1)): [50, 0, 1],
+        }
+        self.assertEqual(self.rollups(), expected)
+        for product in self.products:
+            self.assertEqual(self.rollups(ProductViewRollup, product=product), expected)
+
+    def test_rollup_is_idempotent(self):
+        for minute in range(3):
+            self.event(self.day.replace(minute=minute))
+        self.assertEqual(view_events.rollup(batch_size=2), 3)
+        rolled = self.rollups()
+        self.assertEqual(view_events.rollup(), 0)
+        self.assertEqual(self.rollups(), rolled)
+        self.assertFalse(ViewEvent.objects.filter(rolled_up=False).exists())
+
+        self.event(self.day.replace(minute=30), 5)
+        self.assertEqual(view_events.rollup(), 1)
+        self.assertEqual(self.rollups()[(ViewRollup.DAY, self.day)], [35, 0, 4])
+
+    def test_late_committed_event_is_not_lost(self):
+        self.event(self.day, 10, id=1000)
+        view_events.rollup()
+        # Событие из долгой транзакции: id меньше уже свернутого, видно только теперь
+        self.event(self.day, 5, id=500)
+        self.assertEqual(view_events.rollup(), 1)
+        self.assertEqual(self.rollups()[(ViewRollup.DAY, self.day)], [15, 0, 2])
+
+    def test_recent_events_wait_for_delay(self):
+        self.event(timezone.now())
+        self.assertEqual(view_events.rollup(), 0)
+        with mock.patch('courses.view_events.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            self.assertEqual(view_events.rollup(), 1)
+
+    def test_prune_deletes_only_old_rolled_up_events(self):
+        old = timezone.now() - timedelta(days=60)
+        rolled = self.event(old)
+        view_events.rollup()
+        pending = self.event(old)
+        recent = self.event(timezone.now() - timedelta(days=1), rolled_up=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_events.prune(retention_days=30), 1)
+        self.assertEqual(set(ViewEvent.objects.values_list('pk', flat=True)), {pending.pk, recent.pk})
+        self.assertFalse(ViewEvent.objects.filter(pk=rolled.pk).exists())
+
+    def test_range_condition(self):
+        start = self.day - timedelta(days=1)
+        hours = [start + timedelta(hours=hour) for hour in range(0, 72, 5)]
+        for hour in hours:
+            self.event(hour + timedelta(minutes=20), watched_seconds=hour.hour + 1)
+        view_events.rollup()
+
+        def expected(lower, upper):
+            floor = view_events._hour
+            return sum(
+                hour.hour + 1 for hour in hours
+                if (lower is None or hour >= floor(lower)) and (upper is None or hour < floor(upper))
+            )
+
+        moscow = dt_timezone(timedelta(hours=3))
+        cases = [
+            (self.day.replace(hour=2), self.day.replace(hour=20)),  # внутри одних суток
+            (self.day, self.day + timedelta(days=1)),  # ровно сутки
+            (self.day.replace(hour=3, minute=30), self.day.replace(hour=12, minute=10) + timedelta(days=1)),
+            (self.day.replace(hour=5), None),
+            (None, self.day.replace(hour=7, minute=59)),
+            (None, None),
+            (self.day.replace(hour=10), self.day.replace(hour=10)),  # пустой диапазон
+            (self.day.astimezone(moscow), (self.day + timedelta(days=1, hours=1)).astimezone(moscow)),
+        ]
+        for lower, upper in cases:
+            with self.subTest(start=lower, end=upper):
+                total = LessonViewRollup.objects.filter(view_events.range_condition(lower, upper)).aggregate(
+                    total=Sum('watch_seconds'),
+                )['total'] or 0
+                self.assertEqual(total, expected(lower, upper))
+
+
+class ProductProgressTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        owner = User.objects.create(username='owner')
+        cls.lessons = [
+            Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100) for i in range(2)
+        ]
+        cls.course = Product.objects.create(name='course', owner=owner)
+        cls.empty = Product.objects.create(name='empty', owner=owner)
+        cls.deleted = Product.objects.create(name='deleted', owner=owner)
+        cls.foreign = Product.objects.create(name='foreign', owner=owner)
+        for product in (cls.course, cls.deleted, cls.foreign):
+            for lesson in cls.lessons:
+                ProductLesson.objects.create(product=product, lesson=lesson)
+        for product in (cls.course, cls.empty, cls.deleted):
+            ProductAccess.objects.create(product=product, user=cls.user)
+        cls.deleted.delete()
+        # 80 из 100 -- ровно порог "Просмотрено", 79 -- нет
+        cls.views = [LessonView.objects.create(lesson=lesson, user=cls.user, view_duration=duration)
+                     for lesson, duration in zip(cls.lessons, (80, 79))]
+
+    def setUp(self):
+        cache.clear()
+
+    def row(self, product, total, viewed, seconds):
+        return {
+            'product_id': product.pk, 'product_name': product.name, 'total_lessons': total, 'viewed_lessons': viewed,
+            'watch_seconds': seconds, 'percent_complete': viewed * 100.0 / total if total else 0.0,
+        }
+
+    def test_compute(self):
+        self.assertEqual(progress.compute_product_progress(self.user.pk), [
+            self.row(self.course, 2, 1, 159),
+            self.row(self.empty, 0, 0, 0),
+        ])
+        self.assertEqual(progress.compute_product_progress(User.objects.create(username='new').pk), [])
+
+    def test_invalidated_by_views_and_access(self):
+        self.assertEqual(progress.get_product_progress(self.user.pk)[0], self.row(self.course, 2, 1, 159))
+        with self.assertNumQueries(0):
+            progress.get_product_progress(self.user.pk)
+
+        view = self.views[1]
+        view.view_duration = 100
+        view.save()
+        self.assertEqual(progress.get_product_progress(self.user.pk)[0], self.row(self.course, 2, 2, 180))
+
+        ProductAccess.objects.create(product=self.foreign, user=self.user)
+        self.assertEqual(
+            [row['product_id'] for row in progress.get_product_progress(self.user.pk)],
+            [self.course.pk, self.empty.pk, self.foreign.pk],
+        )
+
+    def test_invalidated_by_product_changes(self):
+        progress.get_product_progress(self.user.pk)
+        ProductLesson.objects.create(
+            product=self.empty,
+            lesson=Lesson.objects.create(title='new', video_url='https://example.com', duration=10),
+        )
+        self.assertEqual(progress.get_product_progress(self.user.pk)[1], self.row(self.empty, 1, 0, 0))
+
+        self.course.delete()
+        self.assertEqual(
+            [row['product_id'] for row in progress.get_product_progress(self.user.pk)], [self.empty.pk],
+        )
+
+    def test_ttl_is_short_without_shared_cache(self):
+        self.assertEqual(progress._ttl(), progress.LOCAL_TTL)
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(progress._ttl(), progress._options.get('TTL', 300))
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.basics = Product.objects.create(name='Python basics', owner=cls.owner)
+        cls.idioms = Product.objects.create(name='Pythonic idioms and python tricks', owner=cls.owner)
+        cls.django = Product.objects.create(name='Advanced Django', owner=cls.owner)
+
+    def search(self, *terms, rank=True):
+        return list(apply_fulltext_search(Product.objects.all(), 'product', terms, rank=rank))
+
+    def test_matching(self):
+        self.assertCountEqual(self.search('pyth', rank=False), [self.basics, self.idioms])
+        self.assertEqual(self.search('python basics'), [self.basics])
+        self.assertEqual(self.search('DJANGO'), [self.django])
+        self.assertEqual(self.search('"*)'), [])
+        self.assertEqual(self.search('ruby'), [])
+
+    def test_triggers_follow_writes(self):
+        [created] = Product.objects.bulk_create([Product(name='Rust in action', owner=self.owner)])
+        self.assertEqual(self.search('rust'), [created])
+
+        Product.objects.filter(pk=created.pk).update(name='Go in action')
+        self.assertEqual(self.search('rust'), [])
+        self.assertEqual(self.search('go'), [created])
+
+        Product.objects.filter(pk=created.pk).hard_delete()
+        self.assertEqual(self.search('action'), [])
+
+    def test_post_migrate_restores_triggers(self):
+        # Пересоздание таблицы при ALTER в SQLite удаляет ее триггеры
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER courses_product_fts_{suffix}')
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        created = Product.objects.create(name='Haskell', owner=self.owner)
+        self.assertEqual(self.search('haskell'), [created])
+
+    def test_uses_connection_of_queryset(self):
+        with mock.patch('courses.search.connections', {'default': mock.Mock(vendor='mysql')}):
+            self.assertIsNone(apply_fulltext_search(Product.objects.all(), 'product', ['python']))
+
+
+class LessonAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='owner')
+        cls.alice = User.objects.create(username='alice')
+        cls.bob = User.objects.create(username='bob')
+        cls.first = Product.objects.create(name='first', owner=owner)
+        cls.second = Product.objects.create(name='second', owner=owner)
+        cls.lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                       for i in range(3)]
+        for product, lessons in ((cls.first, cls.lessons[:2]), (cls.second, cls.lessons[1:])):
+            for lesson in lessons:
+                ProductLesson.objects.create(product=product, lesson=lesson)
+
+    def rows(self):
+        return set(LessonAccess.objects.values_list('user_id', 'product_id', 'lesson_id'))
+
+    def assertConsistent(self, expected=None):
+        missing, extra = find_lesson_access_drift()
+        self.assertEqual((list(missing), list(extra)), ([], []))
+        self.assertEqual(self.rows(), set(expected_lesson_access()))
+        if expected is not None:
+            self.assertEqual(self.rows(), expected)
+
+    def triples(self, user, product, lessons):
+        return {(user.pk, product.pk, lesson.pk) for lesson in lessons}
+
+    def test_grant_and_revoke(self):
+        granted = ProductAccess.objects.create(product=self.first, user=self.alice)
+        ProductAccess.objects.create(product=self.second, user=self.alice)
+        self.assertConsistent(
+            self.triples(self.alice, self.first, self.lessons[:2]) | self.triples(self.alice, self.second, self.lessons[1:]),
+        )
+        granted.delete()
+        self.assertConsistent(self.triples(self.alice, self.second, self.lessons[1:]))
+
+        moved = ProductAccess.objects.create(product=self.first, user=self.bob)
+        moved.product = self.second
+        moved.save()
+        self.assertConsistent(
+            self.triples(self.alice, self.second, self.lessons[1:]) | self.triples(self.bob, self.second, self.lessons[1:]),
+        )
+
+    def test_grant_writes_to_write_alias(self):
+        with override_settings(DATABASE_ROUTERS=[ReadsElsewhereRouter(LessonAccess), *settings.DATABASE_ROUTERS]):
+            ProductAccess.objects.create(product=self.first, user=self.alice)
+        self.assertConsistent(self.triples(self.alice, self.first, self.lessons[:2]))
+
+    def test_add_and_remove_lesson(self):
+        ProductAccess.objects.create(product=self.first, user=self.alice)
+        extra = ProductLesson.objects.create(product=self.first, lesson=self.lessons[2])
+        self.assertConsistent(self.triples(self.alice, self.first, self.lessons))
+
+        # Урок привязан к продукту дважды: после удаления одной привязки доступ остается
+        duplicate = ProductLesson.objects.create(product=self.first, lesson=self.lessons[2])
+        duplicate.delete()
+        self.assertConsistent(self.triples(self.alice, self.first, self.lessons))
+        extra.delete()
+        self.assertConsistent(self.triples(self.alice, self.first, self.lessons[:2]))
+
+    def test_soft_delete_and_restore(self):
+        ProductAccess.objects.create(product=self.first, user=self.alice)
+        ProductAccess.objects.create(product=self.second, user=self.bob)
+        self.first.delete()
+        self.assertConsistent(self.triples(self.bob, self.second, self.lessons[1:]))
+        Product.objects.filter(pk=self.second.pk).delete()
+        self.assertConsistent(set())
+
+        # Доступ, выданный удаленному продукту, строк не добавляет
+        ProductAccess.objects.create(product=self.first, user=self.bob)
+        self.assertConsistent(set())
+
+        self.first.is_deleted = False
+        self.first.save()
+        self.assertConsistent(
+            self.triples(self.alice, self.first, self.lessons[:2]) | self.triples(self.bob, self.first, self.lessons[:2]),
+        )
+
+    def test_rebuild_matches_incremental(self):
+        for user in (self.alice, self.bob):
+            ProductAccess.objects.create(product=self.first, user=user)
+        ProductAccess.objects.create(product=self.second, user=self.alice)
+        ProductLesson.objects.create(product=self.second, lesson=self.lessons[0])
+        incremental = self.rows()
+        self.assertConsistent()
+
+        LessonAccess.objects.filter(user=self.alice).delete()
+        LessonAccess.objects.create(user=self.bob, product=self.second, lesson=self.lessons[0])
+        missing, extra = find_lesson_access_drift()
+        self.assertEqual(len(missing), len([row for row in incremental if row[0] == self.alice.pk]))
+        self.assertEqual(list(extra), [(self.bob.pk, self.second.pk, self.lessons[0].pk)])
+
+        self.assertEqual(rebuild_lesson_access(), len(incremental))
+        self.assertConsistent(incremental)
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class SoftDeleteTests(StatisticsAssertionsMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner')
+        cls.student = User.objects.create(username='student')
+        cls.lesson = Lesson.objects.create(title='lesson', video_url='https://example.com', duration=100)
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.owner) for i in range(3)]
+        for product in cls.products:
+            ProductLesson.objects.create(product=product, lesson=cls.lesson)
+            ProductAccess.objects.create(product=product, user=cls.student)
+
+    def test_managers(self):
+        deleted, live, _ = self.products
+        deleted.delete()
+        self.assertTrue(Product.all_objects.get(pk=deleted.pk).is_deleted)
+        self.assertFalse(Product.objects.filter(pk=deleted.pk).exists())
+        self.assertNotIn(deleted, Product.objects.all())
+        self.assertIn(deleted, Product.all_objects.all())
+        with self.assertRaises(Product.DoesNotExist):
+            Product.objects.get(pk=deleted.pk)
+        # Связи загружают удаленный продукт
+        self.assertEqual(ProductAccess.objects.get(product_id=deleted.pk).product, deleted)
+        self.assertIn(live, Product.objects.all())
+
+        self.client.force_authenticate(self.owner)
+        names = [row['name'] for row in self.client.get(reverse('product-list')).data]
+        self.assertEqual(names, ['product 1', 'product 2'])
+        self.assertEqual(self.client.get(reverse('product-detail', args=[deleted.pk])).status_code, 404)
+
+    def test_queryset_delete_is_soft_and_cleans_access(self):
+        count, by_model = Product.objects.filter(pk__in=[product.pk for product in self.products[:2]]).delete()
+        self.assertEqual((count, by_model), (2, {'courses.Product': 2}))
+        self.assertEqual(Product.all_objects.filter(is_deleted=True).count(), 2)
+        # Доступы и статистика сохраняются на случай восстановления, строки LessonAccess -- нет
+        self.assertEqual(ProductAccess.objects.count(), 3)
+        self.assertEqual(set(LessonAccess.objects.values_list('product_id', flat=True)), {self.products[2].pk})
+        self.assertStatisticsExact()
+        # Повторное удаление уже удаленных ничего не меняет
+        self.assertEqual(Product.all_objects.filter(pk=self.products[0].pk).delete()[0], 0)
+
+    def test_hard_delete(self):
+        product = self.products[0]
+        product.delete()
+        Product.all_objects.filter(pk=product.pk).hard_delete()
+        self.assertFalse(Product.all_objects.filter(pk=product.pk).exists())
+        self.assertFalse(ProductAccess.objects.filter(product_id=product.pk).exists())
+        self.assertFalse(ProductLesson.objects.filter(product_id=product.pk).exists())
+        self.assertFalse(ProductStatistics.objects.filter(product_id=product.pk).exists())
+        self.assertStatisticsExact()
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        other = User.objects.create(username='other')
+        cls.lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                       for i in range(3)]
+        cls.views = [LessonView.objects.create(lesson=lesson, user=cls.user, view_duration=duration)
+                     for lesson, duration in zip(cls.lessons, (90, 10, 80))]
+        LessonView.objects.create(lesson=cls.lessons[0], user=other, view_duration=100)
+        cls.products = [Product.objects.create(name=f'product {i}', owner=cls.user) for i in range(2)]
+        ProductLesson.objects.create(product=cls.products[0], lesson=cls.lessons[0])
+        ProductAccess.objects.create(product=cls.products[0], user=cls.user)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_lesson_views_csv(self):
+        response, content = self.export('lesson-view-export', status='viewed', ordering='-view_duration')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="lesson-views.csv"')
+        header, *rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(header, ['id', 'lesson', 'user', 'view_duration', 'status', 'status_display', 'created',
+                                  'updated'])
+        self.assertEqual([row[:6] for row in rows], [
+            [str(view.pk), str(view.lesson_id), str(self.user.pk), str(view.view_duration), 'viewed', 'Просмотрено']
+            for view in (self.views[0], self.views[2])
+        ])
+        self.assertEqual(rows[0][6], self.client.get(reverse('lesson-view-list')).data[0]['created'])
+
+    def test_lesson_views_ndjson(self):
+        response, content = self.export('lesson-view-export', export_format='ndjson', status='not_viewed')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="lesson-views.ndjson"')
+        [line] = content.splitlines()
+        row = json.loads(line)
+        self.assertEqual({key: row[key] for key in ('id', 'lesson', 'view_duration', 'status', 'status_display')}, {
+            'id': self.views[1].pk, 'lesson': self.lessons[1].pk, 'view_duration': 10,
+            'status': 'not_viewed', 'status_display': 'Не просмотрено',
+        })
+        detail = self.client.get(reverse('lesson-view-detail', args=[self.views[1].pk])).data
+        self.assertEqual((row['created'], row['updated']), (detail['created'], detail['updated']))
+
+    def test_statistics_filters(self):
+        _, content = self.export(
+            'product-statistics-export', export_format='ndjson', product_ids=str(self.products[0].pk), owner='me',
+        )
+        self.assertEqual([json.loads(line) for line in content.splitlines()], [{
+            "id_продукта": self.products[0].pk,
+            "название продукта": 'product 0',
+            "количество просмотренных уроков": 2,
+            "общее время просмотра": 190,
+            "количество студентов": 1,
+            "процент приобретения": 50.0,
+        }])
+        self.assertEqual(self.client.get(reverse('product-statistics-export'), {'export_format': 'xml'}).status_code,
+                         400)
+
+    def test_rows_are_read_while_streaming(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('lesson-view-export'))
+            before = len(queries)
+            content = b''.join(response.streaming_content)
+        self.assertGreater(len(queries), before)
+        self.assertEqual(len(content.splitlines()), 4)
+
+        chunks = list(stream_rows(((i, i * 2) for i in range(5)), ['a', 'b'], 'csv', chunk_size=2))
+        self.assertEqual(chunks, ['a,b\r\n0,0\r\n1,2\r\n', '2,4\r\n3,6\r\n', '4,8\r\n'])
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        # Повторяющиеся имена и одинаковые created: порядок между ними задает только id
+        cls.products = [Product.objects.create(name=f'product {i % 3}', owner=cls.user) for i in range(10)]
+        Product.objects.filter(pk__in=[product.pk for product in cls.products[:6]]).update(
+            created=cls.products[0].created,
+        )
+        lessons = [Lesson.objects.create(title=f'lesson {i}', video_url='https://example.com', duration=100)
+                   for i in range(9)]
+        for index, lesson in enumerate(lessons):
+            LessonView.objects.create(lesson=lesson, user=cls.user, view_duration=(index % 2) * 90)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, name, **params):
+        response = self.client.get(reverse(name), {'pagination': 'cursor', 'limit': 3, **params})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_every_row_exactly_once(self):
+        cases = [
+            ('product-list', Product.objects.all(), ['name', 'id'], None),
+            ('product-list', Product.objects.all(), ['-name', '-id'], '-name'),
+            ('product-list', Product.objects.all(), ['created', 'id'], 'created'),
+            ('product-list', Product.objects.all(), ['-created', '-id'], '-created'),
+            ('lesson-view-list', LessonView.objects.all(), ['-view_duration', '-id'], '-view_duration'),
+            ('lesson-view-list', LessonView.objects.with_status(), ['status', 'id'], 'status'),
+        ]
+        for name, queryset, order, ordering in cases:
+            with self.subTest(name=name, ordering=ordering):
+                params = {'ordering': ordering} if ordering else {}
+                ids = self.walk(name, **params)
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(ids, list(queryset.order_by(*order).values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        def cursor(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        url = reverse('product-list')
+        for value in ('!!!', 'bm90IGpzb24=', cursor({'name': 'x'}), cursor(['product 1']),
+                      cursor(['product 1', 2, 3])):
+            with self.subTest(cursor=value):
+                self.assertEqual(self.client.get(url, {'cursor': value}).status_code, 404)
+        for value in (['not a date', 1], ['2026-01-01T00:00:00Z', 'x'], [None, [1]]):
+            with self.subTest(cursor=value):
+                response = self.client.get(url, {'cursor': cursor(value), 'ordering': 'created'})
+                self.assertEqual(response.status_code, 404)
+
+
+@override_settings(REPLICA_DATABASES={'ALIASES': []})
+class LessonViewStatusTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user')
+        cls.viewed, cls.not_viewed = [], []
+        # Порог 80% с точным и дробным значением: 8 из 10, 12 из 15, 6 из 7
+        for duration, threshold in ((10, 8), (15, 12), (7, 6), (1, 1)):
+            for view_duration, views in ((threshold, cls.viewed), (threshold - 1, cls.not_viewed)):
+                lesson = Lesson.objects.create(title=f'{view_duration}/{duration}', video_url='https://example.com',
+                                               duration=duration)
+                views.append(LessonView.objects.create(lesson=lesson, user=cls.user, view_duration=view_duration).pk)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_status_at_threshold(self):
+        self.assertCountEqual(LessonView.objects.viewed().values_list('pk', flat=True), self.viewed)
+        statuses = dict(LessonView.objects.with_status().values_list('pk', 'status'))
+        for view in LessonView.objects.select_related('lesson'):
+            expected = LessonView.VIEWED if view.pk in self.viewed else LessonView.NOT_VIEWED
+            with self.subTest(view=view.lesson.title):
+                self.assertEqual(view.status, expected)
+                self.assertEqual(statuses[view.pk], expected)
+
+    def test_status_filter_and_display(self):
+        url = reverse('lesson-view-list')
+        for value, ids, display in ((LessonView.VIEWED, self.viewed, 'Просмотрено'),
+                                    (LessonView.NOT_VIEWED, self.not_viewed, 'Не просмотрено')):
+            with self.subTest(status=value):
+                rows = self.client.get(url, {'status': value}).data
+                self.assertCountEqual([row['id'] for row in rows], ids)
+                self.assertEqual({(row['status'], row['status_display']) for row in rows}, {(value, display)})
+        detail = self.client.get(reverse('lesson-view-detail', args=[self.viewed[0]])).data
+        self.assertEqual((detail['status'], detail['status_display']), (LessonView.VIEWED, 'Просмотрено'))
+        self.assertEqual(self.client.get(url, {'status': 'watched'}).status_code, 400)
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
 
+if settings.COURSES_ASYNC_VIEWS:
+    from .async_views import AsyncProductListView as ProductListView, AsyncLessonListView as LessonListView, \
+        AsyncLessonViewListView as LessonViewListView, AsyncProductStatisticsView as ProductStatisticsView
 
 
 urlpatterns = [
@@ -11,6 +15,8 @@ urlpatterns = [
 
     # Маршруты для доступов к продуктам
     path('product-access/create/', ProductAccessCreateView.as_view(), name='product-access-create'),
+    path('product-access/bulk-grant/', ProductAccessBulkGrantView.as_view(), name='product-access-bulk-grant'),
+    path('product-access/bulk-revoke/', ProductAccessBulkRevokeView.as_view(), name='product-access-bulk-revoke'),
     path('product-access/', ProductAccessListView.as_view(), name='product-access-list'),
     path('product-access/<int:pk>/', ProductAccessView.as_view(), name='product-access-detail'),
 
@@ -26,10 +32,14 @@ urlpatterns = [
 
     # Маршруты для просмотров уроков
     path('lesson-views/create/', LessonViewCreateView.as_view(), name='lesson-view-create'),
+    path('lesson-views/batch/', LessonViewBatchCreateView.as_view(), name='lesson-view-batch'),
     path('lesson-views/', LessonViewListView.as_view(), name='lesson-view-list'),
     path('lesson-views/<int:pk>/', LessonViewDetailView.as_view(), name='lesson-view-detail'),
+    path('lesson-views/export/', LessonViewExportView.as_view(), name='lesson-view-export'),
 
     path('products/statistics/', ProductStatisticsView.as_view(), name='product-statistics'),
+    path('products/statistics/export/', ProductStatisticsExportView.as_view(), name='product-statistics-export'),
+    path('products/progress/', ProductProgressView.as_view(), name='product-progress'),
 
 
 ]
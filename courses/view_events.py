@@ -0,0 +1,194 @@
+"""Журнал событий просмотра (ViewEvent) и его свертка в почасовые и суточные сводки.
+
+Каждая запись прогресса, увеличившая view_duration (сигнал LessonView и пакетная запись
+в courses/ingestion.py), добавляет событие с приростом времени и признаком перехода урока
+в "Просмотрено". Команда rollup_view_events (раз в несколько минут по cron) переносит
+несвернутые события в LessonViewRollup и ProductViewRollup: по часу и по суткам UTC на урок
+и на каждый продукт, в который урок входит на момент свертки. Событие помечается свернутым
+(rolled_up) в той же транзакции, в которой его значения прибавляются к сводкам, поэтому
+повторный запуск не считает события дважды, а событие из долгой транзакции, ставшее видимым
+после предыдущей свертки, попадет в следующую. Свернутые события старше RETENTION_DAYS
+удаляются.
+
+События моложе ROLLUP_DELAY секунд ждут следующего запуска, чтобы текущий час не
+переписывался на каждой свертке; на полноту это не влияет. Свертки не выполняются
+одновременно: вторая ждет блокировку строки ROLLUP_LOCK в StatisticsCounter.
+
+Статистика за период (ProductStatisticsView с ?from=&to=) читается только из сводок:
+целые сутки -- из суточных, края диапазона -- из почасовых; точность -- час, события
+после последней свертки не учитываются.
+"""
+import operator
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import reduce
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.models import (LessonViewRollup, ProductLesson, ProductViewRollup, StatisticsCounter, ViewEvent,
+                            ViewRollup)
+from courses.statistics import is_viewed
+
+ROLLUP_LOCK = 'view_events_rollup'
+ROLLUP_FIELDS = ('watch_seconds', 'viewed_lessons', 'events')
+BATCH_SIZE = 10_000
+
+_options = getattr(settings, 'VIEW_EVENTS', {})
+
+
+def record(changes):
+    """Добавляет события; changes -- (user_id, lesson_id, прежняя длительность, новая, длительность урока).
+
+    Изменения без прироста (в т.ч. уменьшение длительности через API) в журнал не попадают.
+    """
+    events = [
+        ViewEvent(
+            user_id=user_id, lesson_id=lesson_id, watched_seconds=view_duration - previous,
+            view_duration=view_duration,
+            became_viewed=is_viewed(view_duration, duration) and not is_viewed(previous, duration),
+        )
+        for user_id, lesson_id, previous, view_duration, duration in changes
+        if view_duration > previous
+    ]
+    ViewEvent.objects.bulk_create(events)
+
+
+def _day(bucket):
+    return bucket.replace(hour=0)
+
+
+def _merge(model, key_field, totals):
+    """Прибавляет totals {(period, bucket, id): [watch, viewed, events]} к строкам сводки."""
+    if not totals:
+        return
+    ids = {key for _, _, key in totals}
+    buckets = {bucket for _, bucket, _ in totals}
+    existing = model.objects.filter(**{f'{key_field}_id__in': ids}, bucket__in=buckets).values_list(
+        'period', 'bucket', f'{key_field}_id', *ROLLUP_FIELDS,
+    )
+    for period, bucket, key, *values in existing:
+        if (period, bucket, key) in totals:
+            totals[(period, bucket, key)] = [a + b for a, b in zip(totals[(period, bucket, key)], values)]
+    model.objects.bulk_create(
+        [
+            model(period=period, bucket=bucket, **{f'{key_field}_id': key}, **dict(zip(ROLLUP_FIELDS, values)))
+            for (period, bucket, key), values in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=[key_field, 'period', 'bucket'],
+        update_fields=list(ROLLUP_FIELDS),
+        batch_size=1000,
+    )
+
+
+def _hour(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_batch(events):
+    """Прибавляет к сводкам события (lesson_id, occurred_at, watched_seconds, became_viewed)."""
+    lessons = defaultdict(lambda: [0, 0, 0])
+    for lesson_id, occurred_at, watched_seconds, became_viewed in events:
+        hour = _hour(occurred_at)
+        for period, bucket in ((ViewRollup.HOUR, hour), (ViewRollup.DAY, _day(hour))):
+            total = lessons[(period, bucket, lesson_id)]
+            total[0] += watched_seconds
+            total[1] += int(became_viewed)
+            total[2] += 1
+
+    products_by_lesson = defaultdict(set)
+    for product_id, lesson_id in ProductLesson.objects.filter(
+        lesson_id__in={lesson_id for _, _, lesson_id in lessons},
+    ).values_list('product_id', 'lesson_id').distinct():
+        products_by_lesson[lesson_id].add(product_id)
+    products = defaultdict(lambda: [0, 0, 0])
+    for (period, bucket, lesson_id), values in lessons.items():
+        for product_id in products_by_lesson[lesson_id]:
+            total = products[(period, bucket, product_id)]
+            products[(period, bucket, product_id)] = [a + b for a, b in zip(total, values)]
+
+    _merge(LessonViewRollup, 'lesson', lessons)
+    _merge(ProductViewRollup, 'product', products)
+
+
+def _mark_rolled_up(ids):
+    db = router.db_for_write(ViewEvent)
+    step = connections[db].ops.bulk_batch_size(['id'], ids)
+    for offset in range(0, len(ids), step):
+        ViewEvent.objects.using(db).filter(id__in=ids[offset:offset + step]).update(rolled_up=True)
+
+
+def rollup(batch_size=BATCH_SIZE):
+    """Сворачивает несвернутые события. Возвращает число учтенных событий."""
+    ready_before = timezone.now() - timedelta(seconds=_options.get('ROLLUP_DELAY', 60))
+    processed = 0
+    while True:
+        with transaction.atomic():
+            StatisticsCounter.objects.select_for_update().get_or_create(name=ROLLUP_LOCK)
+            # Строки блокируются, чтобы сводки и пометка относились к одному и тому же набору событий
+            rows = list(ViewEvent.objects.select_for_update().filter(
+                rolled_up=False, occurred_at__lt=ready_before,
+            ).order_by('id').values_list('id', 'lesson_id', 'occurred_at', 'watched_seconds', 'became_viewed')[:batch_size])
+            if not rows:
+                break
+            _rollup_batch([row[1:] for row in rows])
+            _mark_rolled_up([row[0] for row in rows])
+            processed += len(rows)
+    return processed
+
+
+def prune(retention_days=None):
+    """Удаляет свернутые события старше срока хранения. Возвращает число удаленных."""
+    if retention_days is None:
+        retention_days = _options.get('RETENTION_DAYS', 30)
+    # У журнала нет сигналов и зависимых строк: delete() выполняется одним DELETE без загрузки строк
+    deleted, _ = ViewEvent.objects.filter(
+        rolled_up=True, occurred_at__lt=timezone.now() - timedelta(days=retention_days),
+    ).delete()
+    return deleted
+
+
+def _ceil_day(value):
+    day = datetime.combine(value.date(), time.min, tzinfo=dt_timezone.utc)
+    return day if day == value else day + timedelta(days=1)
+
+
+def range_condition(start=None, end=None):
+    """Условие на строки сводки для диапазона [start, end) с точностью до часа (UTC).
+
+    Целые сутки берутся из суточных сводок, неполные сутки по краям -- из почасовых.
+    Границы None означают открытый диапазон.
+    """
+    start = start and start.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    end = end and end.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    first_day = start and _ceil_day(start)
+    last_day = end and _day(end)
+    if first_day and last_day and first_day >= last_day:
+        # Диапазон внутри одних суток: только почасовые сводки
+        return Q(period=ViewRollup.HOUR, bucket__gte=start, bucket__lt=end)
+
+    days = Q(period=ViewRollup.DAY)
+    conditions = []
+    if first_day:
+        days &= Q(bucket__gte=first_day)
+        conditions.append(Q(period=ViewRollup.HOUR, bucket__gte=start, bucket__lt=first_day))
+    if last_day:
+        days &= Q(bucket__lt=last_day)
+        conditions.append(Q(period=ViewRollup.HOUR, bucket__gte=last_day, bucket__lt=end))
+    return reduce(operator.or_, conditions, days)
+
+
+def annotate_range_statistics(queryset, start=None, end=None, product_field='product_id'):
+    """Добавляет к queryset время просмотра и число просмотренных уроков за период из сводок продуктов."""
+    rollups = ProductViewRollup.objects.filter(range_condition(start, end), product_id=OuterRef(product_field))
+
+    def total(field):
+        return Coalesce(Subquery(
+            rollups.order_by().values('product_id').annotate(value=Sum(field)).values('value')[:1]
+        ), 0)
+
+    return queryset.annotate(range_viewed_lessons=total('viewed_lessons'), range_view_time=total('watch_seconds'))
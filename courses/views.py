@@ -1,14 +1,30 @@
-from django.db.models import Q, ExpressionWrapper
-from rest_framework import permissions, filters
-from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateDestroyAPIView
-from rest_framework.pagination import LimitOffsetPagination
+from datetime import datetime, time
+
+from django.db.models import Q, ExpressionWrapper, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import permissions, filters, status
+from rest_framework.generics import CreateAPIView, GenericAPIView, ListAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 
+from core.middleware import SerializationTimingMixin
 from core.models import User
-from courses.models import Product, ProductAccess, ProductLesson, Lesson, LessonView
+from core.routers import ReplicaReadMixin
+from courses.models import Product, ProductAccess, ProductLesson, Lesson, LessonView, ProductStatistics, \
+    StatisticsCounter
 from courses.serializers import ProductSerializer, ProductAccessSerializer, LessonSerializer, ProductLessonSerializer, \
-    LessonViewSerializer
+    LessonViewSerializer, ProductStatisticsSerializer, LessonViewBatchSerializer, ProductAccessBulkSerializer, \
+    ProductAccessBulkRevokeSerializer, ProductProgressSerializer
 from django_filters.rest_framework import DjangoFilterBackend
+from courses import access, progress, view_events
+from courses.buffer import progress_buffer
+from courses.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from courses.export import StreamingExportMixin
+from courses.filters import LessonViewFilter
+from courses.pagination import KeysetPagination
+from courses.search import FullTextSearchFilter
+from courses.statistics import is_viewed
 from django.db.models import Count, Sum, FloatField, F, Case, When, Value, BooleanField
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -17,34 +33,35 @@ from rest_framework import permissions
 
 
 
-class ProductCreateView(CreateAPIView):
+class ProductCreateView(SerializationTimingMixin, CreateAPIView):
     """Представление для создания продукта.
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductSerializer
 
-class ProductListView(ListAPIView):
+class ProductListView(SerializationTimingMixin, ReplicaReadMixin, ConditionalListMixin, ListAPIView):
     """Представление для просмотра списка продукта.
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
         DjangoFilterBackend,
     ]
     filterset_fields = ['name']
     ordering_fields = ["name", "created"]
     ordering = ["name"]
     search_fields = ["name"]
+    fulltext_index = 'product'
 
     def get_queryset(self):
         user = self.request.user
-        return Product.objects.filter(owner=user, is_deleted=False)
+        return Product.objects.filter(owner=user)
 
 
-class ProductView(RetrieveUpdateDestroyAPIView):
+class ProductView(SerializationTimingMixin, ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     """Представление для получения, обновления и удаления категории цели."""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -55,33 +72,53 @@ class ProductView(RetrieveUpdateDestroyAPIView):
         return Product.objects.filter(owner=user)
 
 
-class ProductAccessCreateView(CreateAPIView):
+class ProductAccessCreateView(SerializationTimingMixin, CreateAPIView):
 
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductAccessSerializer
 
 
-class ProductAccessListView(ListAPIView):
+class ProductAccessBulkGrantView(SerializationTimingMixin, GenericAPIView):
+    """Массовая выдача доступа к своему продукту: {"product": id, "user_ids": [...]} или
+    {"product": id, "email_domain": "example.com"}. Отвечает счетчиками выданных доступов."""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ProductAccessBulkSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ProductAccessBulkRevokeView(ProductAccessBulkGrantView):
+    """Массовый отзыв доступа к своему продукту; тело -- как у ProductAccessBulkGrantView."""
+    serializer_class = ProductAccessBulkRevokeSerializer
+
+
+class ProductAccessListView(SerializationTimingMixin, ReplicaReadMixin, ConditionalListMixin, ListAPIView):
     """Представление для просмотра списка доступов к продуктам."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductAccessSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
         DjangoFilterBackend,
     ]
     filterset_fields = ['user']
     ordering_fields = ["product", "created"]
     ordering = ["product"]
-    search_fields = ["product"]
+    search_fields = ["product__name"]
+    fulltext_index = 'product'
+    fulltext_field = 'product_id'
 
     def get_queryset(self):
         user = self.request.user
         return ProductAccess.objects.filter(user=user)
 
 
-class ProductAccessView(RetrieveUpdateDestroyAPIView):
+class ProductAccessView(SerializationTimingMixin, ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     """Представление для получения, обновления и удаления доступа к продукту."""
     serializer_class = ProductAccessSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -91,133 +128,272 @@ class ProductAccessView(RetrieveUpdateDestroyAPIView):
         return ProductAccess.objects.filter(user=user)
 
 
-class LessonCreateView(CreateAPIView):
+class LessonCreateView(SerializationTimingMixin, CreateAPIView):
     """Представление для создания уроков."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonSerializer
 
 
-class LessonListView(ListAPIView):
+class LessonListView(SerializationTimingMixin, ReplicaReadMixin, ConditionalListMixin, ListAPIView):
     """Представление для просмотра списка уроков."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
     filterset_fields = ['productlesson__product__productaccess__user', 'title']
     filter_backends = [
         filters.OrderingFilter,
-        filters.SearchFilter,
+        FullTextSearchFilter,
         DjangoFilterBackend,
     ]
     filterset_fields = ['title']
     ordering_fields = ["title", "created"]
     ordering = ["title"]
     search_fields = ["title"]
+    fulltext_index = 'lesson'
 
     def get_queryset(self):
         user = self.request.user
-        lessons = Lesson.objects.filter(productlesson__product__productaccess__user=user).distinct()
-        return lessons
+        return Lesson.objects.filter(id__in=access.lessons_for_user(user))
 
 
-class ProductLessonView(RetrieveUpdateDestroyAPIView):
+class ProductLessonView(SerializationTimingMixin, ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     """Представление для получения, обновления и удаления уроков."""
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Lesson.objects.filter(productlesson__product__productaccess__user=user).distinct()
+        return Lesson.objects.filter(id__in=access.lessons_for_user(user))
 
 
-class ProductLessonCreateView(CreateAPIView):
+class ProductLessonCreateView(SerializationTimingMixin, CreateAPIView):
     """Представление для создания связи между продуктом и уроком."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductLessonSerializer
 
 
-class ProductLessonListView(ListAPIView):
+class ProductLessonListView(SerializationTimingMixin, ReplicaReadMixin, ConditionalListMixin, ListAPIView):
     """Представление для просмотра списка уроков, связанных с продуктами, к которым у пользователя есть доступ."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductLessonSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        accessible_products = ProductAccess.objects.filter(user=user).values_list('product', flat=True)
-        return ProductLesson.objects.filter(product__in=accessible_products)
+        return ProductLesson.objects.filter(product_id__in=access.products_for_user(user))
 
 
-class ProductLessonDetailView(RetrieveUpdateDestroyAPIView):
+class ProductLessonDetailView(SerializationTimingMixin, ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     """Представление для получения, обновления и удаления связи между продуктом и уроком."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProductLessonSerializer
 
     def get_queryset(self):
         user = self.request.user
-        accessible_products = ProductAccess.objects.filter(user=user).values_list('product', flat=True)
-        return ProductLesson.objects.filter(product__in=accessible_products)
+        return ProductLesson.objects.filter(product_id__in=access.products_for_user(user))
 
 
-class LessonViewCreateView(CreateAPIView):
+class LessonViewCreateView(SerializationTimingMixin, CreateAPIView):
     """Представление для создания записи о просмотре урока пользователем."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonViewSerializer
 
 
-class LessonViewListView(ListAPIView):
+class LessonViewBatchCreateView(SerializationTimingMixin, GenericAPIView):
+    """Представление для пакетной записи прогресса просмотра уроков текущим пользователем.
+
+    Повторный отчет по тому же уроку не приводит к ошибке: сохраняется максимальная длительность.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = LessonViewBatchSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class BufferedProgressMixin:
+    """Подмешивает к отдаваемым просмотрам прогресс, еще не сброшенный из буфера (courses/buffer.py),
+    чтобы клиент сразу видел свои записи."""
+
+    def get_serializer(self, *args, **kwargs):
+        if args and progress_buffer.enabled:
+            pending = progress_buffer.pending_for_user(self.request.user.id)
+            if pending:
+                instance = args[0]
+                views = [instance] if isinstance(instance, LessonView) else list(instance)
+                for view in views:
+                    if pending.get(view.lesson_id, -1) > view.view_duration:
+                        view.view_duration = pending[view.lesson_id]
+                        view.status = None  # статус будет пересчитан по новой длительности
+                args = (instance if isinstance(instance, LessonView) else views,) + args[1:]
+        return super().get_serializer(*args, **kwargs)
+
+
+class LessonViewListView(SerializationTimingMixin, ReplicaReadMixin, BufferedProgressMixin, ListAPIView):
     """Представление для просмотра списка уроков, которые просматривал данный пользователь."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonViewSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
+    filter_backends = [
+        filters.OrderingFilter,
+        DjangoFilterBackend,
+    ]
+    filterset_class = LessonViewFilter
+    ordering_fields = ["status", "view_duration", "created"]
+    ordering = ["id"]
 
     def get_queryset(self):
         user = self.request.user
-        return LessonView.objects.filter(user=user)
+        return LessonView.objects.filter(user=user).with_status()
 
 
-class LessonViewDetailView(RetrieveUpdateDestroyAPIView):
-    """Представление для получения, обновления и удаления записи о просмотре урока."""
+class LessonViewExportView(StreamingExportMixin, LessonViewListView):
+    """Выгрузка всех просмотров пользователя потоком в CSV или NDJSON (?export_format=),
+    с теми же фильтрами и сортировкой, что у списка просмотров."""
+    export_fields = ['id', 'lesson_id', 'user_id', 'view_duration', 'status', 'created', 'updated', 'lesson__duration']
+    export_headers = ['id', 'lesson', 'user', 'view_duration', 'status', 'status_display', 'created', 'updated']
+    export_filename = 'lesson-views'
+
+    def get(self, request, *args, **kwargs):
+        # Прогресс из буфера подмешивается, как в BufferedProgressMixin
+        self.pending = progress_buffer.pending_for_user(request.user.id) if progress_buffer.enabled else {}
+        return super().get(request, *args, **kwargs)
+
+    def export_row(self, row):
+        pk, lesson_id, user_id, view_duration, view_status, created, updated, lesson_duration = row
+        if self.pending.get(lesson_id, -1) > view_duration:
+            view_duration = self.pending[lesson_id]
+            view_status = LessonView.VIEWED if is_viewed(view_duration, lesson_duration) else LessonView.NOT_VIEWED
+        return (pk, lesson_id, user_id, view_duration, view_status, dict(LessonView.STATUS_CHOICES)[view_status],
+                created, updated)
+
+
+class LessonViewDetailView(SerializationTimingMixin, BufferedProgressMixin, RetrieveUpdateDestroyAPIView):
+    """Представление для получения, обновления и удаления записи о просмотре урока.
+
+    Если включен буфер прогресса (LESSON_VIEW_BUFFER), обновление одного view_duration (PATCH или PUT
+    с прежними уроком и пользователем) не пишется в БД сразу, а сворачивается в буфере; при этом
+    сохраняется максимальная длительность. До сброса новое значение видят запросы этого процесса.
+    """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = LessonViewSerializer
 
     def get_queryset(self):
         user = self.request.user
-        return LessonView.objects.filter(user=user)
-
-
-class ProductStatisticsView(APIView):
+        return LessonView.objects.filter(user=user).with_status()
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        data = serializer.validated_data
+        # PATCH с одним view_duration или PUT, который не меняет урок и пользователя
+        only_progress = 'view_duration' in data and all(
+            value == getattr(instance, name) for name, value in data.items() if name != 'view_duration'
+        )
+        if not progress_buffer.enabled or not only_progress:
+            return super().perform_update(serializer)
+        view_duration = serializer.validated_data['view_duration']
+        if view_duration > instance.lesson.duration:
+            raise ValidationError({'view_duration': "Продолжительность просмотра не может быть больше продолжительности урока."})
+        progress_buffer.add(instance.user_id, instance.lesson_id, view_duration, instance.lesson.duration)
+        if view_duration > instance.view_duration:
+            instance.view_duration = view_duration
+            instance.status = None
+
+    def perform_destroy(self, instance):
+        progress_buffer.discard(instance.user_id, instance.lesson_id)
+        super().perform_destroy(instance)
+
+
+class ProductStatisticsView(SerializationTimingMixin, ReplicaReadMixin, ListAPIView):
+    """Статистика по продуктам. Значения читаются из таблицы ProductStatistics,
+    которая поддерживается сигналами (см. courses/statistics.py).
+
+    Поддерживает выборку по ?product_ids=1,2,3, по владельцу ?owner=<id> или ?owner=me и пагинацию.
+    С ?from= и/или ?to= (дата или дата и время ISO 8601, диапазон [from, to)) просмотренные уроки
+    и время просмотра считаются за период по сводкам журнала просмотров (courses/view_events.py).
+    """
     permission_classes = [IsAuthenticated]
+    serializer_class = ProductStatisticsSerializer
+    pagination_class = KeysetPagination
 
-    def get(self, request):
-        total_users = User.objects.count()
-
-        products = Product.objects.annotate(
-            viewed_lessons_count=Count(
-                'productlesson__lesson__lessonview',
-                filter=Q(productlesson__lesson__lessonview__view_duration__gte=F('productlesson__lesson__duration') * 0.8),
-                distinct=True
-            ),
-            total_view_time=Sum(
-                'productlesson__lesson__lessonview__view_duration',
-                filter=Q(productlesson__lesson__lessonview__view_duration__gte=F('productlesson__lesson__duration') * 0.8)
-            ),
-            students_count=Count('productaccess__user', distinct=True),
-            purchase_percentage=ExpressionWrapper(
-                Count('productaccess__user', distinct=True) * 100.0 / total_users,
-                output_field=FloatField()
-            )
-        )
+    def get_queryset(self):
+        total_users = StatisticsCounter.objects.filter(name=StatisticsCounter.USERS).values('value')[:1]
+        queryset = ProductStatistics.objects.select_related('product').filter(product__is_deleted=False).annotate(
+            total_users=Subquery(total_users)
+        ).order_by('product_id')
+
+        product_ids = self.request.query_params.get('product_ids')
+        if product_ids:
+            try:
+                queryset = queryset.filter(product_id__in=[int(pk) for pk in product_ids.split(',') if pk])
+            except ValueError:
+                raise ValidationError({'product_ids': 'Ожидается список id через запятую.'})
+
+        owner = self.request.query_params.get('owner')
+        if owner == 'me':
+            queryset = queryset.filter(product__owner=self.request.user)
+        elif owner:
+            if not owner.isdigit():
+                raise ValidationError({'owner': 'Ожидается id пользователя или "me".'})
+            queryset = queryset.filter(product__owner_id=int(owner))
+
+        start, end = self.get_range()
+        if start or end:
+            queryset = view_events.annotate_range_statistics(queryset, start, end)
+        return queryset
+
+    def get_range(self):
+        bounds = []
+        for name in ('from', 'to'):
+            value = self.request.query_params.get(name)
+            try:
+                parsed = value and (parse_datetime(value) or parse_date(value))
+            except ValueError:
+                parsed = None
+            if value and not parsed:
+                raise ValidationError({name: 'Ожидается дата или дата и время в формате ISO 8601.'})
+            if parsed and not isinstance(parsed, datetime):
+                parsed = datetime.combine(parsed, time.min)
+            if parsed and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            bounds.append(parsed or None)
+        if bounds[0] and bounds[1] and bounds[0] >= bounds[1]:
+            raise ValidationError({'to': 'Конец периода должен быть позже начала.'})
+        return bounds
+
+
+class ProductStatisticsExportView(StreamingExportMixin, ProductStatisticsView):
+    """Выгрузка статистики всех продуктов потоком в CSV или NDJSON (?export_format=),
+    с теми же фильтрами ?product_ids= и ?owner=, что у ProductStatisticsView."""
+    export_headers = ["id_продукта", "название продукта", "количество просмотренных уроков", "общее время просмотра",
+                      "количество студентов", "процент приобретения"]
+    export_filename = 'product-statistics'
+
+    @property
+    def export_fields(self):
+        fields = ['product_id', 'product__name', 'viewed_lessons_count', 'total_view_time', 'students_count',
+                  'total_users']
+        if any(self.get_range()):
+            fields[2:4] = ['range_viewed_lessons', 'range_view_time']
+        return fields
+
+    def export_row(self, row):
+        *values, total_users = row
+        students_count = values[-1]
+        return (*values, students_count * 100.0 / total_users if total_users else 0.0)
+
+
+class ProductProgressView(SerializationTimingMixin, GenericAPIView):
+    """Прогресс текущего пользователя по каждому доступному продукту: уроки, просмотренные
+    уроки (правило 80%), время просмотра и процент прохождения. Считается двумя запросами
+    и кэшируется на пользователя до изменения его просмотров или доступов (courses/progress.py)."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = ProductProgressSerializer
+    pagination_class = None
 
-        data = [
-            {
-                "id_продукта": product.id,
-                "название продукта": product.name,
-                "количество просмотренных уроков": product.viewed_lessons_count,
-                "общее время просмотра": product.total_view_time,
-                "количество студентов": product.students_count,
-                "процент приобретения": product.purchase_percentage
-            }
-            for product in products
-        ]
-
-        return Response(data)
\ No newline at end of file
+    def get(self, request, *args, **kwargs):
+        rows = progress.get_product_progress(request.user.pk)
+        return Response(self.get_serializer(rows, many=True).data)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tutorials.settings")
+# Под ASGI списки обслуживаются асинхронными представлениями (courses/async_views.py)
+os.environ.setdefault("COURSES_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from core.database import parse_cache_url, parse_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestTimingMiddleware",
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.ReadReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -54,6 +60,26 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Заголовок Server-Timing и лог медленных запросов (core/middleware.py).
+# Выключенный middleware исключается из цепочки при старте.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING_ENABLED', '') == '1',
+    'SLOW_REQUEST_MS': int(os.environ.get('REQUEST_TIMING_SLOW_REQUEST_MS', 500)),
+}
+
+# Метрики в формате Prometheus на metrics/ (core/metrics.py). При нескольких процессах
+# задайте общий каталог MULTIPROCESS_DIR: процессы сохраняют туда снимки, metrics/ их суммирует.
+# metrics/ доступен адресам и сетям из ALLOWED_IPS (через запятую) и сотрудникам (is_staff).
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+    'ALLOWED_IPS': [
+        address.strip() for address in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+        if address.strip()
+    ],
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROCESS_DIR'),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 5)),
+}
+
 ROOT_URLCONF = "tutorials.urls"
 
 TEMPLATES = [
@@ -75,25 +101,115 @@ TEMPLATES = [
 WSGI_APPLICATION = "tutorials.wsgi.application"
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'courses.pagination.KeysetPagination',
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.TokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ]
 }
 
+# Кэш проверенных токенов (core/authentication.py): размер и время жизни записи в секундах.
+# Отозванный в другом процессе токен перестает приниматься сразу при общем CACHES, иначе
+# не позже чем через TTL.
+AUTH_TOKEN_CACHE = {
+    'MAX_SIZE': int(os.environ.get('AUTH_TOKEN_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 60)),
+}
+# Срок действия токена в днях с выдачи; просроченные токены удаляет команда clear_auth_tokens.
+AUTH_TOKEN_LIFETIME_DAYS = int(os.environ.get('AUTH_TOKEN_LIFETIME_DAYS', 30))
+
+# Буфер отложенной записи прогресса просмотра (courses/buffer.py). При включении PATCH/PUT
+# /lesson-views/<id>/, меняющий только view_duration, копится в памяти процесса и сбрасывается
+# в БД раз в FLUSH_INTERVAL секунд или при MAX_SIZE записях; при аварийном завершении процесса
+# теряются отчеты за последний интервал. Несброшенные значения видны только своему процессу.
+LESSON_VIEW_BUFFER = {
+    'ENABLED': os.environ.get('LESSON_VIEW_BUFFER_ENABLED', '') == '1',
+    'FLUSH_INTERVAL': float(os.environ.get('LESSON_VIEW_BUFFER_FLUSH_INTERVAL', 2.0)),
+    'MAX_SIZE': int(os.environ.get('LESSON_VIEW_BUFFER_MAX_SIZE', 1000)),
+}
+
+# Кэш метаданных уроков в памяти процесса (courses/lesson_cache.py): до MAX_SIZE уроков,
+# версия в общем кэше Django (CACHES) сверяется не чаще раза в VERSION_CHECK_INTERVAL секунд.
+# Запись живет не дольше TTL секунд: предел устаревания, если версия не дошла до процесса.
+LESSON_CACHE = {
+    'MAX_SIZE': int(os.environ.get('LESSON_CACHE_MAX_SIZE', 10000)),
+    'VERSION_CHECK_INTERVAL': float(os.environ.get('LESSON_CACHE_VERSION_CHECK_INTERVAL', 1.0)),
+    'TTL': float(os.environ.get('LESSON_CACHE_TTL', 30)),
+}
+
+# Кэш прогресса пользователя по продуктам (products/progress/, courses/progress.py): запись
+# живет TTL секунд, если раньше ее не сбросит изменение просмотров или доступов. Сброс между
+# процессами требует общего CACHES (CACHE_URL); с кэшем в памяти процесса TTL не больше 30 секунд.
+PRODUCT_PROGRESS_CACHE = {
+    'TTL': int(os.environ.get('PRODUCT_PROGRESS_CACHE_TTL', 300)),
+}
+
+# Журнал событий просмотра (courses/view_events.py): свернутые в сводки события хранятся
+# RETENTION_DAYS дней; события моложе ROLLUP_DELAY секунд сворачиваются следующим запуском.
+VIEW_EVENTS = {
+    'RETENTION_DAYS': int(os.environ.get('VIEW_EVENTS_RETENTION_DAYS', 30)),
+    'ROLLUP_DELAY': int(os.environ.get('VIEW_EVENTS_ROLLUP_DELAY', 60)),
+}
+
+# Асинхронные версии списков (courses/async_views.py) вместо синхронных DRF-представлений
+# на тех же маршрутах. Включается в tutorials/asgi.py; под WSGI не нужна.
+COURSES_ASYNC_VIEWS = os.environ.get('COURSES_ASYNC_VIEWS', '') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+# Профиль базы задается окружением (core/database.py). Соединение живет CONN_MAX_AGE секунд
+# между запросами и проверяется перед повторным использованием. Для SQLite на каждом
+# соединении выполняются PRAGMA из PRAGMAS, OPTIONS['timeout'] -- ожидание блокировки
+# записи в секундах, transaction_mode -- режим BEGIN в transaction.atomic.
+#
+# Реплики для чтения -- DATABASE_REPLICA_URLS через запятую, алиасы replica_1, replica_2...
+# (core/routers.py). В тестах у каждой реплики своя пустая тестовая база.
+DATABASE_URLS = {'default': os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')}
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASE_URLS[f'replica_{number}'] = url.strip()
+
+DATABASES = {}
+for alias, url in DATABASE_URLS.items():
+    DATABASES[alias] = parse_database_url(
+        url,
+        base_dir=BASE_DIR,
+        CONN_MAX_AGE=int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        CONN_HEALTH_CHECKS=os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+    )
+    if DATABASES[alias]["ENGINE"] == "core.backends.sqlite3":
+        DATABASES[alias]["OPTIONS"].setdefault('timeout', float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)))
+        DATABASES[alias]["OPTIONS"].setdefault(
+            'transaction_mode', os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        )
+        DATABASES[alias]["PRAGMAS"] = {
+            # NORMAL в режиме WAL не теряет целостность, только последние транзакции при сбое питания
+            'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+            'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 2 ** 20)),
+            # отрицательное значение -- размер в КиБ
+            'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 2 ** 10)),
+        }
+        # journal_mode сохраняется в файле базы: учебная db.sqlite3 из репозитория (DATABASE_URL
+        # не задан) остается в своем режиме, если SQLITE_JOURNAL_MODE не задан явно
+        journal_mode = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL' if 'DATABASE_URL' in os.environ else None)
+        if journal_mode:
+            DATABASES[alias]["PRAGMAS"]['journal_mode'] = journal_mode
+
+# Кэш Django (core/database.py). Сброс кэшей в памяти процессов (уроки, токены), кэш
+# прогресса и закрепление за основной базой после записи работают через него, поэтому
+# при нескольких процессах сервера нужен общий бэкенд: CACHE_URL=redis://... или memcached://...
+CACHES = {'default': parse_cache_url(os.environ.get('CACHE_URL', 'locmem://'))}
+
+# GET списков и статистики (ReplicaReadMixin) читают с реплик; после записи клиент
+# PIN_SECONDS секунд читает из default, чтобы видеть свои изменения.
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_DATABASES = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': float(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 5)),
 }
 
-
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 